@@ -42,10 +42,11 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # =====================
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',  # Server-Timing + métriques
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # pour Render
+    'core.middleware.WhiteNoiseAsyncMiddleware',  # pour Render (compatible ASGI)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -81,14 +82,57 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # =====================
 # BASE DE DONNÉES (Neon)
 # =====================
-DATABASES = {
-    'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL'),
-        conn_max_age=600,
-        ssl_require=True
+# Pool natif psycopg 3 (Django >= 5.1) : chaque worker partage un nombre borné de
+# connexions, vérifiées à l'emprunt (une connexion morte est remplacée au lieu
+# de faire échouer la requête). DB_POOL=False revient aux connexions persistantes.
+DB_POOL = os.environ.get('DB_POOL', 'True') == 'True'
+DB_POOL_OPTIONS = {
+    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '1')),
+    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+    # Attente maximale d'une connexion libre (s), puis erreur
+    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+    # Requêtes en attente au-delà desquelles on échoue immédiatement (0 = illimité)
+    'max_waiting': int(os.environ.get('DB_POOL_MAX_WAITING', '0')),
+    # Connexions inactives fermées (Neon suspend les computes inactifs)
+    'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+    'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', '1800')),
+    'reconnect_timeout': float(os.environ.get('DB_POOL_RECONNECT_TIMEOUT', '60')),
+}
+# Désactivable pour des bases locales (SQLite, Postgres sans SSL)
+DB_SSL_REQUIRE = os.environ.get('DB_SSL_REQUIRE', 'True') == 'True'
+
+
+def base_de_donnees(url):
+    if not url:
+        return {}
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        conn_health_checks=True,
+        ssl_require=DB_SSL_REQUIRE
     )
+    if DB_POOL and config.get('ENGINE') == 'django.db.backends.postgresql':
+        config.setdefault('OPTIONS', {})['pool'] = dict(DB_POOL_OPTIONS)
+    return config
+
+
+DATABASES = {
+    'default': base_de_donnees(os.environ.get('DATABASE_URL')),
 }
 
+# Réplicas en lecture (URLs séparées par des virgules) : alias replica_1, replica_2...
+# Les GET des viewsets core y sont envoyés (voir core.db_router).
+for _numero, _url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    DATABASES[f'replica_{_numero}'] = base_de_donnees(_url.strip())
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Après une écriture, les lectures de l'utilisateur restent sur le primaire (s)
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '5'))
+# Intervalle entre deux vérifications de santé d'un réplica (s)
+REPLICA_HEALTH_INTERVAL = int(os.environ.get('REPLICA_HEALTH_INTERVAL', '10'))
+# Retard de réplication toléré (s, Postgres uniquement ; 0 = non vérifié)
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '0'))
+
 # =====================
 # AUTH
 # =====================
@@ -104,8 +148,49 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-# Utiliser le stockage local au lieu de S3 (solution alternative)
-DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# Stockage des médias : S3 compatible si un bucket est configuré, sinon local
+# (DEFAULT_FILE_STORAGE n'est plus lu depuis Django 5.1 : on passe par STORAGES)
+if os.environ.get('AWS_STORAGE_BUCKET_NAME'):
+    STORAGE_MEDIAS = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ['AWS_STORAGE_BUCKET_NAME'],
+            'endpoint_url': os.environ.get('AWS_S3_ENDPOINT_URL'),
+            'region_name': os.environ.get('AWS_S3_REGION_NAME'),
+            'file_overwrite': False,
+            'querystring_auth': True,
+        },
+    }
+else:
+    # Utiliser le stockage local au lieu de S3 (solution alternative)
+    STORAGE_MEDIAS = {'BACKEND': 'django.core.files.storage.FileSystemStorage'}
+
+STORAGES = {
+    'default': STORAGE_MEDIAS,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Téléversement direct : durée de validité de l'URL signée, puis délai pour confirmer (s)
+UPLOAD_URL_EXPIRATION = int(os.environ.get('UPLOAD_URL_EXPIRATION', '300'))
+UPLOAD_CONFIRMATION_DELAY = int(os.environ.get('UPLOAD_CONFIRMATION_DELAY', '3600'))
+
+# =====================
+# CACHE
+# =====================
+# Cache partagé entre workers (Redis) ; à défaut, cache mémoire propre à chaque processus
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
 
 # =====================
 # CORS
@@ -122,8 +207,96 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Proxys devant l'application (Render) : l'IP client est lue dans X-Forwarded-For
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '1')),
+    # Seaux à jetons des endpoints coûteux (utils.throttling), '<portée>_user' / '<portée>_ip'.
+    # Surchargeables par THROTTLE_<PORTÉE>_<USER|IP> ; une valeur vide désactive le seau.
+    'DEFAULT_THROTTLE_RATES': {
+        portee: os.environ.get(f'THROTTLE_{portee.upper()}', taux) or None
+        for portee, taux in {
+            'connexion_ip': '20/min',
+            'inscription_ip': '5/hour',
+            'validation_user': '30/min',
+            'validation_ip': '60/min',
+            'creation_logement_user': '20/hour',
+            'creation_logement_ip': '60/hour',
+        }.items()
+    },
 }
 
+# =====================
+# PERFORMANCES
+# =====================
+# Sous ASGI (gunicorn -k uvicorn.workers.UvicornWorker config.asgi) :
+# lectures principales servies par core.async_views
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'False') == 'True'
+
+# Requêtes plus lentes que ce seuil journalisées avec leur SQL la plus lente
+PERF_SLOW_REQUEST_MS = int(os.environ.get('PERF_SLOW_REQUEST_MS', '500'))
+# Jeton Bearer pour /api/metrics/ (sinon réservé aux comptes staff)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Listes des paiements et des messages envoyées en flux JSON, sérialisées par lots de cette taille
+STREAMING_LISTES = os.environ.get('STREAMING_LISTES', 'True') == 'True'
+STREAMING_TAILLE_LOT = int(os.environ.get('STREAMING_TAILLE_LOT', '500'))
+
+# =====================
+# FACTURATION
+# =====================
+# Contrats traités par transaction lors de la facturation mensuelle (core.facturation)
+FACTURATION_TAILLE_LOT = int(os.environ.get('FACTURATION_TAILLE_LOT', '2000'))
+# Jour du mois avant lequel l'échéance doit être réglée
+FACTURATION_JOUR_LIMITE = int(os.environ.get('FACTURATION_JOUR_LIMITE', '5'))
+
+# =====================
+# RELANCES
+# =====================
+# Contrats lus par transaction pour les relances, puis e-mails envoyés par lot SMTP (core.relances)
+RELANCES_TAILLE_LOT = int(os.environ.get('RELANCES_TAILLE_LOT', '1000'))
+RELANCES_EMAILS_PAR_LOT = int(os.environ.get('RELANCES_EMAILS_PAR_LOT', '100'))
+
+# =====================
+# ARCHIVAGE
+# =====================
+# Âge au-delà duquel les messages quittent la table chaude (jours)
+ARCHIVE_MESSAGES_JOURS = int(os.environ.get('ARCHIVE_MESSAGES_JOURS', '365'))
+# Paiements validés archivés quand leur contrat est terminé depuis ce délai (jours)
+ARCHIVE_PAIEMENTS_JOURS = int(os.environ.get('ARCHIVE_PAIEMENTS_JOURS', '90'))
+# Lignes déplacées par transaction : verrous courts sur les tables chaudes
+ARCHIVE_TAILLE_LOT = int(os.environ.get('ARCHIVE_TAILLE_LOT', '1000'))
+
+# =====================
+# IDEMPOTENCE
+# =====================
+# Durée de conservation des réponses rejouables (en-tête Idempotency-Key, s)
+IDEMPOTENCE_TTL = int(os.environ.get('IDEMPOTENCE_TTL', '86400'))
+# Attente maximale d'un doublon pendant que la première requête s'exécute (s), puis 409
+IDEMPOTENCE_ATTENTE = float(os.environ.get('IDEMPOTENCE_ATTENTE', '10'))
+# Au-delà, une requête restée « en cours » est considérée abandonnée (worker tué) et rejouable
+IDEMPOTENCE_VERROU = int(os.environ.get('IDEMPOTENCE_VERROU', '300'))
+
+# =====================
+# REQUÊTES GROUPÉES
+# =====================
+# POST /api/batch/ : sous-requêtes par appel, et lectures exécutées en parallèle (connexions)
+BATCH_MAX_REQUETES = int(os.environ.get('BATCH_MAX_REQUETES', '20'))
+BATCH_PARALLELISME = int(os.environ.get('BATCH_PARALLELISME', '4'))
+
+# =====================
+# SYNCHRONISATION
+# =====================
+# GET /api/sync/?depuis=<jeton> : recouvrement avant le jeton (transactions encore ouvertes, s)
+SYNC_MARGE = int(os.environ.get('SYNC_MARGE', '30'))
+# Conservation des pierres tombales ; un jeton plus ancien déclenche une synchronisation complète
+SYNC_RETENTION_JOURS = int(os.environ.get('SYNC_RETENTION_JOURS', '30'))
+
+# =====================
+# MOBILE MONEY
+# =====================
+# Secret partagé avec l'opérateur : signature HMAC des notifications (vide : réception désactivée)
+MOBILE_MONEY_SECRET = os.environ.get('MOBILE_MONEY_SECRET', '')
+# Notifications rapprochées par transaction (commande traiter_mobile_money)
+MOBILE_MONEY_TAILLE_LOT = int(os.environ.get('MOBILE_MONEY_TAILLE_LOT', '500'))
+
 # =====================
 # AUTRES
 # =====================
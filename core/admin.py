@@ -1,13 +1,208 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Property
+from .models import CustomUser, Property, ImageLogement, Contract, Payment, Message, FichierContenu, \
+    ChargeRecurrente, Echeance, CycleFacturation, MessageArchive, PaymentArchive, \
+    RequeteIdempotente, Suppression, EvenementMobileMoney, RapprochementMobileMoney, Relance, \
+    TeleversementConfirme
+from .disponibilite import contrats_sur
+from .paiements import demander_validation
+from utils.pagination import PaginatorEstime
+
+
+class GrandeTableAdmin(admin.ModelAdmin):
+    # Tables volumineuses : pas de COUNT(*) complet, nombre de lignes estimé sous Postgres
+    paginator = PaginatorEstime
+    show_full_result_count = False
+    list_per_page = 50
+
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
-    list_display = ('username', 'email', 'role', 'is_staff', 'is_active')
+    list_display = ('username', 'email', 'role', 'proprietaire', 'is_staff', 'is_active')
+    list_filter = UserAdmin.list_filter + ('role',)
+    list_select_related = ('proprietaire',)
+    autocomplete_fields = ('proprietaire',)
+    paginator = PaginatorEstime
+    show_full_result_count = False
     fieldsets = UserAdmin.fieldsets + (
-        (None, {'fields': ('role',)}),
+        (None, {'fields': ('role', 'proprietaire', 'photo')}),
     )
 
+
+class ImageLogementInline(admin.TabularInline):
+    model = ImageLogement
+    extra = 0
+
+
+class ChargeRecurrenteInline(admin.TabularInline):
+    model = ChargeRecurrente
+    extra = 0
+
+
+class PropertyAdmin(GrandeTableAdmin):
+    list_display = ('nom', 'type_logement', 'loyer_mensuel', 'proprietaire', 'date_ajout')
+    list_filter = ('type_logement',)
+    list_select_related = ('proprietaire',)
+    search_fields = ('^nom', '=id')
+    autocomplete_fields = ('proprietaire',)
+    date_hierarchy = 'date_ajout'
+    inlines = [ImageLogementInline, ChargeRecurrenteInline]
+
+
+class ContratAdminForm(forms.ModelForm):
+    class Meta:
+        model = Contract
+        fields = '__all__'
+
+    def clean(self):
+        # Même règle que la contrainte contrat_sans_chevauchement : erreur de formulaire plutôt qu'une 500
+        donnees = super().clean()
+        logement, debut, fin = donnees.get('logement'), donnees.get('date_debut'), donnees.get('date_fin')
+        if logement and debut and fin and contrats_sur(debut, fin).filter(logement=logement).exclude(
+                pk=self.instance.pk).exists():
+            self.add_error('date_debut', "Ce logement a déjà un contrat sur cette période.")
+        return donnees
+
+
+class ContractAdmin(GrandeTableAdmin):
+    form = ContratAdminForm
+    list_display = ('id', 'locataire', 'logement', 'date_debut', 'date_fin', 'date_creation')
+    list_select_related = ('locataire', 'logement')
+    search_fields = ('=id', '^locataire__username', '^logement__nom')
+    autocomplete_fields = ('locataire', 'logement')
+    date_hierarchy = 'date_debut'
+
+
+@admin.action(description="Valider les paiements sélectionnés (reçu PDF + e-mail)")
+def action_valider_paiements(modeladmin, request, queryset):
+    # Reçus et e-mails hors de la requête : la commande valider_paiements traite la file
+    en_file = demander_validation(queryset)
+    modeladmin.message_user(request, f"{en_file} paiement(s) mis en file de validation.", messages.SUCCESS)
+
+
+class PaymentAdmin(GrandeTableAdmin):
+    list_display = ('id', 'locataire', 'logement', 'montant', 'type_paiement', 'mois_concerne',
+                    'est_valide', 'date_paiement')
+    list_filter = ('est_valide', 'type_paiement', 'mode_paiement')
+    list_select_related = ('locataire', 'logement')
+    search_fields = ('=id', '^locataire__username', '^mois_concerne')
+    autocomplete_fields = ('locataire', 'logement')
+    date_hierarchy = 'date_paiement'
+    actions = [action_valider_paiements]
+
+
+class MessageAdmin(GrandeTableAdmin):
+    list_display = ('id', 'expediteur', 'destinataire', 'date_envoi')
+    list_select_related = ('expediteur', 'destinataire')
+    search_fields = ('=id', '^expediteur__username', '^destinataire__username')
+    raw_id_fields = ('expediteur', 'destinataire')
+    date_hierarchy = 'date_envoi'
+
+
+class EcheanceAdmin(GrandeTableAdmin):
+    list_display = ('id', 'locataire', 'logement', 'type_charge', 'montant', 'mois_concerne', 'paiement')
+    list_filter = ('type_charge',)
+    list_select_related = ('locataire', 'logement')
+    search_fields = ('=id', '^locataire__username', '^mois_concerne')
+    raw_id_fields = ('contrat', 'locataire', 'logement', 'paiement')
+    date_hierarchy = 'periode'
+
+
+class CycleFacturationAdmin(admin.ModelAdmin):
+    list_display = ('periode', 'proprietaire', 'statut', 'nb_contrats', 'nb_echeances', 'date_debut', 'date_fin')
+    list_select_related = ('proprietaire',)
+    raw_id_fields = ('proprietaire',)
+
+
+class MessageArchiveAdmin(GrandeTableAdmin):
+    list_display = ('id', 'expediteur', 'destinataire', 'date_envoi', 'date_archivage')
+    list_select_related = ('expediteur', 'destinataire')
+    search_fields = ('=id',)
+    raw_id_fields = ('expediteur', 'destinataire')
+
+
+class PaymentArchiveAdmin(GrandeTableAdmin):
+    list_display = ('id', 'locataire', 'logement', 'montant', 'type_paiement', 'mois_concerne', 'date_paiement')
+    list_select_related = ('locataire', 'logement')
+    search_fields = ('=id', '^mois_concerne')
+    raw_id_fields = ('locataire', 'logement')
+
+
+class FichierContenuAdmin(GrandeTableAdmin):
+    list_display = ('chemin', 'taille', 'envois', 'date_creation')
+    search_fields = ('=empreinte', '^chemin')
+
+
+class RequeteIdempotenteAdmin(GrandeTableAdmin):
+    list_display = ('cle', 'utilisateur', 'statut', 'code_http', 'date_creation', 'date_expiration')
+    list_filter = ('statut',)
+    list_select_related = ('utilisateur',)
+    search_fields = ('=cle',)
+    raw_id_fields = ('utilisateur',)
+    exclude = ('reponse',)
+
+
+class TeleversementConfirmeAdmin(GrandeTableAdmin):
+    list_display = ('cle', 'utilisateur', 'date_confirmation')
+    list_select_related = ('utilisateur',)
+    search_fields = ('^cle',)
+    raw_id_fields = ('utilisateur',)
+
+
+class SuppressionAdmin(GrandeTableAdmin):
+    list_display = ('modele', 'objet_id', 'utilisateur', 'date_suppression')
+    list_filter = ('modele',)
+    search_fields = ('=objet_id',)
+    raw_id_fields = ('utilisateur',)
+
+
+class EvenementMobileMoneyAdmin(GrandeTableAdmin):
+    # Table en ajout seul : consultation uniquement
+    list_display = ('id', 'transaction_id', 'date_reception')
+    search_fields = ('=transaction_id', '=id')
+    date_hierarchy = 'date_reception'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class RapprochementMobileMoneyAdmin(GrandeTableAdmin):
+    list_display = ('evenement', 'statut', 'paiement', 'motif', 'tentatives', 'date_traitement')
+    list_filter = ('statut',)
+    list_select_related = ('evenement',)
+    search_fields = ('=evenement__transaction_id', '=paiement__id')
+    raw_id_fields = ('evenement', 'paiement')
+
+
+class RelanceAdmin(GrandeTableAdmin):
+    list_display = ('id', 'locataire', 'periode', 'nature', 'date_creation', 'date_email')
+    list_filter = ('nature',)
+    list_select_related = ('locataire',)
+    search_fields = ('=id', '^locataire__username')
+    raw_id_fields = ('locataire', 'message')
+    date_hierarchy = 'periode'
+
+
 admin.site.register(CustomUser, CustomUserAdmin)
-admin.site.register(Property)
+admin.site.register(Property, PropertyAdmin)
+admin.site.register(Contract, ContractAdmin)
+admin.site.register(Payment, PaymentAdmin)
+admin.site.register(Message, MessageAdmin)
+admin.site.register(Echeance, EcheanceAdmin)
+admin.site.register(CycleFacturation, CycleFacturationAdmin)
+admin.site.register(MessageArchive, MessageArchiveAdmin)
+admin.site.register(PaymentArchive, PaymentArchiveAdmin)
+admin.site.register(FichierContenu, FichierContenuAdmin)
+admin.site.register(RequeteIdempotente, RequeteIdempotenteAdmin)
+admin.site.register(TeleversementConfirme, TeleversementConfirmeAdmin)
+admin.site.register(Suppression, SuppressionAdmin)
+admin.site.register(EvenementMobileMoney, EvenementMobileMoneyAdmin)
+admin.site.register(RapprochementMobileMoney, RapprochementMobileMoneyAdmin)
+admin.site.register(Relance, RelanceAdmin)
@@ -4,3 +4,20 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate, pre_delete, post_save, post_delete
+        from utils.db_pool import statistiques_pools
+        from utils.metrics import installer_chronometre_sql, registre
+        from .disponibilite import installer_triggers_sqlite
+        from .models import CustomUser, Property, ImageLogement, Contract, Payment, Message
+        from .synchronisation import enregistrer_suppression, toucher_logement
+
+        connection_created.connect(installer_chronometre_sql)
+        registre.ajouter_collecteur(statistiques_pools)
+        post_migrate.connect(installer_triggers_sqlite, sender=self)
+        for modele in (CustomUser, Property, ImageLogement, Contract, Payment, Message):
+            pre_delete.connect(enregistrer_suppression, sender=modele)
+        post_save.connect(toucher_logement, sender=ImageLogement)
+        post_delete.connect(toucher_logement, sender=ImageLogement)
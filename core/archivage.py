@@ -0,0 +1,95 @@
+# core/archivage.py
+
+import datetime
+import time
+from contextvars import ContextVar
+from itertools import chain
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Contract, Echeance, Message, MessageArchive, Payment, PaymentArchive, Relance, \
+    RapprochementMobileMoney
+
+# ?archives=1 sur les listes de messages et de paiements
+PARAMETRE = 'archives'
+VRAI = ('1', 'true', 'oui')
+
+# Actif pendant deplacer() : pas de pierre tombale pour les lignes archivées (core.synchronisation)
+deplacement_en_cours = ContextVar('deplacement_en_cours', default=False)
+
+
+def inclure_archives(request):
+    return request.query_params.get(PARAMETRE, '').lower() in VRAI
+
+
+def messages_a_archiver(jours=None):
+    limite = timezone.now() - datetime.timedelta(days=jours or settings.ARCHIVE_MESSAGES_JOURS)
+    # Le texte d'une relance pas encore envoyée par e-mail est lu à l'envoi : son message reste
+    relance_a_envoyer = Relance.objects.filter(message=OuterRef('pk'), date_email__isnull=True)
+    return Message.objects.filter(date_envoi__lt=limite).exclude(Exists(relance_a_envoyer))
+
+
+def paiements_a_archiver(jours=None):
+    """Paiements validés dont le contrat (même locataire, même logement) est terminé depuis ``jours``."""
+    limite = timezone.localdate() - datetime.timedelta(days=jours or settings.ARCHIVE_PAIEMENTS_JOURS)
+    contrat_en_cours = Contract.objects.filter(
+        locataire=OuterRef('locataire'), logement=OuterRef('logement'), date_fin__gte=limite
+    )
+    # Les paiements rattachés à une échéance ou à un rapprochement Mobile Money à valider restent
+    # en table chaude : la suppression viderait Echeance.paiement ou RapprochementMobileMoney.paiement
+    echeance = Echeance.objects.filter(paiement=OuterRef('pk'))
+    rapprochement = RapprochementMobileMoney.objects.filter(paiement=OuterRef('pk'),
+                                                            statut=RapprochementMobileMoney.A_VALIDER)
+    return Payment.objects.filter(est_valide=True).exclude(Exists(contrat_en_cours)).exclude(
+        Exists(echeance)).exclude(Exists(rapprochement))
+
+
+def deplacer(eligibles, modele_archive, taille_lot=None, pause=0, progression=None):
+    """Déplace les lignes ``eligibles`` vers ``modele_archive`` par lots, une transaction courte par lot.
+
+    Les lignes verrouillées par une autre transaction sont sautées (SKIP LOCKED) et
+    reprises au passage suivant ; ``pause`` laisse respirer la base et les réplicas.
+    """
+    taille_lot = taille_lot or settings.ARCHIVE_TAILLE_LOT
+    modele = eligibles.model
+    # Colonnes communes (date_modification ne sert qu'à la synchronisation des tables chaudes)
+    colonnes_archive = {champ.attname for champ in modele_archive._meta.concrete_fields}
+    champs = [champ.attname for champ in modele._meta.concrete_fields if champ.attname in colonnes_archive]
+    total = 0
+    while True:
+        with transaction.atomic():
+            lignes = list(eligibles.order_by('pk').select_for_update(skip_locked=True)
+                          .values(*champs)[:taille_lot])
+            if not lignes:
+                break
+            modele_archive.objects.bulk_create([modele_archive(**ligne) for ligne in lignes], ignore_conflicts=True)
+            jeton = deplacement_en_cours.set(True)
+            try:
+                modele.objects.filter(pk__in=[ligne['id'] for ligne in lignes]).delete()
+            finally:
+                deplacement_en_cours.reset(jeton)
+        total += len(lignes)
+        if progression:
+            progression(total)
+        if pause:
+            time.sleep(pause)
+    return total
+
+
+def archiver_messages(**kwargs):
+    jours = kwargs.pop('jours', None)
+    return deplacer(messages_a_archiver(jours), MessageArchive, **kwargs)
+
+
+def archiver_paiements(**kwargs):
+    jours = kwargs.pop('jours', None)
+    return deplacer(paiements_a_archiver(jours), PaymentArchive, **kwargs)
+
+
+def avec_archives(chaud, froid, champ_date, recents_d_abord=False):
+    """Lignes chaudes et archivées d'une même liste, triées ensemble par ``champ_date`` puis id."""
+    return sorted(chain(chaud, froid), key=attrgetter(champ_date, 'id'), reverse=recents_d_abord)
@@ -0,0 +1,165 @@
+# core/async_views.py
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from utils.streaming import reponse_flux_async
+from .db_router import replicas, ecriture_recente, activer_lecture_replica, desactiver_lecture_replica
+from .disponibilite import avec_occupation, filtrer_disponibles, filtrer_criteres, logements_locataire
+from .models import Property, Contract, Payment, Message, CustomUser
+from .projections import PaymentProjection, MessageProjection
+from .proximite import filtrer_proximite, recherche_geographique
+from .serializers import PropertySerializer, ContractSerializer, PaymentSerializer, MessageSerializer, \
+    ProfileSerializer
+
+# Lectures servies en async sous ASGI (ASYNC_READ_VIEWS=True) : l'attente de la base
+# ne bloque plus un worker. Les écritures restent traitées par les viewsets DRF.
+
+_jwt = JWTAuthentication()
+_renderer = JSONRenderer()
+
+
+def reponse_json(data, status=200, headers=None):
+    # Même rendu que DRF (JSONRenderer) pour garder des réponses identiques octet par octet
+    return HttpResponse(_renderer.render(data), status=status, headers=headers,
+                        content_type='application/json')
+
+
+async def utilisateur_jwt(request):
+    """Authentifie la requête comme JWTAuthentication, sans requête SQL synchrone."""
+    entete = _jwt.get_header(request)
+    if entete is None:
+        raise exceptions.NotAuthenticated()
+    jeton_brut = _jwt.get_raw_token(entete)
+    if jeton_brut is None:
+        raise exceptions.NotAuthenticated()
+    jeton = _jwt.get_validated_token(jeton_brut)
+    try:
+        user_id = jeton[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise exceptions.AuthenticationFailed("Token contained no recognizable user identification")
+    user = await CustomUser.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+    if user is None or not user.is_active:
+        raise exceptions.AuthenticationFailed("User not found or inactive", code='user_not_found')
+    return user
+
+
+def lecture_async(fonction):
+    """Décore une lecture async : authentification JWT, erreurs au format DRF, réplica."""
+    async def vue(request, *args, **kwargs):
+        try:
+            request.user = await utilisateur_jwt(request)
+        except exceptions.APIException as exc:
+            data = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+            return reponse_json(data, status=401, headers={'WWW-Authenticate': _jwt.authenticate_header(request)})
+        if not replicas() or await sync_to_async(ecriture_recente)(request.user):
+            return await fonction(request, *args, **kwargs)
+        jeton = activer_lecture_replica()
+        try:
+            return await fonction(request, *args, **kwargs)
+        finally:
+            desactiver_lecture_replica(jeton)
+    return vue
+
+
+async def serialiser(serializer_class, instance, request, many=False):
+    # Les SerializerMethodField peuvent encore interroger la base : on sérialise hors de la boucle
+    return await sync_to_async(
+        lambda: serializer_class(instance, many=many, context={'request': request}).data
+    )()
+
+
+@lecture_async
+async def me(request):
+    return reponse_json(await serialiser(ProfileSerializer, request.user, request))
+
+
+@lecture_async
+async def logements(request):
+    user = request.user
+    params = request.GET
+    if user.role == "admin":
+        queryset = Property.objects.filter(proprietaire=user)
+    else:
+        queryset = logements_locataire(user, recherche_geographique(params))
+    try:
+        queryset = filtrer_proximite(filtrer_criteres(filtrer_disponibles(queryset, params), params), params)
+    except exceptions.ValidationError as exc:
+        return reponse_json(exc.detail, status=400)
+    queryset = avec_occupation(queryset).prefetch_related('images', 'contract_set')
+    return reponse_json(await serialiser(PropertySerializer, [p async for p in queryset], request, many=True))
+
+
+@lecture_async
+async def contrats(request):
+    user = request.user
+    if user.role == 'admin':
+        queryset = Contract.objects.filter(logement__proprietaire=user)
+    else:
+        queryset = Contract.objects.filter(locataire=user)
+    queryset = queryset.select_related('locataire', 'logement').prefetch_related(
+        'logement__images', 'logement__contract_set'
+    )
+    return reponse_json(await serialiser(ContractSerializer, [c async for c in queryset], request, many=True))
+
+
+@lecture_async
+async def paiements(request):
+    user = request.user
+    if user.role == 'admin':
+        queryset = Payment.objects.filter(logement__proprietaire=user)
+    else:
+        queryset = Payment.objects.filter(locataire=user)
+    queryset = queryset.select_related('locataire', 'logement__proprietaire').order_by('pk')
+    if settings.STREAMING_LISTES:
+        projection = PaymentProjection({'request': request})
+        return await reponse_flux_async(projection.lignes(queryset), projection.projeter)
+    return reponse_json(await serialiser(PaymentSerializer, [p async for p in queryset], request, many=True))
+
+
+@lecture_async
+async def messages(request):
+    user = request.user
+    queryset = Message.objects.filter(Q(expediteur=user) | Q(destinataire=user)).select_related(
+        'expediteur', 'destinataire'
+    )
+    if settings.STREAMING_LISTES:
+        projection = MessageProjection({'request': request})
+        return await reponse_flux_async(projection.lignes(queryset), projection.projeter)
+    return reponse_json(await serialiser(MessageSerializer, [m async for m in queryset], request, many=True))
+
+
+@lecture_async
+async def conversation(request, user_id=None):
+    user = request.user
+    destinataire = await CustomUser.objects.filter(id=user_id).afirst()
+    if destinataire is None:
+        return reponse_json({'detail': 'Utilisateur introuvable'}, status=404)
+
+    queryset = Message.objects.filter(
+        Q(expediteur=user, destinataire=destinataire) |
+        Q(expediteur=destinataire, destinataire=user)
+    ).order_by('date_envoi').select_related('expediteur', 'destinataire')
+    return reponse_json(await serialiser(MessageSerializer, [m async for m in queryset], request, many=True))
+
+
+def hybride(lecture, vue_drf):
+    """GET servi par la lecture async, autres méthodes déléguées à la vue DRF synchrone."""
+    vue_drf_async = sync_to_async(vue_drf)
+
+    @csrf_exempt
+    async def vue(request, *args, **kwargs):
+        # Lectures incluant les archives (?archives=1) : chemin DRF
+        if request.method == 'GET' and 'archives' not in request.GET:
+            return await lecture(request, *args, **kwargs)
+        return await vue_drf_async(request, *args, **kwargs)
+    # Requêtes groupées (core.regroupement) : exécutées directement par le viewset
+    vue.vue_drf = vue_drf
+    return vue
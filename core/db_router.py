@@ -0,0 +1,134 @@
+# core/db_router.py
+
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger('core.db_router')
+
+# Actif pendant une requête en lecture seule : les SELECT partent vers un réplica
+_lecture_replica = ContextVar('lecture_replica', default=False)
+
+# Santé des réplicas, propre au processus : alias -> (sain, vérifié_le)
+_sante = {}
+_verrou_sante = threading.Lock()
+
+SQL_RETARD_POSTGRES = """
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+"""
+
+
+def replicas():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+def activer_lecture_replica():
+    return _lecture_replica.set(True)
+
+
+def desactiver_lecture_replica(jeton):
+    _lecture_replica.reset(jeton)
+
+
+def cle_ecriture(user_id):
+    return f'replica:ecriture:{user_id}'
+
+
+def marquer_ecriture(user):
+    # Lecture de ses propres écritures : l'utilisateur reste sur le primaire un court instant
+    if user is not None and user.is_authenticated and settings.REPLICA_STICKY_SECONDS:
+        cache.set(cle_ecriture(user.pk), 1, settings.REPLICA_STICKY_SECONDS)
+
+
+def ecriture_recente(user):
+    if user is None or not user.is_authenticated:
+        return False
+    return cache.get(cle_ecriture(user.pk)) is not None
+
+
+def replica_sain(alias):
+    maintenant = time.monotonic()
+    etat = _sante.get(alias)
+    if etat is not None and maintenant - etat[1] < settings.REPLICA_HEALTH_INTERVAL:
+        return etat[0]
+    with _verrou_sante:
+        etat = _sante.get(alias)
+        if etat is not None and maintenant - etat[1] < settings.REPLICA_HEALTH_INTERVAL:
+            return etat[0]
+        sain = verifier_replica(alias)
+        if etat is not None and etat[0] != sain:
+            logger.warning("Réplica %s %s", alias, "rétabli" if sain else "écarté")
+        _sante[alias] = (sain, maintenant)
+        return sain
+
+
+def verifier_replica(alias):
+    connexion = connections[alias]
+    try:
+        connexion.ensure_connection()
+        if settings.REPLICA_MAX_LAG_SECONDS and connexion.vendor == 'postgresql':
+            with connexion.cursor() as curseur:
+                curseur.execute(SQL_RETARD_POSTGRES)
+                retard = float(curseur.fetchone()[0] or 0)
+            if retard > settings.REPLICA_MAX_LAG_SECONDS:
+                logger.warning("Réplica %s en retard de %.1f s", alias, retard)
+                return False
+        return True
+    except Exception as exc:
+        logger.warning("Réplica %s indisponible : %s", alias, exc)
+        connexion.close()
+        return False
+
+
+class ReplicaRouter:
+    """Envoie les lectures vers un réplica sain quand le mode lecture est actif.
+
+    Sans réplica configuré, ou hors du mode lecture, tout reste sur ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Relations chargées depuis une instance : même base que l'instance
+            return instance._state.db
+        if not _lecture_replica.get():
+            return DEFAULT_DB_ALIAS
+        candidats = [alias for alias in replicas() if replica_sain(alias)]
+        if not candidats:
+            return DEFAULT_DB_ALIAS
+        return random.choice(candidats)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaire et réplicas contiennent les mêmes données
+        return True
+
+
+class LectureReplicaMixin:
+    """Viewsets : requêtes GET/HEAD/OPTIONS lues sur un réplica, écritures marquées collantes."""
+
+    _jeton_replica = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Authentification faite (sur le primaire) : le reste de la requête peut lire un réplica
+        if request.method in SAFE_METHODS and replicas() and not ecriture_recente(request.user):
+            self._jeton_replica = activer_lecture_replica()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._jeton_replica is not None:
+            desactiver_lecture_replica(self._jeton_replica)
+            self._jeton_replica = None
+        elif request.method not in SAFE_METHODS and response.status_code < 400:
+            marquer_ecriture(getattr(request, 'user', None))
+        return super().finalize_response(request, response, *args, **kwargs)
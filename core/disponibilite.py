@@ -0,0 +1,153 @@
+# core/disponibilite.py
+
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Contract, Property, LOGEMENT_TYPES
+
+# Nom de la contrainte posée en base (exclusion GiST sous Postgres, triggers sous SQLite)
+CONTRAINTE_CHEVAUCHEMENT = 'contrat_sans_chevauchement'
+
+FENETRE_DEFAUT = 365
+FENETRE_MAX = 3 * 366
+
+# SQLite n'a pas de contrainte d'exclusion : deux triggers refusent les chevauchements.
+# Recréés après chaque migrate, car SQLite reconstruit la table à certaines modifications.
+TRIGGERS_SQLITE = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {CONTRAINTE_CHEVAUCHEMENT}_insert BEFORE INSERT ON core_contract
+    WHEN EXISTS (SELECT 1 FROM core_contract WHERE logement_id = NEW.logement_id
+                 AND date_debut <= NEW.date_fin AND date_fin >= NEW.date_debut)
+    BEGIN SELECT RAISE(ABORT, '{CONTRAINTE_CHEVAUCHEMENT}'); END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {CONTRAINTE_CHEVAUCHEMENT}_update
+    BEFORE UPDATE OF logement_id, date_debut, date_fin ON core_contract
+    WHEN EXISTS (SELECT 1 FROM core_contract WHERE logement_id = NEW.logement_id AND id != NEW.id
+                 AND date_debut <= NEW.date_fin AND date_fin >= NEW.date_debut)
+    BEGIN SELECT RAISE(ABORT, '{CONTRAINTE_CHEVAUCHEMENT}'); END
+    """,
+]
+
+
+def installer_triggers_sqlite(sender, using='default', **kwargs):
+    from django.db import connections
+
+    connexion = connections[using]
+    if connexion.vendor != 'sqlite' or 'core_contract' not in connexion.introspection.table_names():
+        return
+    with connexion.cursor() as curseur:
+        for sql in TRIGGERS_SQLITE:
+            curseur.execute(sql)
+
+
+def contrats_sur(du, au):
+    # Bornes incluses des deux côtés, comme date_debut / date_fin
+    return Contract.objects.filter(date_debut__lte=au, date_fin__gte=du)
+
+
+def avec_occupation(logements, jour=None):
+    """Annote ``loue`` : un contrat couvre ``jour`` (aujourd'hui par défaut)."""
+    jour = jour or timezone.localdate()
+    return logements.annotate(loue=Exists(contrats_sur(jour, jour).filter(logement=OuterRef('pk'))))
+
+
+def logements_locataire(locataire, decouverte=False):
+    """Logements des contrats du locataire ; avec ``decouverte``, aussi tous ceux libres aujourd'hui.
+
+    La découverte sert la recherche géographique d'un locataire qui cherche un logement près de lui.
+    """
+    visibles = Q(Exists(Contract.objects.filter(locataire=locataire, logement=OuterRef('pk'))))
+    if decouverte:
+        jour = timezone.localdate()
+        visibles |= ~Q(Exists(contrats_sur(jour, jour).filter(logement=OuterRef('pk'))))
+    return Property.objects.filter(visibles)
+
+
+def est_loue(logement, jour=None):
+    if hasattr(logement, 'loue'):
+        return logement.loue
+    jour = jour or timezone.localdate()
+    return contrats_sur(jour, jour).filter(logement=logement).exists()
+
+
+def lire_date(params, cle, defaut=None):
+    valeur = params.get(cle)
+    if not valeur:
+        return defaut
+    try:
+        return datetime.date.fromisoformat(valeur)
+    except ValueError:
+        raise ValidationError({cle: "Format attendu : AAAA-MM-JJ."})
+
+
+def lire_intervalle(params, cle_du, cle_au, defaut_du=None, defaut_au=None):
+    du = lire_date(params, cle_du, defaut_du)
+    au = lire_date(params, cle_au, defaut_au or du)
+    du = du or au
+    if du and au and au < du:
+        raise ValidationError({cle_au: "La date de fin doit être postérieure à la date de début."})
+    return du, au
+
+
+def filtrer_disponibles(logements, params):
+    """?disponible_du=...&disponible_au=... : logements sans contrat sur tout ou partie de l'intervalle."""
+    du, au = lire_intervalle(params, 'disponible_du', 'disponible_au')
+    if du is None:
+        return logements
+    return logements.filter(~Exists(contrats_sur(du, au).filter(logement=OuterRef('pk'))))
+
+
+def filtrer_criteres(logements, params):
+    """?type_logement=...&loyer_min=...&loyer_max=... (bornes incluses)."""
+    if params.get('type_logement'):
+        types = dict(LOGEMENT_TYPES)
+        if params['type_logement'] not in types:
+            raise ValidationError({'type_logement': f"Valeurs possibles : {', '.join(types)}."})
+        logements = logements.filter(type_logement=params['type_logement'])
+    for cle, lookup in (('loyer_min', 'loyer_mensuel__gte'), ('loyer_max', 'loyer_mensuel__lte')):
+        if params.get(cle):
+            try:
+                montant = Decimal(params[cle])
+            except InvalidOperation:
+                raise ValidationError({cle: "Montant attendu."})
+            if not montant.is_finite():
+                raise ValidationError({cle: "Montant attendu."})
+            logements = logements.filter(**{lookup: montant})
+    return logements
+
+
+def fenetre_calendrier(params):
+    aujourd_hui = timezone.localdate()
+    du, au = lire_intervalle(params, 'du', 'au', aujourd_hui, aujourd_hui + datetime.timedelta(days=FENETRE_DEFAUT))
+    if (au - du).days > FENETRE_MAX:
+        raise ValidationError({'au': f"Fenêtre limitée à {FENETRE_MAX} jours."})
+    return du, au
+
+
+def calendrier(logements, du, au):
+    """Périodes occupées et libres de chaque logement entre ``du`` et ``au`` (une seule requête)."""
+    logements = list(logements.values('id', 'nom'))
+    occupations = {logement['id']: [] for logement in logements}
+    for contrat in contrats_sur(du, au).filter(logement_id__in=occupations).order_by(
+        'logement_id', 'date_debut'
+    ).values('id', 'logement_id', 'date_debut', 'date_fin'):
+        occupations[contrat['logement_id']].append(contrat)
+
+    resultat = []
+    for logement in logements:
+        occupe, libre, curseur = [], [], du
+        for contrat in occupations[logement['id']]:
+            debut, fin = max(contrat['date_debut'], du), min(contrat['date_fin'], au)
+            if debut > curseur:
+                libre.append({'debut': curseur, 'fin': debut - datetime.timedelta(days=1)})
+            occupe.append({'debut': debut, 'fin': fin, 'contrat': contrat['id']})
+            curseur = max(curseur, fin + datetime.timedelta(days=1))
+        if curseur <= au:
+            libre.append({'debut': curseur, 'fin': au})
+        resultat.append({'logement': logement['id'], 'nom': logement['nom'], 'occupe': occupe, 'libre': libre})
+    return resultat
@@ -0,0 +1,111 @@
+# core/facturation.py
+
+import calendar
+import datetime
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Contract, ChargeRecurrente, Echeance, CycleFacturation
+
+MOIS = ('Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin',
+        'Juillet', 'Août', 'Septembre', 'Octobre', 'Novembre', 'Décembre')
+
+
+def periode_depuis(texte):
+    """'2025-06' -> date(2025, 6, 1) ; lève ValueError si le format est invalide."""
+    return datetime.datetime.strptime(texte, '%Y-%m').date()
+
+
+def libelle_mois(periode):
+    # Même format que Payment.mois_concerne : "Juin 2025"
+    return f"{MOIS[periode.month - 1]} {periode.year}"
+
+
+def motif_mois(periode):
+    """Expression régulière (__iregex) du libellé saisi à la main : casse, espaces et accents libres.
+
+    Payment.mois_concerne est tapé par le locataire : "juin 2025", " Juin  2025" ou "Fevrier 2025"
+    désignent le même mois que libelle_mois().
+    """
+    mois = re.escape(MOIS[periode.month - 1]).replace('é', '[ée]').replace('û', '[uû]')
+    return rf'^\s*{mois}\s+{periode.year}\s*$'
+
+
+def fin_de_mois(periode):
+    return periode.replace(day=calendar.monthrange(periode.year, periode.month)[1])
+
+
+def contrats_actifs(periode, proprietaire=None):
+    contrats = Contract.objects.filter(date_debut__lte=fin_de_mois(periode), date_fin__gte=periode)
+    if proprietaire is not None:
+        contrats = contrats.filter(logement__proprietaire=proprietaire)
+    return contrats
+
+
+def lancer_facturation(periode, proprietaire=None, forcer=False, taille_lot=None, progression=None):
+    """Crée les échéances du mois pour tous les contrats actifs (ou ceux d'un propriétaire).
+
+    Les contrats sont parcourus par clé croissante, un lot par transaction ; le curseur
+    du cycle avance dans la même transaction que les insertions, donc une facturation
+    interrompue reprend au lot suivant. La contrainte d'unicité sur (contrat, type, mois)
+    rend toute relance sans effet sur les échéances déjà créées.
+    """
+    taille_lot = taille_lot or settings.FACTURATION_TAILLE_LOT
+    cycle, _ = CycleFacturation.objects.get_or_create(periode=periode, proprietaire=proprietaire)
+    if cycle.statut == CycleFacturation.TERMINE:
+        if not forcer:
+            return cycle
+        # Nouveau passage complet, pour les contrats ajoutés depuis
+        CycleFacturation.objects.filter(pk=cycle.pk).update(
+            statut=CycleFacturation.EN_COURS, dernier_contrat=0, nb_contrats=0, date_fin=None
+        )
+
+    contrats = contrats_actifs(periode, proprietaire).order_by('pk').values_list(
+        'pk', 'locataire_id', 'logement_id', 'logement__loyer_mensuel'
+    )
+    mois_concerne = libelle_mois(periode)
+    date_limite = periode.replace(day=min(settings.FACTURATION_JOUR_LIMITE, fin_de_mois(periode).day))
+
+    while True:
+        with transaction.atomic():
+            # Verrou sur le cycle : deux facturations simultanées du même mois s'enchaînent lot par lot
+            cycle = CycleFacturation.objects.select_for_update().get(pk=cycle.pk)
+            if cycle.statut == CycleFacturation.TERMINE:
+                break
+            lot = list(contrats.filter(pk__gt=cycle.dernier_contrat)[:taille_lot])
+            if not lot:
+                echeances = Echeance.objects.filter(periode=periode)
+                if proprietaire is not None:
+                    echeances = echeances.filter(logement__proprietaire=proprietaire)
+                cycle.statut = CycleFacturation.TERMINE
+                cycle.nb_echeances = echeances.count()
+                cycle.date_fin = timezone.now()
+                cycle.save(update_fields=['statut', 'nb_echeances', 'date_fin'])
+                break
+
+            charges = defaultdict(list)
+            for logement_id, type_charge, montant in ChargeRecurrente.objects.filter(
+                logement_id__in={ligne[2] for ligne in lot}, active=True
+            ).values_list('logement_id', 'type_charge', 'montant'):
+                charges[logement_id].append((type_charge, montant))
+
+            nouvelles = []
+            for contrat_id, locataire_id, logement_id, loyer in lot:
+                for type_charge, montant in [('loyer', loyer)] + charges[logement_id]:
+                    nouvelles.append(Echeance(
+                        contrat_id=contrat_id, locataire_id=locataire_id, logement_id=logement_id,
+                        type_charge=type_charge, montant=montant, periode=periode,
+                        mois_concerne=mois_concerne, date_limite=date_limite,
+                    ))
+            Echeance.objects.bulk_create(nouvelles, batch_size=1000, ignore_conflicts=True)
+
+            cycle.dernier_contrat = lot[-1][0]
+            cycle.nb_contrats += len(lot)
+            cycle.save(update_fields=['dernier_contrat', 'nb_contrats'])
+        if progression:
+            progression(cycle)
+    return cycle
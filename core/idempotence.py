@@ -0,0 +1,160 @@
+# core/idempotence.py
+
+import datetime
+import hashlib
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import RequeteIdempotente
+
+EN_TETE = 'Idempotency-Key'
+EN_TETE_REJEU = 'Idempotent-Replayed'
+
+
+class CleReutilisee(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "Cette clé d'idempotence a déjà servi pour une autre requête."
+    default_code = 'idempotency_key_reused'
+
+
+class RequeteEnCours(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Une requête avec cette clé d'idempotence est encore en cours, réessayez."
+    default_code = 'idempotency_key_in_use'
+
+
+class Rejeu(Exception):
+    def __init__(self, requete):
+        self.requete = requete
+
+
+def empreinte(request):
+    """Méthode, chemin et corps : une même clé ne peut pas resservir pour une autre requête."""
+    h = hashlib.sha256(f'{request.method} {request.get_full_path()}\n'.encode())
+    if request.content_type.startswith('multipart/'):
+        # Pas de lecture brute du corps (fichiers volumineux) : champs et nom/taille des fichiers
+        for champ in sorted(request.data.keys()):
+            for valeur in request.data.getlist(champ):
+                if hasattr(valeur, 'size'):
+                    valeur = f'{valeur.name}:{valeur.size}'
+                h.update(f'{champ}={valeur}\n'.encode())
+    else:
+        h.update(request.body)
+    return h.hexdigest()
+
+
+def reserver(user, cle, signature):
+    """Réserve la clé ; renvoie (requête, True) pour l'exécuter ou (requête terminée, False) à rejouer.
+
+    La contrainte unique (utilisateur, cle) sert de verrou : un doublon concurrent attend
+    la fin de la première exécution (IDEMPOTENCE_ATTENTE) au lieu de refaire le travail.
+    """
+    fin = time.monotonic() + settings.IDEMPOTENCE_ATTENTE
+    while True:
+        maintenant = timezone.now()
+        try:
+            with transaction.atomic():
+                return RequeteIdempotente.objects.create(
+                    utilisateur=user, cle=cle, empreinte=signature,
+                    date_expiration=maintenant + datetime.timedelta(seconds=settings.IDEMPOTENCE_TTL),
+                ), True
+        except IntegrityError:
+            pass
+
+        existante = RequeteIdempotente.objects.filter(utilisateur=user, cle=cle).first()
+        if existante is None:
+            continue
+        abandonnee = (existante.statut == RequeteIdempotente.EN_COURS and
+                      existante.date_creation < maintenant - datetime.timedelta(seconds=settings.IDEMPOTENCE_VERROU))
+        if existante.date_expiration <= maintenant or abandonnee:
+            # Expirée, ou worker tué en cours d'exécution : la clé redevient libre
+            RequeteIdempotente.objects.filter(pk=existante.pk).delete()
+            continue
+        if existante.empreinte != signature:
+            raise CleReutilisee()
+        if existante.statut == RequeteIdempotente.TERMINE:
+            return existante, False
+        if time.monotonic() >= fin:
+            raise RequeteEnCours()
+        time.sleep(0.05)
+
+
+def enregistrer(requete, response):
+    if response.status_code >= 500:
+        # Échec serveur : rien à rejouer, la prochaine tentative réexécute la requête
+        liberer(requete)
+        return
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    RequeteIdempotente.objects.filter(pk=requete.pk).update(
+        statut=RequeteIdempotente.TERMINE,
+        code_http=response.status_code,
+        type_contenu=response.get('Content-Type', ''),
+        reponse=response.content,
+    )
+
+
+def liberer(requete):
+    RequeteIdempotente.objects.filter(pk=requete.pk).delete()
+
+
+def rejouer(requete):
+    response = HttpResponse(bytes(requete.reponse or b''), status=requete.code_http,
+                            content_type=requete.type_contenu or None)
+    response[EN_TETE_REJEU] = 'true'
+    return response
+
+
+class IdempotenceMixin:
+    """POST portant un en-tête Idempotency-Key : exécutés une seule fois, la réponse est rejouée
+    aux nouvelles tentatives du client pendant IDEMPOTENCE_TTL."""
+
+    _idempotence = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        cle = request.headers.get(EN_TETE)
+        if request.method != 'POST' or not cle or not request.user.is_authenticated:
+            return
+        if len(cle) > 255:
+            raise ValidationError({EN_TETE: "255 caractères au maximum."})
+        requete, reservee = reserver(request.user, cle, empreinte(request))
+        if not reservee:
+            raise Rejeu(requete)
+        self._idempotence = requete
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Rejeu):
+            return rejouer(exc.requete)
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            # Exception non gérée (500) : la clé est libérée pour permettre une nouvelle tentative
+            if self._idempotence is not None:
+                liberer(self._idempotence)
+                self._idempotence = None
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self._idempotence is not None:
+            requete, self._idempotence = self._idempotence, None
+            enregistrer(requete, response)
+        return response
+
+
+def purger_expirees(taille_lot=1000):
+    """Supprime par lots les réponses expirées ; renvoie le nombre de lignes supprimées."""
+    total = 0
+    while True:
+        lot = list(RequeteIdempotente.objects.filter(date_expiration__lte=timezone.now())
+                   .values_list('pk', flat=True)[:taille_lot])
+        if not lot:
+            return total
+        total += RequeteIdempotente.objects.filter(pk__in=lot).delete()[0]
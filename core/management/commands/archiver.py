@@ -0,0 +1,39 @@
+# core/management/commands/archiver.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.archivage import archiver_messages, archiver_paiements, messages_a_archiver, paiements_a_archiver
+
+
+class Command(BaseCommand):
+    help = ("Déplace par lots les vieux messages et les paiements validés des contrats terminés "
+            "vers les tables d'archive (lisibles par l'API avec ?archives=1).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages-jours', type=int, help="Âge minimal des messages (ARCHIVE_MESSAGES_JOURS)")
+        parser.add_argument('--paiements-jours', type=int,
+                            help="Délai depuis la fin du contrat (ARCHIVE_PAIEMENTS_JOURS)")
+        parser.add_argument('--lot', type=int, help="Lignes par transaction (ARCHIVE_TAILLE_LOT)")
+        parser.add_argument('--pause', type=float, default=0, help="Pause entre deux lots (s)")
+        parser.add_argument('--dry-run', action='store_true', help="Compte les lignes éligibles sans rien déplacer")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f"Messages éligibles : {messages_a_archiver(options['messages_jours']).count()}")
+            self.stdout.write(f"Paiements éligibles : {paiements_a_archiver(options['paiements_jours']).count()}")
+            return
+
+        for nom, archiver, jours in (
+            ('messages', archiver_messages, options['messages_jours']),
+            ('paiements', archiver_paiements, options['paiements_jours']),
+        ):
+            debut = time.monotonic()
+            total = archiver(
+                jours=jours, taille_lot=options['lot'], pause=options['pause'],
+                progression=lambda n, nom=nom: self.stdout.write(f"{nom} : {n} archivés"),
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"{total} {nom} archivés en {time.monotonic() - debut:.1f} s"
+            ))
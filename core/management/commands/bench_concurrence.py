@@ -0,0 +1,134 @@
+# core/management/commands/bench_concurrence.py
+
+import asyncio
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import CustomUser
+
+DEPLOIEMENTS = {
+    'sync': {'app': 'config.wsgi', 'env': {'GUNICORN_WORKER_CLASS': 'sync', 'ASYNC_READ_VIEWS': 'False'}},
+    'asgi': {'app': 'config.asgi', 'env': {'GUNICORN_WORKER_CLASS': 'uvicorn.workers.UvicornWorker',
+                                           'ASYNC_READ_VIEWS': 'True'}},
+}
+
+
+class Command(BaseCommand):
+    help = ("Compare le nombre de connexions simultanées tenables par un processus "
+            "entre le déploiement WSGI synchrone et le déploiement ASGI (lectures async).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('utilisateur', help="Nom d'utilisateur existant utilisé pour le JWT")
+        parser.add_argument('--url', default='/api/messages/')
+        parser.add_argument('--niveaux', default='1,4,16,64,128,256',
+                            help="Niveaux de concurrence testés, séparés par des virgules")
+        parser.add_argument('--duree', type=float, default=5.0, help="Secondes par niveau")
+        parser.add_argument('--slo', type=float, default=500.0, help="p95 maximal accepté (ms)")
+        parser.add_argument('--deploiements', default='sync,asgi')
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['utilisateur'])
+        except CustomUser.DoesNotExist:
+            raise CommandError("Utilisateur introuvable.")
+        jeton = str(AccessToken.for_user(user))
+        niveaux = [int(n) for n in options['niveaux'].split(',')]
+
+        resultats = {}
+        for nom in options['deploiements'].split(','):
+            if nom not in DEPLOIEMENTS:
+                raise CommandError(f"Déploiement inconnu : {nom}")
+            self.stdout.write(f"== {nom} ({DEPLOIEMENTS[nom]['app']}, 1 worker)")
+            port = self.port_libre()
+            serveur = self.demarrer(DEPLOIEMENTS[nom], port)
+            try:
+                tenable = 0
+                for niveau in niveaux:
+                    stats = asyncio.run(self.charger(port, options['url'], jeton, niveau, options['duree']))
+                    ok = stats['erreurs'] == 0 and stats['p95'] <= options['slo']
+                    if ok:
+                        tenable = niveau
+                    self.stdout.write(
+                        f"  {niveau:4d} connexions : {stats['debit']:7.1f} req/s, "
+                        f"p50 {stats['p50']:6.0f} ms, p95 {stats['p95']:6.0f} ms, "
+                        f"{stats['erreurs']} erreurs {'' if ok else '(hors SLO)'}"
+                    )
+                resultats[nom] = tenable
+            finally:
+                serveur.send_signal(signal.SIGTERM)
+                serveur.wait(timeout=30)
+
+        self.stdout.write("Connexions simultanées tenables par processus "
+                          f"(p95 <= {options['slo']:.0f} ms, sans erreur) :")
+        for nom, tenable in resultats.items():
+            self.stdout.write(f"  {nom:5} : {tenable}")
+
+    @staticmethod
+    def port_libre():
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            return s.getsockname()[1]
+
+    def demarrer(self, deploiement, port, workers=1):
+        env = dict(os.environ, **deploiement['env'], PORT=str(port), WEB_CONCURRENCY=str(workers))
+        serveur = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', deploiement['app'], '-c', 'gunicorn.conf.py'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if serveur.poll() is not None:
+                raise CommandError("Le serveur s'est arrêté au démarrage.")
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return serveur
+            except OSError:
+                time.sleep(0.2)
+        serveur.kill()
+        raise CommandError("Le serveur n'a pas démarré à temps.")
+
+    async def charger(self, port, url, jeton, concurrence, duree):
+        requete = (
+            f"GET {url} HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {jeton}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode()
+        latences, erreurs = [], 0
+        fin = time.monotonic() + duree
+
+        async def client():
+            nonlocal erreurs
+            while time.monotonic() < fin:
+                debut = time.perf_counter()
+                try:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), 10)
+                    writer.write(requete)
+                    await writer.drain()
+                    reponse = await asyncio.wait_for(reader.read(), 30)
+                    writer.close()
+                    if not reponse.startswith(b'HTTP/1.1 200'):
+                        erreurs += 1
+                        continue
+                except (OSError, asyncio.TimeoutError):
+                    erreurs += 1
+                    continue
+                latences.append((time.perf_counter() - debut) * 1000)
+
+        debut = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrence)))
+        ecoule = time.perf_counter() - debut
+        latences.sort()
+        return {
+            'debit': len(latences) / ecoule,
+            'p50': statistics.median(latences) if latences else float('inf'),
+            'p95': latences[int(len(latences) * 0.95) - 1] if latences else float('inf'),
+            'erreurs': erreurs,
+        }
@@ -0,0 +1,121 @@
+# core/management/commands/bench_demarrage.py
+
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Exécuté dans un interpréteur neuf : mesure le coût d'amorçage d'un worker
+SCRIPT_IMPORT = """
+import os, resource, time
+debut = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+from config.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+duree = time.perf_counter() - debut
+print(duree, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps d'import de l'application et la mémoire (RSS/PSS) de chaque worker gunicorn."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repetitions', type=int, default=5)
+        parser.add_argument('--top', type=int, default=10, help="Modules les plus coûteux à afficher")
+        parser.add_argument('--workers', type=int, default=0,
+                            help="Lance gunicorn avec N workers et relève leur mémoire (Linux)")
+        parser.add_argument('--sans-preload', action='store_true')
+
+    def handle(self, *args, **options):
+        self.mesurer_import(options['repetitions'], options['top'])
+        if options['workers']:
+            self.mesurer_gunicorn(options['workers'], not options['sans_preload'])
+
+    def mesurer_import(self, repetitions, top):
+        durees, rss = [], []
+        for _ in range(repetitions):
+            sortie = self.executer(['-c', SCRIPT_IMPORT])
+            duree, maxrss = sortie.stdout.split()
+            durees.append(float(duree))
+            rss.append(int(maxrss) / 1024)
+        self.stdout.write(
+            f"Import application : médiane {statistics.median(durees) * 1000:.0f} ms "
+            f"(min {min(durees) * 1000:.0f} ms), RSS max {statistics.median(rss):.1f} Mo"
+        )
+
+        # Détail par module (-X importtime écrit sur stderr, en microsecondes)
+        sortie = self.executer(['-X', 'importtime', '-c', SCRIPT_IMPORT])
+        modules = []
+        for ligne in sortie.stderr.splitlines():
+            match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)', ligne)
+            if match and len(match.group(2)) <= 3:  # deux premiers niveaux d'import
+                modules.append((int(match.group(1)), match.group(3)))
+        self.stdout.write("Modules les plus coûteux (cumulé) :")
+        for cumul, nom in sorted(modules, reverse=True)[:top]:
+            self.stdout.write(f"  {cumul / 1000:8.1f} ms  {nom}")
+
+    def mesurer_gunicorn(self, workers, preload):
+        env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT='0',
+                   GUNICORN_PRELOAD='True' if preload else 'False')
+        debut = time.perf_counter()
+        maitre = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'config.wsgi', '-c', 'gunicorn.conf.py'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            enfants = self.attendre_workers(maitre.pid, workers)
+            pret = time.perf_counter() - debut
+            self.stdout.write(f"gunicorn ({'preload' if preload else 'sans preload'}) : "
+                              f"{len(enfants)} workers prêts en {pret:.2f} s")
+            total_pss = 0
+            for role, pid in [('maître', maitre.pid)] + [('worker', pid) for pid in enfants]:
+                rss, pss = self.memoire(pid)
+                total_pss += pss
+                self.stdout.write(f"  {role:7} {pid:>7} : RSS {rss / 1024:6.1f} Mo, PSS {pss / 1024:6.1f} Mo")
+            self.stdout.write(f"  PSS total : {total_pss / 1024:.1f} Mo")
+        finally:
+            maitre.send_signal(signal.SIGTERM)
+            maitre.wait(timeout=30)
+
+    @staticmethod
+    def attendre_workers(pid, nombre, delai=60):
+        limite = time.monotonic() + delai
+        while time.monotonic() < limite:
+            try:
+                with open(f'/proc/{pid}/task/{pid}/children') as f:
+                    enfants = [int(p) for p in f.read().split()]
+            except FileNotFoundError:
+                raise CommandError("gunicorn s'est arrêté au démarrage.")
+            if len(enfants) >= nombre:
+                # Laisse aux workers le temps de finir leur initialisation
+                time.sleep(1)
+                return enfants
+            time.sleep(0.1)
+        raise CommandError("Les workers gunicorn n'ont pas démarré à temps.")
+
+    @staticmethod
+    def memoire(pid):
+        # Valeurs en Ko ; PSS répartit les pages partagées entre processus
+        valeurs = {}
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for ligne in f:
+                cle, _, reste = ligne.partition(':')
+                if cle in ('Rss', 'Pss'):
+                    valeurs[cle] = int(reste.split()[0])
+        return valeurs.get('Rss', 0), valeurs.get('Pss', 0)
+
+    @staticmethod
+    def executer(arguments):
+        sortie = subprocess.run([sys.executable, *arguments], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True)
+        if sortie.returncode != 0:
+            raise CommandError(sortie.stderr[-2000:])
+        return sortie
@@ -0,0 +1,75 @@
+# core/management/commands/bench_pool.py
+
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from utils.db_pool import pools_ouverts
+
+
+class Command(BaseCommand):
+    help = ("Mesure la latence d'obtention d'une connexion sous charge concurrente "
+            "(pool psycopg si DB_POOL=True, sinon connexion ouverte à chaque requête).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--iterations', type=int, default=200, help="Emprunts par thread")
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        mode = 'pool' if connections[alias].settings_dict['OPTIONS'].get('pool') else (
+            f"sans pool (CONN_MAX_AGE={connections[alias].settings_dict['CONN_MAX_AGE']})")
+        latences, erreurs = [], []
+        verrou = threading.Lock()
+
+        def travail():
+            locales = []
+            connexion = connections[alias]
+            try:
+                for _ in range(options['iterations']):
+                    debut = time.perf_counter()
+                    try:
+                        connexion.ensure_connection()
+                    except Exception as exc:
+                        with verrou:
+                            erreurs.append(exc)
+                        continue
+                    locales.append(time.perf_counter() - debut)
+                    with connexion.cursor() as curseur:
+                        curseur.execute('SELECT 1')
+                    # Comme en fin de requête : rendue au pool, fermée ou conservée selon CONN_MAX_AGE
+                    connexion.close_if_unusable_or_obsolete()
+            finally:
+                connexion.close()
+                with verrou:
+                    latences.extend(locales)
+
+        debut = time.perf_counter()
+        threads = [threading.Thread(target=travail) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ecoule = time.perf_counter() - debut
+
+        latences.sort()
+
+        def centile(p):
+            return latences[min(len(latences) - 1, int(len(latences) * p))] * 1000
+
+        self.stdout.write(f"Mode : {mode}, {options['threads']} threads x {options['iterations']} emprunts")
+        if latences:
+            self.stdout.write(
+                f"Acquisition : p50 {statistics.median(latences) * 1000:.2f} ms, p95 {centile(0.95):.2f} ms, "
+                f"p99 {centile(0.99):.2f} ms, max {latences[-1] * 1000:.2f} ms"
+            )
+        self.stdout.write(f"Débit : {len(latences) / ecoule:.0f} emprunts/s, {len(erreurs)} erreurs")
+        if erreurs:
+            self.stdout.write(f"  Première erreur : {erreurs[0]!r}")
+        for nom, pool in pools_ouverts():
+            stats = pool.get_stats()
+            self.stdout.write(f"Pool {nom} : " + ', '.join(f"{cle}={valeur}" for cle, valeur in sorted(stats.items())))
@@ -0,0 +1,90 @@
+# core/management/commands/bench_projections.py
+
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import CustomUser
+from core.views import PaymentViewSet, MessageViewSet
+
+VUES = (
+    ('paiements', PaymentViewSet, '/api/paiements/'),
+    ('messages', MessageViewSet, '/api/messages/'),
+)
+
+
+class Command(BaseCommand):
+    help = ("Vérifie que les projections (core.projections) produisent le même JSON que les serializers "
+            "pour les listes d'un utilisateur, puis compare leur débit en lignes par seconde.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('utilisateur', help="Utilisateur dont on lit les listes")
+        parser.add_argument('--lignes', type=int, default=5000, help="Lignes lues par liste")
+        parser.add_argument('--repetitions', type=int, default=3, help="Mesures par méthode (meilleure gardée)")
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['utilisateur'])
+        except CustomUser.DoesNotExist:
+            raise CommandError("Utilisateur introuvable.")
+        renderer = JSONRenderer()
+        ecarts = 0
+
+        for nom, viewset, url in VUES:
+            # Même queryset et même contexte (URL absolues) que la vue de liste
+            vue = viewset(request=Request(APIRequestFactory().get(url)), format_kwarg=None, action='list')
+            vue.request.user = user
+            queryset = vue.get_queryset()[:options['lignes']]
+            contexte = vue.get_serializer_context()
+            serializer_class, projection = vue.get_serializer_class(), vue.projection_class(contexte)
+            # (lecture, conversion) : queryset.all() à chaque appel, pas de cache de résultats partagé
+            methodes = {
+                'serializer': (lambda: list(queryset.all()),
+                               lambda objets: serializer_class(objets, many=True, context=contexte).data),
+                'projection': (lambda: list(projection.lignes(queryset.all())), projection.projeter),
+            }
+
+            attendu, obtenu = (renderer.render(convertir(lire())) for lire, convertir in methodes.values())
+            n = queryset.count()
+            if attendu != obtenu:
+                ecarts += 1
+                self.stdout.write(self.style.ERROR(f"{nom} : JSON différent ({n} lignes)"))
+                self.afficher_ecart(renderer, attendu, obtenu)
+                continue
+            self.stdout.write(f"{nom} : {n} lignes, JSON identique ({len(attendu)} octets)")
+            if not n:
+                continue
+
+            durees = {}
+            for methode, (lire, convertir) in methodes.items():
+                lectures, conversions = [], []
+                for _ in range(options['repetitions']):
+                    debut = time.perf_counter()
+                    lignes = lire()
+                    milieu = time.perf_counter()
+                    convertir(lignes)
+                    lectures.append(milieu - debut)
+                    conversions.append(time.perf_counter() - milieu)
+                durees[methode] = min(lectures), min(conversions)
+                lecture, conversion = durees[methode]
+                self.stdout.write(f"  {methode:<10} lecture {lecture * 1000:7.1f} ms, conversion {conversion * 1000:7.1f} ms"
+                                  f" : {n / conversion:9.0f} lignes/s converties, "
+                                  f"{n / (lecture + conversion):8.0f} lignes/s au total")
+            (l_s, c_s), (l_p, c_p) = durees['serializer'], durees['projection']
+            self.stdout.write(f"  gain conversion ×{c_s / c_p:.1f}, total ×{(l_s + c_s) / (l_p + c_p):.1f}")
+
+        if ecarts:
+            raise CommandError(f"{ecarts} liste(s) non conforme(s).")
+
+    def afficher_ecart(self, renderer, attendu, obtenu):
+        # Premier objet qui diffère, pour situer le champ fautif
+        for a, b in zip(json.loads(attendu), json.loads(obtenu)):
+            if a != b:
+                self.stdout.write(f"  serializer : {renderer.render(a).decode()}")
+                self.stdout.write(f"  projection : {renderer.render(b).decode()}")
+                return
+        self.stdout.write(f"  longueurs : {len(attendu)} / {len(obtenu)} octets")
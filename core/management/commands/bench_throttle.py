@@ -0,0 +1,113 @@
+# core/management/commands/bench_throttle.py
+
+import asyncio
+import json
+import os
+import signal
+import statistics
+import time
+from collections import Counter
+
+from django.core.management.base import CommandError
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import CustomUser
+from utils.throttling import lire_taux
+from .bench_concurrence import Command as BenchConcurrence, DEPLOIEMENTS
+
+
+class Command(BenchConcurrence):
+    help = ("Test de charge du throttling : une boucle cliente en rafale sur /api/auth/login/ "
+            "pendant qu'un utilisateur légitime lit ses messages, avec puis sans seaux à jetons.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('utilisateur', help="Utilisateur légitime (JWT) dont on mesure la latence")
+        parser.add_argument('--attaquants', type=int, default=32, help="Connexions simultanées de la rafale")
+        parser.add_argument('--workers', type=int, default=4, help="Workers gunicorn (limite partagée via Redis)")
+        parser.add_argument('--duree', type=float, default=10.0, help="Secondes par scénario")
+        parser.add_argument('--url-victime', default='/api/messages/')
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['utilisateur'])
+        except CustomUser.DoesNotExist:
+            raise CommandError("Utilisateur introuvable.")
+        if not os.environ.get('REDIS_URL'):
+            self.stderr.write("REDIS_URL absent : chaque worker aura ses propres seaux (limite × workers).")
+        jeton = str(AccessToken.for_user(user))
+        taux = api_settings.DEFAULT_THROTTLE_RATES.get('connexion_ip')
+
+        for nom, env in (('sans throttling', {'THROTTLE_CONNEXION_IP': ''}), (f'avec throttling ({taux})', {})):
+            deploiement = dict(DEPLOIEMENTS['sync'], env=dict(DEPLOIEMENTS['sync']['env'], **env))
+            port = self.port_libre()
+            serveur = self.demarrer(deploiement, port, options['workers'])
+            try:
+                stats = asyncio.run(self.attaquer(port, jeton, options))
+            finally:
+                serveur.send_signal(signal.SIGTERM)
+                serveur.wait(timeout=30)
+
+            codes = stats['codes']
+            self.stdout.write(f"== {nom}, {options['workers']} workers, {options['attaquants']} attaquants")
+            self.stdout.write(f"  rafale  : {sum(codes.values())} requêtes, "
+                              f"{codes.get(401, 0)} mots de passe vérifiés, {codes.get(429, 0)} refusées (429), "
+                              f"autres {sum(n for c, n in codes.items() if c not in (401, 429))}")
+            if env == {} and taux:
+                capacite, periode = lire_taux(taux)
+                plafond = capacite + int(options['duree'] * capacite / periode)
+                self.stdout.write(f"  plafond théorique du seau : {plafond} vérifications")
+            self.stdout.write(f"  victime : {stats['victime_n']} lectures, p50 {stats['victime_p50']:.0f} ms, "
+                              f"p95 {stats['victime_p95']:.0f} ms, {stats['victime_erreurs']} erreurs")
+
+    async def attaquer(self, port, jeton, options):
+        corps = json.dumps({'username': 'inconnu', 'password': 'mauvais'}).encode()
+        rafale = (
+            f"POST /api/auth/login/ HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(corps)}\r\nConnection: close\r\n\r\n"
+        ).encode() + corps
+        lecture = (
+            f"GET {options['url_victime']} HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {jeton}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode()
+        fin = time.monotonic() + options['duree']
+        codes, latences, erreurs = Counter(), [], 0
+
+        async def envoyer(requete):
+            reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), 10)
+            writer.write(requete)
+            await writer.drain()
+            reponse = await asyncio.wait_for(reader.read(), 60)
+            writer.close()
+            return int(reponse[9:12])
+
+        async def attaquant():
+            while time.monotonic() < fin:
+                try:
+                    codes[await envoyer(rafale)] += 1
+                except (OSError, asyncio.TimeoutError, ValueError):
+                    codes['erreur'] += 1
+
+        async def victime():
+            nonlocal erreurs
+            while time.monotonic() < fin:
+                debut = time.perf_counter()
+                try:
+                    if await envoyer(lecture) != 200:
+                        erreurs += 1
+                        continue
+                except (OSError, asyncio.TimeoutError, ValueError):
+                    erreurs += 1
+                    continue
+                latences.append((time.perf_counter() - debut) * 1000)
+                await asyncio.sleep(0.1)
+
+        await asyncio.gather(victime(), *(attaquant() for _ in range(options['attaquants'])))
+        latences.sort()
+        return {
+            'codes': codes,
+            'victime_n': len(latences),
+            'victime_p50': statistics.median(latences) if latences else float('inf'),
+            'victime_p95': latences[max(0, int(len(latences) * 0.95) - 1)] if latences else float('inf'),
+            'victime_erreurs': erreurs,
+        }
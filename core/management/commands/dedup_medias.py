@@ -0,0 +1,114 @@
+# core/management/commands/dedup_medias.py
+
+import hashlib
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import ImageLogement, FichierContenu, Property
+from core.storage import PREFIXE, TAILLE_BLOC, chemin_contenu, champs_fichiers, stockage_dedup
+
+# Toutes les colonnes qui référencent un fichier (reçus et archives compris) : un ancien fichier
+# n'est supprimé qu'une fois absent de chacune. Seules celles du stockage dédupliqué sont migrées.
+REFERENCES = champs_fichiers()
+CHAMPS = tuple((modele, champ) for modele, champ in REFERENCES
+               if modele._meta.get_field(champ).storage is stockage_dedup())
+
+
+class Command(BaseCommand):
+    help = "Déplace les médias existants vers le stockage dédupliqué (cas/), en parallèle et par lots."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Fichiers hachés/copiés en parallèle")
+        parser.add_argument('--lot', type=int, default=500, help="Lignes traitées par lot")
+        parser.add_argument('--dry-run', action='store_true', help="Calcule le gain sans rien modifier")
+
+    def handle(self, *args, **options):
+        self.base = stockage_dedup().base
+        self.dry_run = options['dry_run']
+        self.totaux = defaultdict(int)
+        self.empreintes_vues = set()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for modele, champ in CHAMPS:
+                self.traiter_champ(executor, modele, champ, options['lot'])
+
+        t = self.totaux
+        self.stdout.write(
+            f"{t['fichiers']} fichiers lus, {len(self.empreintes_vues)} contenus distincts, "
+            f"{t['manquants']} introuvables, {t['octets_economises'] / 1024 / 1024:.1f} Mo économisés"
+            + (" (simulation)" if self.dry_run else "")
+        )
+
+    def traiter_champ(self, executor, modele, champ, taille_lot):
+        # Pagination par clé : pas d'OFFSET, mémoire bornée à un lot
+        restants = (modele._base_manager.exclude(**{f'{champ}__startswith': PREFIXE})
+                    .exclude(**{champ: ''}).exclude(**{f'{champ}__isnull': True}))
+        dernier_pk = 0
+        while True:
+            lot = list(restants.filter(pk__gt=dernier_pk).order_by('pk').values_list('pk', champ)[:taille_lot])
+            if not lot:
+                break
+            dernier_pk = lot[-1][0]
+
+            lignes_par_chemin = defaultdict(list)
+            for pk, chemin in lot:
+                lignes_par_chemin[chemin].append(pk)
+            for resultat in executor.map(self.hacher_et_copier, lignes_par_chemin):
+                if resultat is None:
+                    self.totaux['manquants'] += 1
+                    continue
+                self.enregistrer(modele, champ, resultat, lignes_par_chemin[resultat[0]])
+            self.stdout.write(f"{modele.__name__}.{champ} : jusqu'à pk={dernier_pk}")
+
+    def hacher_et_copier(self, chemin):
+        # Exécuté dans les threads : uniquement des E/S sur le stockage, pas de base de données
+        hachage = hashlib.sha256()
+        taille = 0
+        try:
+            with self.base.open(chemin, 'rb') as fichier:
+                for bloc in iter(lambda: fichier.read(TAILLE_BLOC), b''):
+                    hachage.update(bloc)
+                    taille += len(bloc)
+        except (FileNotFoundError, OSError):
+            return None
+        empreinte = hachage.hexdigest()
+        cas = chemin_contenu(empreinte, chemin)
+        if not self.dry_run and not self.base.exists(cas):
+            with self.base.open(chemin, 'rb') as fichier:
+                enregistre = self.base.save(cas, File(fichier, name=os.path.basename(cas)))
+            if enregistre != cas:
+                self.base.delete(enregistre)
+        return chemin, empreinte, taille, cas
+
+    def enregistrer(self, modele, champ, resultat, pks):
+        chemin, empreinte, taille, cas = resultat
+        self.totaux['fichiers'] += 1
+        if empreinte in self.empreintes_vues or FichierContenu.objects.filter(chemin=cas).exists():
+            self.totaux['octets_economises'] += taille
+        self.empreintes_vues.add(empreinte)
+        if self.dry_run:
+            return
+
+        with transaction.atomic():
+            fichier, _ = FichierContenu.objects.select_for_update().get_or_create(
+                chemin=cas, defaults={'empreinte': empreinte, 'taille': taille}
+            )
+            FichierContenu.objects.filter(pk=fichier.pk).update(envois=F('envois') + len(pks))
+            # update() ne passe pas par auto_now : l'URL change, les clients doivent la resynchroniser
+            maintenant = timezone.now()
+            champs = {champ: cas}
+            if any(f.name == 'date_modification' for f in modele._meta.concrete_fields):
+                champs['date_modification'] = maintenant  # pas sur les archives
+            modele._base_manager.filter(pk__in=pks).update(**champs)
+            if modele is ImageLogement:
+                Property.objects.filter(images__pk__in=pks).update(date_modification=maintenant)
+        # L'ancien fichier n'est supprimé que s'il n'est plus référencé nulle part
+        if not any(m._base_manager.filter(**{c: chemin}).exists() for m, c in REFERENCES):
+            self.base.delete(chemin)
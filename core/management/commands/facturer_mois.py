@@ -0,0 +1,46 @@
+# core/management/commands/facturer_mois.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.facturation import periode_depuis, lancer_facturation
+from core.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ("Crée les échéances du mois (loyer + charges récurrentes) pour tous les contrats actifs. "
+            "Relançable sans doublon ; reprend là où une exécution interrompue s'est arrêtée.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periode', help="Mois à facturer (AAAA-MM), par défaut le mois courant")
+        parser.add_argument('--proprietaire', type=int, help="Limiter aux logements de ce propriétaire (id)")
+        parser.add_argument('--lot', type=int, help="Contrats par transaction (FACTURATION_TAILLE_LOT)")
+        parser.add_argument('--forcer', action='store_true',
+                            help="Repasser sur un mois déjà terminé (contrats ajoutés depuis)")
+
+    def handle(self, *args, **options):
+        try:
+            periode = periode_depuis(options['periode']) if options['periode'] else \
+                timezone.localdate().replace(day=1)
+        except ValueError:
+            raise CommandError("Format de période attendu : AAAA-MM.")
+        proprietaire = None
+        if options['proprietaire']:
+            proprietaire = CustomUser.objects.filter(pk=options['proprietaire'], role='admin').first()
+            if proprietaire is None:
+                raise CommandError("Propriétaire introuvable.")
+
+        debut = time.monotonic()
+
+        def progression(cycle):
+            self.stdout.write(f"{cycle.nb_contrats} contrats traités (jusqu'à id={cycle.dernier_contrat}), "
+                              f"{time.monotonic() - debut:.1f} s")
+
+        cycle = lancer_facturation(periode, proprietaire=proprietaire, forcer=options['forcer'],
+                                   taille_lot=options['lot'], progression=progression)
+        self.stdout.write(self.style.SUCCESS(
+            f"Facturation {periode:%Y-%m} {cycle.get_statut_display().lower()} : {cycle.nb_contrats} contrats, "
+            f"{cycle.nb_echeances} échéances en {time.monotonic() - debut:.1f} s"
+        ))
@@ -0,0 +1,190 @@
+# core/management/commands/nettoyer_medias.py
+
+import datetime
+import heapq
+import json
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.functions import Collate
+from django.utils import timezone
+
+from core.models import FichierContenu
+from core.storage import PREFIXE, champs_fichiers
+
+# Toutes les colonnes qui référencent un fichier du stockage, archives comprises
+CHAMPS = champs_fichiers()
+# Répertoires parcourus : ceux des upload_to et le stockage dédupliqué, rien d'autre
+RACINES = sorted({PREFIXE} | {modele._meta.get_field(champ).upload_to for modele, champ in CHAMPS})
+QUARANTAINE = 'quarantaine/'
+
+
+def ordre_binaire(champ):
+    # Même ordre que la comparaison des str Python (points de code = octets UTF-8)
+    return Collate(champ, 'C' if connection.vendor == 'postgresql' else 'BINARY')
+
+
+def references(apres, taille_lot):
+    """Chemins référencés en base, triés, lus par curseur : la mémoire ne dépend pas du volume."""
+    flux = []
+    for modele, champ in CHAMPS:
+        queryset = (modele._base_manager.exclude(**{f'{champ}__isnull': True}).exclude(**{champ: ''})
+                    .annotate(chemin=ordre_binaire(champ)).order_by('chemin').values_list('chemin', flat=True))
+        if apres:
+            queryset = queryset.filter(chemin__gt=apres)
+        flux.append(queryset.iterator(chunk_size=taille_lot))
+    return heapq.merge(*flux)
+
+
+def parcourir(stockage, repertoire, apres):
+    """Fichiers sous ``repertoire`` dans l'ordre de tri de leur chemin complet.
+
+    Un répertoire est trié comme « nom/ » : son contenu arrive à la place exacte qu'il
+    aurait dans une liste triée de chemins. Les branches déjà traitées (``apres``) ne
+    sont pas relistées.
+    """
+    try:
+        sous_repertoires, fichiers = stockage.listdir(repertoire)
+    except FileNotFoundError:
+        return
+    entrees = sorted([(f'{repertoire}{nom}/', True) for nom in sous_repertoires] +
+                     [(f'{repertoire}{nom}', False) for nom in fichiers])
+    for chemin, est_repertoire in entrees:
+        if est_repertoire:
+            if not apres or chemin > apres or apres.startswith(chemin):
+                yield from parcourir(stockage, chemin, apres)
+        elif not apres or chemin > apres:
+            yield chemin
+
+
+def fichiers(stockage, apres=None):
+    # Aucune racine n'est préfixe d'une autre : leurs parcours triés s'enchaînent dans l'ordre
+    for racine in RACINES:
+        if not apres or racine > apres or apres.startswith(racine):
+            yield from parcourir(stockage, racine, apres)
+
+
+class Command(BaseCommand):
+    help = ("Supprime (ou met en quarantaine) les fichiers médias que plus aucune ligne ne référence, "
+            "en croisant un parcours trié du stockage avec les chemins lus en base.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-heures', type=float, default=24,
+                            help="Âge minimal d'un fichier non référencé avant suppression")
+        parser.add_argument('--quarantaine', action='store_true',
+                            help=f"Déplace les fichiers sous {QUARANTAINE}<date>/ au lieu de les supprimer")
+        parser.add_argument('--etat', help="Fichier de reprise : dernier chemin traité, relu au lancement suivant")
+        parser.add_argument('--lot', type=int, default=500, help="Fichiers orphelins traités par lot")
+        parser.add_argument('--dry-run', action='store_true', help="Liste les orphelins sans rien modifier")
+
+    def handle(self, *args, **options):
+        self.stockage = storages['default']
+        self.dry_run = options['dry_run']
+        self.quarantaine = options['quarantaine']
+        self.totaux = defaultdict(int)
+        # Un téléversement direct non encore confirmé n'est référencé par aucune ligne
+        minimum = (settings.UPLOAD_URL_EXPIRATION + settings.UPLOAD_CONFIRMATION_DELAY) / 3600
+        if options['grace_heures'] < minimum:
+            raise CommandError(f"--grace-heures doit couvrir les téléversements en attente ({minimum:g} h).")
+        self.limite = timezone.now() - datetime.timedelta(hours=options['grace_heures'])
+        self.dossier_quarantaine = f"{QUARANTAINE}{timezone.now():%Y%m%d-%H%M%S}/"
+
+        etat = options['etat']
+        apres = None
+        if etat and os.path.exists(etat):
+            with open(etat) as f:
+                apres = json.load(f).get('apres')
+            self.stdout.write(f"Reprise après {apres}")
+
+        refs = references(apres, options['lot'])
+        ref = next(refs, None)
+        lot = []
+        for chemin in fichiers(self.stockage, apres):
+            self.totaux['fichiers'] += 1
+            # Fusion de deux flux triés : chaque chemin n'est comparé qu'une fois
+            while ref is not None and ref < chemin:
+                ref = next(refs, None)
+            if ref == chemin:
+                continue
+            lot.append(chemin)
+            if len(lot) >= options['lot']:
+                self.traiter(lot)
+                self.sauver_etat(etat, chemin)
+                lot = []
+        self.traiter(lot)
+        if etat and not self.dry_run and os.path.exists(etat):
+            os.remove(etat)
+
+        t = self.totaux
+        action = 'mis en quarantaine' if self.quarantaine else 'supprimés'
+        self.stdout.write(self.style.SUCCESS(
+            f"{t['fichiers']} fichiers parcourus, {t['orphelins']} orphelins {action} "
+            f"({t['octets'] / 1024 / 1024:.1f} Mo), {t['recents']} trop récents, {t['repris']} à nouveau référencés"
+            + (" (simulation)" if self.dry_run else "")
+        ))
+
+    def sauver_etat(self, etat, chemin):
+        self.stdout.write(f"jusqu'à {chemin}")
+        if etat and not self.dry_run:
+            with open(etat, 'w') as f:
+                json.dump({'apres': chemin}, f)
+
+    def traiter(self, lot):
+        anciens = []
+        for chemin in lot:
+            try:
+                if self.stockage.get_modified_time(chemin) > self.limite:
+                    self.totaux['recents'] += 1
+                    continue
+                taille = self.stockage.size(chemin)
+            except (FileNotFoundError, OSError):
+                continue
+            anciens.append((chemin, taille))
+        if not anciens:
+            return
+
+        # Relecture ciblée : une ligne a pu prendre ce chemin depuis le début du parcours
+        chemins = [chemin for chemin, _ in anciens]
+        repris = set()
+        for modele, champ in CHAMPS:
+            repris.update(modele._base_manager.filter(**{f'{champ}__in': chemins}).values_list(champ, flat=True))
+        compteurs = dict(FichierContenu.objects.filter(chemin__in=chemins).values_list('chemin', 'envois'))
+
+        for chemin, taille in anciens:
+            if chemin in repris:
+                self.totaux['repris'] += 1
+                continue
+            if self.dry_run:
+                self.stdout.write(chemin)
+            elif chemin.startswith(PREFIXE):
+                if not self.retirer_contenu(chemin, compteurs.get(chemin)):
+                    self.totaux['repris'] += 1
+                    continue
+            else:
+                self.retirer(chemin)
+            self.totaux['orphelins'] += 1
+            self.totaux['octets'] += taille
+
+    def retirer_contenu(self, chemin, envois):
+        # cas/ : un nouvel envoi du même contenu réutilise le fichier sans changer sa date. La ligne
+        # FichierContenu verrouillée (comme StockageDedup._save) et son compteur inchangé garantissent
+        # qu'aucun envoi n'a eu lieu depuis la relecture ; sinon le fichier est conservé.
+        with transaction.atomic():
+            fichier = FichierContenu.objects.select_for_update().filter(chemin=chemin).first()
+            if (fichier.envois if fichier else None) != envois:
+                return False
+            if fichier is not None:
+                fichier.delete()
+            self.retirer(chemin)
+        return True
+
+    def retirer(self, chemin):
+        if self.quarantaine:
+            with self.stockage.open(chemin, 'rb') as source:
+                self.stockage.save(self.dossier_quarantaine + chemin, File(source, name=os.path.basename(chemin)))
+        self.stockage.delete(chemin)
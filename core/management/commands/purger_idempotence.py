@@ -0,0 +1,16 @@
+# core/management/commands/purger_idempotence.py
+
+from django.core.management.base import BaseCommand
+
+from core.idempotence import purger_expirees
+
+
+class Command(BaseCommand):
+    help = "Supprime les réponses Idempotency-Key expirées (IDEMPOTENCE_TTL), à lancer par cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, default=1000, help="Lignes supprimées par requête")
+
+    def handle(self, *args, **options):
+        total = purger_expirees(options['lot'])
+        self.stdout.write(self.style.SUCCESS(f"{total} réponse(s) expirée(s) supprimée(s)"))
@@ -0,0 +1,18 @@
+# core/management/commands/purger_suppressions.py
+
+from django.core.management.base import BaseCommand
+
+from core.synchronisation import purger_suppressions
+
+
+class Command(BaseCommand):
+    help = ("Supprime les pierres tombales plus anciennes que SYNC_RETENTION_JOURS (un client "
+            "plus en retard refait une synchronisation complète), à lancer par cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, help="Rétention (SYNC_RETENTION_JOURS)")
+        parser.add_argument('--lot', type=int, default=1000, help="Lignes supprimées par requête")
+
+    def handle(self, *args, **options):
+        total = purger_suppressions(options['jours'], options['lot'])
+        self.stdout.write(self.style.SUCCESS(f"{total} pierre(s) tombale(s) supprimée(s)"))
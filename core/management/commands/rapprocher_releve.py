@@ -0,0 +1,51 @@
+# core/management/commands/rapprocher_releve.py
+
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.models import CustomUser, MODE_PAIEMENT
+from core.releves import ReleveInvalide, lire_releve, rapprocher, valider_rapproches
+
+
+class Command(BaseCommand):
+    help = ("Rapproche un relevé Mobile Money ou bancaire (CSV : date, montant, reference[, mois]) des "
+            "paiements d'un propriétaire : lignes rapprochées, ambiguës, manquantes, paiements absents du relevé.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help="Relevé CSV")
+        parser.add_argument('--proprietaire', type=int, required=True, help="Propriétaire des logements (id)")
+        parser.add_argument('--fenetre', type=int, default=3, help="Écart toléré entre les dates (jours)")
+        parser.add_argument('--mode', choices=[mode for mode, _ in MODE_PAIEMENT], help="Mode de paiement")
+        parser.add_argument('--valider', action='store_true', help="Valider les paiements rapprochés")
+        parser.add_argument('--rapport', help="Écrire le rapport complet (JSON) dans ce fichier")
+
+    def handle(self, *args, **options):
+        proprietaire = CustomUser.objects.filter(pk=options['proprietaire'], role='admin').first()
+        if proprietaire is None:
+            raise CommandError("Propriétaire introuvable.")
+        debut = time.perf_counter()
+        try:
+            with open(options['fichier'], 'rb') as fichier:
+                lignes, invalides = lire_releve(fichier)
+        except (OSError, ReleveInvalide) as exc:
+            raise CommandError(str(exc))
+        lecture = time.perf_counter()
+        rapport = rapprocher(proprietaire, lignes, fenetre=options['fenetre'], mode=options['mode'])
+        rapport['invalides'] = invalides
+        fin = time.perf_counter()
+
+        self.stdout.write(
+            f"{len(lignes) + len(invalides)} lignes : {len(rapport['rapproches'])} rapprochées, "
+            f"{len(rapport['ambigus'])} ambiguës, {len(rapport['manquants'])} sans paiement, "
+            f"{len(invalides)} illisibles ; {len(rapport['non_releves'])} paiements absents du relevé"
+        )
+        self.stdout.write(f"lecture {(lecture - debut) * 1000:.0f} ms, rapprochement {(fin - lecture) * 1000:.0f} ms")
+        if options['valider']:
+            valides, echecs = valider_rapproches(rapport, proprietaire)
+            self.stdout.write(f"{valides} paiements validés, {echecs} en erreur")
+        if options['rapport']:
+            with open(options['rapport'], 'w') as sortie:
+                json.dump(rapport, sortie, cls=DjangoJSONEncoder, indent=2)
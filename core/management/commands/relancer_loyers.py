@@ -0,0 +1,45 @@
+# core/management/commands/relancer_loyers.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.facturation import periode_depuis
+from core.models import Relance
+from core.relances import creer_relances, envoyer_emails, nature_du_jour
+
+
+class Command(BaseCommand):
+    help = ("Relance par message et e-mail les locataires dont le loyer du mois n'est pas déclaré : rappel "
+            "avant la date limite, relance pour retard après. À lancer chaque jour (cron) ; un locataire "
+            "reçoit au plus un rappel et une relance par mois.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periode', help="Mois concerné (AAAA-MM), par défaut le mois courant")
+        parser.add_argument('--nature', choices=[nature for nature, _ in Relance.NATURES],
+                            help="Par défaut selon la date du jour et la date limite du mois")
+        parser.add_argument('--lot', type=int, help="Contrats par transaction (RELANCES_TAILLE_LOT)")
+        parser.add_argument('--sans-email', action='store_true',
+                            help="Créer les messages sans envoyer les e-mails (envoyés au prochain passage)")
+
+    def handle(self, *args, **options):
+        try:
+            periode = periode_depuis(options['periode']) if options['periode'] else \
+                timezone.localdate().replace(day=1)
+        except ValueError:
+            raise CommandError("Format de période attendu : AAAA-MM.")
+        nature = options['nature'] or nature_du_jour(periode)
+        debut = time.monotonic()
+
+        def progression(creees):
+            self.stdout.write(f"{creees} relances créées, {time.monotonic() - debut:.1f} s")
+
+        creees = creer_relances(periode, nature, taille_lot=options['lot'], progression=progression)
+        self.stdout.write(self.style.SUCCESS(
+            f"{periode:%Y-%m} ({nature}) : {creees} locataires relancés en {time.monotonic() - debut:.1f} s"
+        ))
+        if not options['sans_email']:
+            debut = time.monotonic()
+            envoyes = envoyer_emails()
+            self.stdout.write(self.style.SUCCESS(f"{envoyes} e-mails envoyés en {time.monotonic() - debut:.1f} s"))
@@ -0,0 +1,101 @@
+# core/management/commands/simuler_mobile_money.py
+
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from core.mobile_money import SUCCES, signer
+from core.models import Payment, Echeance
+
+
+class Command(BaseCommand):
+    help = ("Opérateur Mobile Money simulé : envoie des notifications signées (paiements en attente, "
+            "échéances non réglées, renvois, échecs) en rafale, puis mesure le débit de réception.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Endpoint à appeler (ex. http://127.0.0.1:8000/api/mobile-money/"
+                                          "notifications/) ; par défaut, appel dans ce processus")
+        parser.add_argument('--nombre', type=int, default=1000, help="Notifications distinctes")
+        parser.add_argument('--concurrence', type=int, default=8, help="Envois simultanés")
+        parser.add_argument('--doublons', type=float, default=0.1, help="Part de notifications renvoyées")
+        parser.add_argument('--echecs', type=float, default=0.05, help="Part de transactions échouées")
+
+    def handle(self, *args, **options):
+        if not settings.MOBILE_MONEY_SECRET:
+            raise CommandError("MOBILE_MONEY_SECRET n'est pas défini.")
+        nombre = options['nombre']
+        # Références réelles d'abord (montant exact), puis références inconnues pour compléter
+        references = [(f'P{pk}', montant) for pk, montant in Payment.objects.filter(
+            est_valide=False, rapprochements_mobile_money__isnull=True).values_list('pk', 'montant')[:nombre]]
+        references += [(f'E{pk}', montant) for pk, montant in Echeance.objects.filter(
+            paiement__isnull=True).values_list('pk', 'montant')[:nombre - len(references)]]
+        reelles = len(references)
+        references += [('E0', '1000.00')] * (nombre - reelles)
+
+        lot = time.time_ns()
+        corps = [json.dumps({
+            'transaction_id': f'SIM{lot}-{i}',
+            'statut': 'ECHEC' if random.random() < options['echecs'] else SUCCES,
+            'montant': str(montant),
+            'reference': reference,
+            'telephone': f'+2289{random.randint(0, 9999999):07d}',
+        }).encode() for i, (reference, montant) in enumerate(references)]
+        envois = corps + random.sample(corps, int(len(corps) * options['doublons']))
+        random.shuffle(envois)
+
+        envoyer = self.envoyeur(options['url'])
+        durees, codes = [], Counter()
+
+        def envoi(donnees):
+            debut = time.perf_counter()
+            code = envoyer(donnees)
+            return code, time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrence']) as executeur:
+            for code, duree in executeur.map(envoi, envois):
+                codes[code] += 1
+                durees.append(duree)
+        total = time.perf_counter() - debut
+
+        durees.sort()
+        centile = lambda p: durees[min(len(durees) - 1, int(len(durees) * p))] * 1000
+        self.stdout.write(f"{len(envois)} envois ({reelles} références réelles, "
+                          f"{len(envois) - len(corps)} renvois) en {total:.2f} s : {len(envois) / total:.0f} req/s, "
+                          f"{len(envois) / total * 60:.0f} / min")
+        self.stdout.write(f"latence p50 {centile(0.5):.1f} ms, p95 {centile(0.95):.1f} ms, p99 {centile(0.99):.1f} ms")
+        self.stdout.write(f"réponses : {dict(sorted(codes.items()))}")
+        if set(codes) != {200}:
+            raise CommandError("Des notifications n'ont pas été acceptées.")
+
+    def envoyeur(self, url):
+        if url:
+            def envoyer(donnees):
+                requete = urllib.request.Request(url, data=donnees, method='POST', headers={
+                    'Content-Type': 'application/json', 'X-Signature': signer(donnees)})
+                try:
+                    with urllib.request.urlopen(requete, timeout=30) as reponse:
+                        return reponse.status
+                except urllib.error.HTTPError as exc:
+                    return exc.code
+            return envoyer
+
+        # Dans ce processus : un client de test par thread
+        chemin, locaux = reverse('mobile-money-notification'), threading.local()
+
+        def envoyer(donnees):
+            if not hasattr(locaux, 'client'):
+                locaux.client = Client()
+            return locaux.client.post(chemin, data=donnees, content_type='application/json',
+                                      headers={'X-Signature': signer(donnees)}).status_code
+        return envoyer
@@ -0,0 +1,30 @@
+# core/management/commands/traiter_mobile_money.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.mobile_money import traiter
+
+
+class Command(BaseCommand):
+    help = ("Rapproche les notifications Mobile Money reçues des paiements et échéances, puis valide "
+            "les paiements reconnus (reçu PDF + e-mail). Plusieurs instances peuvent tourner en parallèle.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, help="Notifications par transaction (MOBILE_MONEY_TAILLE_LOT)")
+        parser.add_argument('--boucle', type=float, metavar='SECONDES',
+                            help="Ne pas s'arrêter : attendre ce délai quand la file est vide, puis reprendre")
+
+    def handle(self, *args, **options):
+        while True:
+            debut = time.monotonic()
+            totaux = traiter(taille_lot=options['lot'])
+            if totaux['rapproches'] or totaux['valides'] or totaux['echecs'] or not options['boucle']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{totaux['rapproches']} notifications rapprochées, {totaux['valides']} paiements validés, "
+                    f"{totaux['echecs']} en erreur en {time.monotonic() - debut:.1f} s"
+                ))
+            if not options['boucle']:
+                return
+            time.sleep(options['boucle'])
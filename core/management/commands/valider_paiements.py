@@ -0,0 +1,35 @@
+# core/management/commands/valider_paiements.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.paiements import valider_demandes
+
+
+class Command(BaseCommand):
+    help = ("Valide les paiements mis en file (rapprochement de relevé avec valider, action d'administration) : "
+            "reçu PDF + e-mail, par lots. Plusieurs instances peuvent tourner en parallèle.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, default=100, help="Paiements validés par passage")
+        parser.add_argument('--boucle', type=float, metavar='SECONDES',
+                            help="Ne pas s'arrêter : attendre ce délai quand la file est vide, puis reprendre")
+
+    def handle(self, *args, **options):
+        while True:
+            debut = time.monotonic()
+            valides, echecs = 0, 0
+            while True:
+                v, e = valider_demandes(options['lot'])
+                valides, echecs = valides + v, echecs + e
+                # Lot sans aucune validation réussie : le reste échoue ou a été pris par un autre worker
+                if not v:
+                    break
+            if valides or echecs or not options['boucle']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{valides} paiements validés, {echecs} en erreur en {time.monotonic() - debut:.1f} s"
+                ))
+            if not options['boucle']:
+                return
+            time.sleep(options['boucle'])
@@ -0,0 +1,151 @@
+# core/middleware.py
+
+import logging
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from utils.metrics import MesuresRequete, activer, desactiver, registre, flux_mesure, flux_mesure_async, BUCKETS_SQL
+
+logger = logging.getLogger('core.performance')
+
+# Sections reportées dans l'en-tête Server-Timing (hors total et sql)
+SECTIONS = ('serializer', 'pdf', 'smtp')
+
+
+class PerformanceMiddleware:
+    """Mesure chaque requête : temps total, SQL, sérialisation, PDF et SMTP.
+
+    Les mesures sont renvoyées dans l'en-tête ``Server-Timing`` et agrégées
+    en histogrammes par nom de vue (exposés sur /api/metrics/). Pour une réponse
+    en flux, l'en-tête ne couvre que la préparation : la lecture du corps est
+    mesurée à part, puis enregistrée et journalisée à la fermeture de la réponse.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.seuil_lent = getattr(settings, 'PERF_SLOW_REQUEST_MS', 500) / 1000
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mesures = MesuresRequete()
+        jeton = activer(mesures)
+        debut = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            desactiver(jeton)
+        return self.terminer(request, response, mesures, debut)
+
+    async def __acall__(self, request):
+        mesures = MesuresRequete()
+        jeton = activer(mesures)
+        debut = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            desactiver(jeton)
+        return self.terminer(request, response, mesures, debut)
+
+    def terminer(self, request, response, mesures, debut):
+        # Le SQL est chronométré par utils.metrics.chronometrer_sql (voir CoreConfig.ready)
+        vue = self.nom_vue(request)
+        total = perf_counter() - debut
+        response['Server-Timing'] = self.server_timing(total, mesures)
+        if not response.streaming:
+            self.cloturer(request, vue, mesures, total)
+            return response
+
+        # Flux : en-têtes déjà prêts, le corps reste à produire
+        if response.is_async:
+            response.streaming_content = flux_mesure_async(response.streaming_content, mesures)
+        else:
+            response.streaming_content = flux_mesure(response.streaming_content, mesures)
+        response._resource_closers.append(
+            lambda: self.cloturer(request, vue, mesures, perf_counter() - debut, flux=True))
+        return response
+
+    def cloturer(self, request, vue, mesures, total, flux=False):
+        self.enregistrer(vue, total, mesures)
+        if flux:
+            logger.info(
+                "Flux %s %s (%s) : %.0f ms, %d requêtes SQL (%.0f ms), sérialisation %.0f ms",
+                request.method, request.path, vue, total * 1000, mesures.nb_sql,
+                mesures.durees.get('sql', 0.0) * 1000, mesures.durees.get('serializer', 0.0) * 1000,
+            )
+        if total >= self.seuil_lent:
+            duree_sql, sql = mesures.sql_lente
+            logger.warning(
+                "Requête lente %s %s (%s) : %.0f ms, %d requêtes SQL (%.0f ms), "
+                "SQL la plus lente %.0f ms : %s",
+                request.method, request.path, vue, total * 1000, mesures.nb_sql,
+                mesures.durees.get('sql', 0.0) * 1000, duree_sql * 1000, sql[:500],
+            )
+
+    @staticmethod
+    def nom_vue(request):
+        # token_obtain_pair, payment-list, messages-conversation...
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'non_resolue'
+        return match.view_name or 'inconnue'
+
+    @staticmethod
+    def server_timing(total, mesures):
+        parties = [
+            f'total;dur={total * 1000:.1f}',
+            f'sql;dur={mesures.durees.get("sql", 0.0) * 1000:.1f};desc="{mesures.nb_sql} requetes"',
+        ]
+        for nom in SECTIONS:
+            if nom in mesures.durees:
+                parties.append(f'{nom};dur={mesures.durees[nom] * 1000:.1f}')
+        return ', '.join(parties)
+
+    @staticmethod
+    def enregistrer(vue, total, mesures):
+        labels = (('vue', vue),)
+        registre.observer('http_request_duration_seconds', 'Durée totale des requêtes', labels, total)
+        registre.observer('http_request_sql_seconds', 'Temps SQL par requête', labels,
+                          mesures.durees.get('sql', 0.0))
+        registre.observer('http_request_sql_queries', 'Nombre de requêtes SQL par requête', labels,
+                          mesures.nb_sql, buckets=BUCKETS_SQL)
+        registre.observer('http_request_serializer_seconds', 'Temps de sérialisation par requête', labels,
+                          mesures.durees.get('serializer', 0.0))
+        for appel in ('pdf', 'smtp'):
+            if appel in mesures.durees:
+                registre.observer('http_request_external_seconds', 'Temps des appels externes',
+                                  labels + (('appel', appel),), mesures.durees[appel])
+
+
+class WhiteNoiseAsyncMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise utilisable sous ASGI sans repasser toute la chaîne en synchrone."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-19 17:42
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_alter_customuser_photo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FichierContenu',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('empreinte', models.CharField(db_index=True, max_length=64)),
+                ('chemin', models.CharField(max_length=255, unique=True)),
+                ('taille', models.PositiveBigIntegerField()),
+                ('references', models.PositiveIntegerField(default=0)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='fichier_pdf',
+            field=models.FileField(storage=core.storage.stockage_dedup, upload_to='contrats/'),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.stockage_dedup, upload_to='users/photos/'),
+        ),
+        migrations.AlterField(
+            model_name='imagelogement',
+            name='image',
+            field=models.ImageField(storage=core.storage.stockage_dedup, upload_to='logements/'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='image',
+            field=models.FileField(blank=True, null=True, storage=core.storage.stockage_dedup, upload_to='messages/'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-19 17:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_fichiercontenu_stockage_dedup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChargeRecurrente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_charge', models.CharField(choices=[('loyer', 'Loyer'), ('eau', 'Eau'), ('electricite', 'Électricité'), ('internet', 'Internet'), ('reparation', 'Réparation')], max_length=20)),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('active', models.BooleanField(default=True)),
+                ('logement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='charges', to='core.property')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CycleFacturation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periode', models.DateField()),
+                ('statut', models.CharField(choices=[('en_cours', 'En cours'), ('termine', 'Terminé')], default='en_cours', max_length=10)),
+                ('dernier_contrat', models.PositiveBigIntegerField(default=0)),
+                ('nb_contrats', models.PositiveIntegerField(default=0)),
+                ('nb_echeances', models.PositiveIntegerField(default=0)),
+                ('date_debut', models.DateTimeField(auto_now_add=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('proprietaire', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('periode', 'proprietaire'), name='cycle_unique_par_proprietaire'), models.UniqueConstraint(condition=models.Q(('proprietaire__isnull', True)), fields=('periode',), name='cycle_global_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Echeance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_charge', models.CharField(choices=[('loyer', 'Loyer'), ('eau', 'Eau'), ('electricite', 'Électricité'), ('internet', 'Internet'), ('reparation', 'Réparation')], max_length=20)),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('periode', models.DateField(help_text='Premier jour du mois facturé')),
+                ('mois_concerne', models.CharField(help_text='Ex: Juin 2025', max_length=20)),
+                ('date_limite', models.DateField()),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('contrat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='echeances', to='core.contract')),
+                ('locataire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='echeances', to=settings.AUTH_USER_MODEL)),
+                ('logement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='echeances', to='core.property')),
+                ('paiement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='echeances', to='core.payment')),
+            ],
+            options={
+                'ordering': ['periode', 'id'],
+                'indexes': [models.Index(fields=['locataire', 'periode'], name='core_echean_locatai_5de1e5_idx'), models.Index(fields=['periode', 'logement'], name='core_echean_periode_d668e7_idx')],
+                'constraints': [models.UniqueConstraint(fields=('contrat', 'type_charge', 'periode'), name='echeance_unique_par_mois')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-19 17:48
+
+from django.db import migrations, models
+
+# Deux contrats d'un même logement ne peuvent pas se chevaucher (bornes incluses).
+# int8range(logement_id) plutôt que "logement_id WITH =" : pas besoin de l'extension btree_gist.
+EXCLUSION_POSTGRES = """
+    ALTER TABLE core_contract ADD CONSTRAINT contrat_sans_chevauchement EXCLUDE USING gist (
+        int8range(logement_id, logement_id, '[]') WITH &&,
+        daterange(date_debut, date_fin, '[]') WITH &&
+    )
+"""
+
+
+def ajouter_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        # SQLite : triggers équivalents installés après migrate (core.disponibilite)
+        return
+    Contract = apps.get_model('core', 'Contract')
+    conflits = Contract.objects.filter(
+        logement=models.OuterRef('logement'),
+        date_debut__lte=models.OuterRef('date_fin'),
+        date_fin__gte=models.OuterRef('date_debut'),
+    ).exclude(pk=models.OuterRef('pk'))
+    chevauchants = list(Contract.objects.filter(models.Exists(conflits)).values_list('pk', flat=True)[:50])
+    if chevauchants:
+        raise RuntimeError(f"Contrats qui se chevauchent, à corriger avant migration : {chevauchants}")
+    schema_editor.execute(EXCLUSION_POSTGRES)
+
+
+def retirer_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE core_contract DROP CONSTRAINT IF EXISTS contrat_sans_chevauchement")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_facturation_mensuelle'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['logement', 'date_debut', 'date_fin'], name='core_contra_logemen_255dc9_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='contract',
+            constraint=models.CheckConstraint(condition=models.Q(('date_fin__gte', models.F('date_debut'))), name='contrat_dates_ordonnees'),
+        ),
+        migrations.RunPython(ajouter_exclusion, retirer_exclusion),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-19 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_disponibilite_contrats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['date_debut'], name='core_contra_date_de_02a29d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['date_envoi'], name='core_messag_date_en_7cd214_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['date_paiement'], name='core_paymen_date_pa_5cf731_idx'),
+        ),
+    ]
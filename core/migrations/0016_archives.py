@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-19 17:56
+
+import core.storage
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_index_admin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('texte', models.TextField(blank=True, null=True)),
+                ('image', models.FileField(blank=True, null=True, storage=core.storage.stockage_dedup, upload_to='messages/')),
+                ('date_envoi', models.DateTimeField()),
+                ('date_archivage', models.DateTimeField(auto_now_add=True)),
+                ('destinataire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('expediteur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date_envoi'],
+                'indexes': [models.Index(fields=['expediteur', 'date_envoi'], name='core_messag_expedit_17b603_idx'), models.Index(fields=['destinataire', 'date_envoi'], name='core_messag_destina_e07fce_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('type_paiement', models.CharField(choices=[('loyer', 'Loyer'), ('eau', 'Eau'), ('electricite', 'Électricité'), ('internet', 'Internet'), ('reparation', 'Réparation')], max_length=20)),
+                ('mode_paiement', models.CharField(choices=[('Mobile Money', 'Mobile Money'), ('Espèce', 'Espèce'), ('Virement', 'Virement')], default='Mobile Money', max_length=20)),
+                ('mois_concerne', models.CharField(max_length=20)),
+                ('est_valide', models.BooleanField(default=True)),
+                ('date_paiement', models.DateTimeField()),
+                ('fichier_recu', models.FileField(blank=True, null=True, upload_to='recus/')),
+                ('date_archivage', models.DateTimeField(auto_now_add=True)),
+                ('locataire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('logement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.property')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['locataire', 'date_paiement'], name='core_paymen_locatai_e3b65a_idx'), models.Index(fields=['logement', 'date_paiement'], name='core_paymen_logemen_85c7bd_idx')],
+            },
+        ),
+    ]
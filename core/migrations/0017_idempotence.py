@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 18:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_archives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequeteIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=255)),
+                ('empreinte', models.CharField(help_text='SHA-256 de la méthode, du chemin et du corps', max_length=64)),
+                ('statut', models.CharField(choices=[('en_cours', 'En cours'), ('termine', 'Terminé')], default='en_cours', max_length=10)),
+                ('code_http', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('type_contenu', models.CharField(blank=True, max_length=100)),
+                ('reponse', models.BinaryField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_expiration', models.DateTimeField(db_index=True)),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('utilisateur', 'cle'), name='idempotence_cle_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Recherche plein texte dans les messages (core.recherche), Postgres uniquement.
+
+from django.db import migrations
+
+# Colonne générée : maintenue par Postgres à chaque INSERT/UPDATE, invisible pour l'ORM.
+# Les participants y figurent comme lexèmes 'u<id>' : l'index GIN restreint lui-même la
+# recherche aux conversations de l'utilisateur au lieu de parcourir tous les messages.
+# Sur une grande table, l'ajout réécrit core_message : à passer hors des heures de pointe.
+RECHERCHE_POSTGRES = [
+    """
+    ALTER TABLE core_message ADD COLUMN texte_recherche tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('french'::regconfig, coalesce(texte, ''))
+            || array_to_tsvector(ARRAY['u' || expediteur_id::text, 'u' || destinataire_id::text])
+        ) STORED
+    """,
+    "CREATE INDEX message_texte_recherche ON core_message USING gin (texte_recherche)",
+]
+# Mots partiels au milieu d'un mot (icontains, qui compare UPPER(texte)) : index trigrammes si pg_trgm existe
+TRIGRAMMES_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX message_texte_trgm ON core_message USING gin (UPPER(texte) gin_trgm_ops)",
+]
+
+
+def ajouter_recherche(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        # SQLite (développement) : recherche par LIKE, sans index
+        return
+    for sql in RECHERCHE_POSTGRES:
+        schema_editor.execute(sql)
+    with schema_editor.connection.cursor() as curseur:
+        curseur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        trigrammes = curseur.fetchone() is not None
+    if trigrammes:
+        for sql in TRIGRAMMES_POSTGRES:
+            schema_editor.execute(sql)
+
+
+def retirer_recherche(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS message_texte_trgm")
+        schema_editor.execute("ALTER TABLE core_message DROP COLUMN IF EXISTS texte_recherche")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_synchronisation'),
+    ]
+
+    operations = [
+        migrations.RunPython(ajouter_recherche, retirer_recherche),
+    ]
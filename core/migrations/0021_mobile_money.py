@@ -0,0 +1,79 @@
+# Generated by Django 5.2 on 2026-10-19 18:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+# Notifications brutes en ajout seul : toute modification ou suppression est refusée par la base
+AJOUT_SEUL = {
+    'postgresql': [
+        """
+        CREATE FUNCTION evenement_mobile_money_ajout_seul() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'core_evenementmobilemoney est en ajout seul';
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE TRIGGER evenement_mobile_money_ajout_seul BEFORE UPDATE OR DELETE ON core_evenementmobilemoney
+        FOR EACH ROW EXECUTE FUNCTION evenement_mobile_money_ajout_seul()
+        """,
+    ],
+    'sqlite': [
+        """
+        CREATE TRIGGER evenement_mobile_money_sans_modification BEFORE UPDATE ON core_evenementmobilemoney
+        BEGIN SELECT RAISE(ABORT, 'core_evenementmobilemoney est en ajout seul'); END
+        """,
+        """
+        CREATE TRIGGER evenement_mobile_money_sans_suppression BEFORE DELETE ON core_evenementmobilemoney
+        BEGIN SELECT RAISE(ABORT, 'core_evenementmobilemoney est en ajout seul'); END
+        """,
+    ],
+}
+
+
+def interdire_modifications(apps, schema_editor):
+    for sql in AJOUT_SEUL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def autoriser_modifications(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP TRIGGER IF EXISTS evenement_mobile_money_ajout_seul ON core_evenementmobilemoney")
+        schema_editor.execute("DROP FUNCTION IF EXISTS evenement_mobile_money_ajout_seul()")
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TRIGGER IF EXISTS evenement_mobile_money_sans_modification")
+        schema_editor.execute("DROP TRIGGER IF EXISTS evenement_mobile_money_sans_suppression")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_proximite_logements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvenementMobileMoney',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.CharField(help_text="Identifiant chez l'opérateur", max_length=100, unique=True)),
+                ('corps', models.TextField(help_text='Corps JSON reçu, tel quel')),
+                ('date_reception', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RapprochementMobileMoney',
+            fields=[
+                ('evenement', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, primary_key=True, related_name='rapprochement', serialize=False, to='core.evenementmobilemoney')),
+                ('statut', models.CharField(choices=[('a_valider', 'À valider'), ('valide', 'Validé'), ('rejete', 'Rejeté')], max_length=10)),
+                ('motif', models.CharField(blank=True, max_length=255)),
+                ('date_traitement', models.DateTimeField(auto_now=True)),
+                ('paiement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rapprochements_mobile_money', to='core.payment')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('statut', 'a_valider')), fields=['evenement'], name='rapprochement_a_valider')],
+            },
+        ),
+        migrations.RunPython(interdire_modifications, autoriser_modifications),
+    ]
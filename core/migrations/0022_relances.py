@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 18:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_mobile_money'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Relance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periode', models.DateField(help_text='Premier jour du mois concerné')),
+                ('nature', models.CharField(choices=[('echeance', 'Loyer à payer'), ('retard', 'Loyer en retard')], max_length=10)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_email', models.DateTimeField(blank=True, null=True)),
+                ('locataire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relances', to=settings.AUTH_USER_MODEL)),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.message')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('date_email__isnull', True)), fields=['id'], name='relance_email_en_attente')],
+                'constraints': [models.UniqueConstraint(fields=('locataire', 'periode', 'nature'), name='relance_unique_par_mois')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-19 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_relances'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rapprochementmobilemoney',
+            name='rapprochement_a_valider',
+        ),
+        migrations.AddField(
+            model_name='rapprochementmobilemoney',
+            name='tentatives',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='rapprochementmobilemoney',
+            index=models.Index(condition=models.Q(('statut', 'a_valider')), fields=['tentatives', 'evenement'], name='rapprochement_a_valider'),
+        ),
+    ]
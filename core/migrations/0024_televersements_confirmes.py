@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 19:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_rapprochement_tentatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeleversementConfirme',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=255, unique=True)),
+                ('date_confirmation', models.DateTimeField(auto_now_add=True)),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_televersements_confirmes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='validation_demandee',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('validation_demandee__isnull', False)), fields=['validation_demandee'], name='paiement_validation_demandee'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 19:19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_paiement_validation_demandee'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='fichiercontenu',
+            old_name='references',
+            new_name='envois',
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-19 19:38
+
+from django.db import migrations, models
+
+# Recherche « ^champ » de l'admin = istartswith, qui compare UPPER(champ) LIKE 'X%' sous Postgres.
+# db_index crée l'index B-tree et son jumeau varchar_pattern_ops (LIKE sensible à la casse) ;
+# seul un index sur l'expression UPPER(...) sert la recherche insensible à la casse.
+INDEX_MAJUSCULES_POSTGRES = [
+    ('logement_nom_majuscules', 'core_property', 'nom'),
+    ('paiement_mois_majuscules', 'core_payment', 'mois_concerne'),
+]
+
+
+def ajouter_index_majuscules(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nom, table, colonne in INDEX_MAJUSCULES_POSTGRES:
+        schema_editor.execute(f"CREATE INDEX {nom} ON {table} (UPPER({colonne}) text_pattern_ops)")
+
+
+def retirer_index_majuscules(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nom, _, _ in INDEX_MAJUSCULES_POSTGRES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {nom}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_fichiercontenu_envois'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='mois_concerne',
+            field=models.CharField(db_index=True, help_text='Ex: Juin 2025', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='nom',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.RunPython(ajouter_index_majuscules, retirer_index_majuscules),
+    ]
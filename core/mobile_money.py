@@ -0,0 +1,199 @@
+# core/mobile_money.py
+
+import hashlib
+import hmac
+import json
+import logging
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import EvenementMobileMoney, RapprochementMobileMoney, Payment, Echeance
+from .paiements import valider_paiement
+
+logger = logging.getLogger(__name__)
+
+# Notification attendue (POST /api/mobile-money/notifications/, en-tête X-Signature) :
+#   {"transaction_id": "...", "statut": "SUCCES" | "ECHEC", "montant": "25000.00",
+#    "reference": "P<id du paiement>" | "E<id de l'échéance>", "telephone": "..."}
+# La réception ne fait qu'insérer la notification ; le rapprochement se fait par lots
+# (commande traiter_mobile_money), hors du temps de réponse à l'opérateur.
+SUCCES = 'SUCCES'
+# Référence saisie par le payeur : identifiant borné (tient dans un bigint), chiffres ASCII
+REFERENCE = re.compile(r'([PE])([0-9]{1,18})')
+
+
+def signer(corps):
+    """Signature attendue dans X-Signature : HMAC-SHA256 hexadécimal du corps brut."""
+    return hmac.new(settings.MOBILE_MONEY_SECRET.encode(), corps, hashlib.sha256).hexdigest()
+
+
+def signature_valide(corps, signature):
+    return bool(settings.MOBILE_MONEY_SECRET) and hmac.compare_digest(signer(corps), signature)
+
+
+def enregistrer(corps):
+    """Insère la notification (une requête) ; une transaction déjà reçue est ignorée. ValueError si illisible."""
+    donnees = json.loads(corps)
+    transaction_id = donnees.get('transaction_id') if isinstance(donnees, dict) else None
+    if not isinstance(transaction_id, str) or not 0 < len(transaction_id) <= 100:
+        raise ValueError("transaction_id manquant ou invalide.")
+    # ON CONFLICT DO NOTHING : les renvois de l'opérateur ne lèvent pas d'IntegrityError
+    EvenementMobileMoney.objects.bulk_create(
+        [EvenementMobileMoney(transaction_id=transaction_id, corps=corps.decode())], ignore_conflicts=True
+    )
+
+
+def lire_reference(reference):
+    # 'P12' -> ('P', 12) ; None si la référence n'est pas reconnue
+    correspondance = REFERENCE.fullmatch(reference) if isinstance(reference, str) else None
+    return (correspondance[1], int(correspondance[2])) if correspondance else None
+
+
+def lire_montant(montant):
+    # None si le montant n'est pas un nombre fini ('sNaN', 'Infinity', texte...)
+    try:
+        montant = Decimal(str(montant))
+    except InvalidOperation:
+        return None
+    return montant if montant.is_finite() else None
+
+
+def lire_notification(corps):
+    donnees = json.loads(corps)
+    if not isinstance(donnees, dict):
+        raise ValueError("Objet JSON attendu.")
+    return donnees
+
+
+def rapprocher_notification(rapprochement, donnees, reference, paiements, echeances, regles, nouveaux):
+    """Statut et motif du rapprochement d'une notification ; paiement créé ajouté à ``nouveaux``."""
+    montant = lire_montant(donnees.get('montant'))
+    cible = None
+    if reference:
+        cible = (paiements if reference[0] == 'P' else echeances).get(reference[1])
+
+    if donnees.get('statut') != SUCCES:
+        rapprochement.motif = "Échec signalé par l'opérateur."
+    elif cible is None:
+        rapprochement.motif = "Référence inconnue."
+    elif reference in regles or (cible.est_valide if reference[0] == 'P' else cible.paiement_id):
+        rapprochement.motif = "Déjà réglé : paiement en double à rembourser ?"
+    elif montant is None or montant != cible.montant:
+        rapprochement.motif = f"Montant reçu {donnees.get('montant')}, attendu {cible.montant}."[:255]
+    elif reference[0] == 'P':
+        regles.add(reference)
+        rapprochement.statut, rapprochement.paiement = RapprochementMobileMoney.A_VALIDER, cible
+    else:
+        paiement = Payment(
+            locataire_id=cible.locataire_id, logement_id=cible.logement_id, montant=montant,
+            type_paiement=cible.type_charge, mode_paiement='Mobile Money',
+            mois_concerne=cible.mois_concerne, date_paiement=rapprochement.evenement.date_reception,
+        )
+        regles.add(reference)
+        rapprochement.statut, rapprochement.paiement = RapprochementMobileMoney.A_VALIDER, paiement
+        cible.paiement = paiement
+        nouveaux.append((paiement, cible))
+
+
+def rapprocher_lot(taille):
+    """Rapproche les ``taille`` plus anciennes notifications non traitées ; renvoie leur nombre.
+
+    Paiement déclaré (P<id>) ou échéance (E<id>) au même montant : rapprochement « à valider »,
+    avec création du paiement pour une échéance. Tout le reste est rejeté avec un motif, y compris
+    une notification dont le traitement échoue : elle ne bloque pas la file.
+    Les lignes sont verrouillées sans attente (SKIP LOCKED) : plusieurs workers se partagent la file.
+    """
+    with transaction.atomic():
+        evenements = list(EvenementMobileMoney.objects.filter(rapprochement__isnull=True).select_for_update(
+            skip_locked=True, of=('self',)).order_by('pk')[:taille])
+        if not evenements:
+            return 0
+
+        notifications = []
+        for evenement in evenements:
+            try:
+                donnees = lire_notification(evenement.corps)
+            except ValueError:
+                donnees = None
+            reference = lire_reference(donnees.get('reference')) if donnees else None
+            notifications.append((evenement, donnees, reference))
+        # Une requête par table pour tout le lot, puis recherches par dictionnaire
+        paiements = Payment.objects.select_for_update(of=('self',)).in_bulk(
+            {ref[1] for _, _, ref in notifications if ref and ref[0] == 'P'})
+        echeances = Echeance.objects.select_for_update(of=('self',)).in_bulk(
+            {ref[1] for _, _, ref in notifications if ref and ref[0] == 'E'})
+
+        rapprochements, nouveaux, regles = [], [], set()
+        for evenement, donnees, reference in notifications:
+            rapprochement = RapprochementMobileMoney(evenement=evenement, statut=RapprochementMobileMoney.REJETE)
+            rapprochements.append(rapprochement)
+            if donnees is None:
+                rapprochement.motif = "Notification illisible."
+                continue
+            try:
+                rapprocher_notification(rapprochement, donnees, reference, paiements, echeances, regles, nouveaux)
+            except Exception as exc:
+                logger.exception("Notification Mobile Money %s non rapprochée", evenement.transaction_id)
+                rapprochement.statut, rapprochement.paiement = RapprochementMobileMoney.REJETE, None
+                rapprochement.motif = f"Erreur de traitement : {exc}"[:255]
+
+        # Les clés des paiements créés sont reprises par les échéances et rapprochements qui les référencent
+        Payment.objects.bulk_create([paiement for paiement, _ in nouveaux])
+        Echeance.objects.bulk_update([echeance for _, echeance in nouveaux], ['paiement'])
+        RapprochementMobileMoney.objects.bulk_create(rapprochements)
+    return len(evenements)
+
+
+def valider_en_attente(taille):
+    """Valide (reçu PDF + e-mail) jusqu'à ``taille`` paiements rapprochés ; renvoie (validés, échecs).
+
+    Chaque validation a sa transaction : un e-mail en échec annule la validation, retentée
+    au passage suivant après les rapprochements moins souvent tentés (un envoi qui échoue
+    toujours ne bloque pas le reste de la file).
+    """
+    valides, echecs = 0, 0
+    en_attente = RapprochementMobileMoney.objects.filter(statut=RapprochementMobileMoney.A_VALIDER)
+    for identifiant in list(en_attente.order_by('tentatives', 'pk').values_list('pk', flat=True)[:taille]):
+        with transaction.atomic():
+            rapprochement = en_attente.select_for_update(skip_locked=True, of=('self',)).select_related(
+                'paiement__locataire', 'paiement__logement__proprietaire').filter(pk=identifiant).first()
+            if rapprochement is None:
+                continue  # traité par un autre worker
+            paiement = rapprochement.paiement
+            if paiement is None:
+                rapprochement.statut, rapprochement.motif = RapprochementMobileMoney.REJETE, "Paiement supprimé."
+            elif paiement.est_valide:
+                rapprochement.statut = RapprochementMobileMoney.VALIDE
+            else:
+                try:
+                    with transaction.atomic():
+                        valider_paiement(paiement, paiement.logement.proprietaire.get_full_name())
+                except Exception:
+                    logger.exception("Validation du paiement %s impossible", paiement.pk)
+                    rapprochement.tentatives += 1
+                    rapprochement.save(update_fields=['tentatives', 'date_traitement'])
+                    echecs += 1
+                    continue
+                rapprochement.statut = RapprochementMobileMoney.VALIDE
+                valides += 1
+            rapprochement.save(update_fields=['statut', 'motif', 'date_traitement'])
+    return valides, echecs
+
+
+def traiter(taille_lot=None, progression=None):
+    """Vide la file : rapprochement puis validation, lot par lot ; renvoie les totaux."""
+    taille_lot = taille_lot or settings.MOBILE_MONEY_TAILLE_LOT
+    totaux = {'rapproches': 0, 'valides': 0, 'echecs': 0}
+    while True:
+        rapproches = rapprocher_lot(taille_lot)
+        valides, echecs = valider_en_attente(taille_lot)
+        totaux['rapproches'] += rapproches
+        totaux['valides'] += valides
+        totaux['echecs'] += echecs
+        if progression:
+            progression(totaux)
+        if not rapproches and not valides:
+            return totaux
@@ -1,9 +1,13 @@
 # core/models.py
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils import timezone
 
+from .proximite import geohash
+from .storage import stockage_dedup
+
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = (
@@ -11,7 +15,7 @@ class CustomUser(AbstractUser):
         ('locataire', 'Locataire'),
     )
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='locataire')
-    photo = models.ImageField(upload_to='users/photos/', null=True, blank=True)
+    photo = models.ImageField(upload_to='users/photos/', storage=stockage_dedup, null=True, blank=True)
 
     # 🔥 Relation propriétaire → locataire
     proprietaire = models.ForeignKey(
@@ -22,6 +26,8 @@ class CustomUser(AbstractUser):
         limit_choices_to={'role': 'admin'},
         related_name='locataires'
     )
+    # Synchronisation différentielle (core.synchronisation)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.username} ({self.role})"
@@ -38,7 +44,7 @@ LOGEMENT_TYPES = [
 ]
 
 class Property(models.Model):
-    nom = models.CharField(max_length=100)
+    nom = models.CharField(max_length=100, db_index=True)  # recherche par préfixe de l'admin
     type_logement = models.CharField(max_length=20, choices=LOGEMENT_TYPES)
     adresse = models.TextField()
     description = models.TextField(blank=True)
@@ -51,6 +57,22 @@ class Property(models.Model):
         on_delete=models.CASCADE,
         limit_choices_to={'role': 'admin'}
     )
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
+    latitude = models.FloatField(null=True, blank=True,
+                                 validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True,
+                                  validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    # Geohash des coordonnées : recherche de proximité par préfixe indexé (core.proximite)
+    cellule = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        if self.latitude is None or self.longitude is None:
+            self.cellule = ''
+        else:
+            self.cellule = geohash(self.latitude, self.longitude)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'cellule'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.nom} - {self.type_logement}"
@@ -58,16 +80,29 @@ class Property(models.Model):
 
 class ImageLogement(models.Model):
     logement = models.ForeignKey(Property, related_name="images", on_delete=models.CASCADE)
-    image = models.ImageField(upload_to="logements/")
+    image = models.ImageField(upload_to="logements/", storage=stockage_dedup)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
 
 
 class Contract(models.Model):
     locataire = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, limit_choices_to={'role': 'locataire'})
     logement = models.ForeignKey(Property, on_delete=models.CASCADE)
-    fichier_pdf = models.FileField(upload_to='contrats/')
+    fichier_pdf = models.FileField(upload_to='contrats/', storage=stockage_dedup)
     date_debut = models.DateField()
     date_fin = models.DateField()
     date_creation = models.DateTimeField(auto_now_add=True)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # Chevauchements refusés en base : voir core.disponibilite et la migration 0014
+        constraints = [
+            models.CheckConstraint(condition=models.Q(date_fin__gte=models.F('date_debut')),
+                                   name='contrat_dates_ordonnees'),
+        ]
+        indexes = [
+            models.Index(fields=['logement', 'date_debut', 'date_fin']),
+            models.Index(fields=['date_debut']),
+        ]
 
     def __str__(self):
         return f"Contrat {self.locataire.username} - {self.logement.nom}"
@@ -94,10 +129,20 @@ class Payment(models.Model):
     montant = models.DecimalField(max_digits=10, decimal_places=2)
     type_paiement = models.CharField(max_length=20, choices=PAYMENT_TYPES)
     mode_paiement = models.CharField(max_length=20, choices=MODE_PAIEMENT, default='Mobile Money')
-    mois_concerne = models.CharField(max_length=20, help_text="Ex: Juin 2025")
+    mois_concerne = models.CharField(max_length=20, db_index=True, help_text="Ex: Juin 2025")
     est_valide = models.BooleanField(default=False)
     date_paiement = models.DateTimeField(default=timezone.now)
     fichier_recu = models.FileField(upload_to='recus/', blank=True, null=True)
+    # Validation (reçu + e-mail) en file, faite hors requête par la commande valider_paiements
+    validation_demandee = models.DateTimeField(null=True, blank=True, editable=False)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_paiement']),
+            models.Index(fields=['validation_demandee'], condition=models.Q(validation_demandee__isnull=False),
+                         name='paiement_validation_demandee'),
+        ]
 
     def __str__(self):
         return f"{self.locataire.username} - {self.type_paiement} - {self.mois_concerne}"
@@ -106,12 +151,261 @@ class Message(models.Model):
     expediteur = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='messages_envoyes', on_delete=models.CASCADE)
     destinataire = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='messages_recus', on_delete=models.CASCADE)
     texte = models.TextField(blank=True, null=True)
-    image = models.FileField(upload_to='messages/', blank=True, null=True)
+    image = models.FileField(upload_to='messages/', storage=stockage_dedup, blank=True, null=True)
     date_envoi = models.DateTimeField(auto_now_add=True)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['date_envoi']
+        indexes = [
+            models.Index(fields=['date_envoi']),
+        ]
 
     def __str__(self):
         return f"Message de {self.expediteur} à {self.destinataire} - {self.date_envoi.strftime('%Y-%m-%d %H:%M')}"
 
+
+class MessageArchive(models.Model):
+    # Message ancien déplacé hors de la table chaude (core.archivage), même identifiant
+    id = models.BigIntegerField(primary_key=True)
+    expediteur = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    destinataire = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    texte = models.TextField(blank=True, null=True)
+    image = models.FileField(upload_to='messages/', storage=stockage_dedup, blank=True, null=True)
+    date_envoi = models.DateTimeField()
+    date_archivage = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['date_envoi']
+        indexes = [
+            models.Index(fields=['expediteur', 'date_envoi']),
+            models.Index(fields=['destinataire', 'date_envoi']),
+        ]
+
+
+class PaymentArchive(models.Model):
+    # Paiement validé d'un contrat terminé, déplacé hors de la table chaude (core.archivage)
+    id = models.BigIntegerField(primary_key=True)
+    locataire = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    logement = models.ForeignKey(Property, related_name='+', on_delete=models.CASCADE)
+    montant = models.DecimalField(max_digits=10, decimal_places=2)
+    type_paiement = models.CharField(max_length=20, choices=PAYMENT_TYPES)
+    mode_paiement = models.CharField(max_length=20, choices=MODE_PAIEMENT, default='Mobile Money')
+    mois_concerne = models.CharField(max_length=20)
+    est_valide = models.BooleanField(default=True)
+    date_paiement = models.DateTimeField()
+    fichier_recu = models.FileField(upload_to='recus/', blank=True, null=True)
+    date_archivage = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['locataire', 'date_paiement']),
+            models.Index(fields=['logement', 'date_paiement']),
+        ]
+
+
+class FichierContenu(models.Model):
+    # Fichier média stocké une seule fois sous son empreinte (voir core.storage). Pas de compteur
+    # de références : un contenu plus référencé par aucune ligne est retiré par nettoyer_medias.
+    empreinte = models.CharField(max_length=64, db_index=True)
+    chemin = models.CharField(max_length=255, unique=True)
+    taille = models.PositiveBigIntegerField()
+    # Enregistrements de ce contenu ; nettoyer_medias s'en sert pour repérer un envoi concurrent
+    envois = models.PositiveIntegerField(default=0)
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.chemin} ({self.envois} envois)"
+
+
+class ChargeRecurrente(models.Model):
+    # Charge ajoutée chaque mois au loyer lors de la facturation (eau, internet...)
+    logement = models.ForeignKey(Property, related_name='charges', on_delete=models.CASCADE)
+    type_charge = models.CharField(max_length=20, choices=PAYMENT_TYPES)
+    montant = models.DecimalField(max_digits=10, decimal_places=2)
+    active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.logement.nom} - {self.type_charge} - {self.montant}"
+
+
+class Echeance(models.Model):
+    # Montant attendu pour un mois donné, généré par la facturation mensuelle (core.facturation)
+    contrat = models.ForeignKey(Contract, related_name='echeances', on_delete=models.CASCADE)
+    locataire = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='echeances', on_delete=models.CASCADE)
+    logement = models.ForeignKey(Property, related_name='echeances', on_delete=models.CASCADE)
+    type_charge = models.CharField(max_length=20, choices=PAYMENT_TYPES)
+    montant = models.DecimalField(max_digits=10, decimal_places=2)
+    periode = models.DateField(help_text="Premier jour du mois facturé")
+    mois_concerne = models.CharField(max_length=20, help_text="Ex: Juin 2025")
+    date_limite = models.DateField()
+    paiement = models.ForeignKey(Payment, related_name='echeances', on_delete=models.SET_NULL, null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['periode', 'id']
+        constraints = [
+            # Une seule échéance par contrat, type et mois : relancer la facturation ne duplique rien
+            models.UniqueConstraint(fields=['contrat', 'type_charge', 'periode'], name='echeance_unique_par_mois'),
+        ]
+        indexes = [
+            models.Index(fields=['locataire', 'periode']),
+            models.Index(fields=['periode', 'logement']),
+        ]
+
+    def __str__(self):
+        return f"{self.locataire} - {self.type_charge} - {self.mois_concerne}"
+
+
+class CycleFacturation(models.Model):
+    # Avancement d'une facturation mensuelle, pour la reprendre après une interruption
+    EN_COURS = 'en_cours'
+    TERMINE = 'termine'
+    STATUTS = [(EN_COURS, 'En cours'), (TERMINE, 'Terminé')]
+
+    periode = models.DateField()
+    proprietaire = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
+    statut = models.CharField(max_length=10, choices=STATUTS, default=EN_COURS)
+    dernier_contrat = models.PositiveBigIntegerField(default=0)
+    nb_contrats = models.PositiveIntegerField(default=0)
+    nb_echeances = models.PositiveIntegerField(default=0)
+    date_debut = models.DateTimeField(auto_now_add=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['periode', 'proprietaire'], name='cycle_unique_par_proprietaire'),
+            models.UniqueConstraint(fields=['periode'], condition=models.Q(proprietaire__isnull=True),
+                                    name='cycle_global_unique'),
+        ]
+
+    def __str__(self):
+        return f"Facturation {self.periode:%Y-%m} ({self.statut})"
+
+
+class RequeteIdempotente(models.Model):
+    # Réponse d'un POST portant un en-tête Idempotency-Key, rejouée aux nouvelles tentatives (core.idempotence)
+    EN_COURS = 'en_cours'
+    TERMINE = 'termine'
+    STATUTS = [(EN_COURS, 'En cours'), (TERMINE, 'Terminé')]
+
+    utilisateur = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    cle = models.CharField(max_length=255)
+    empreinte = models.CharField(max_length=64, help_text="SHA-256 de la méthode, du chemin et du corps")
+    statut = models.CharField(max_length=10, choices=STATUTS, default=EN_COURS)
+    code_http = models.PositiveSmallIntegerField(null=True, blank=True)
+    type_contenu = models.CharField(max_length=100, blank=True)
+    reponse = models.BinaryField(null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_expiration = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['utilisateur', 'cle'], name='idempotence_cle_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.utilisateur_id} - {self.cle} ({self.statut})"
+
+
+class TeleversementConfirme(models.Model):
+    # Clé d'un téléversement direct déjà confirmée : un jeton ne sert qu'une fois
+    cle = models.CharField(max_length=255, unique=True)
+    utilisateur = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    date_confirmation = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.cle
+
+
+class Suppression(models.Model):
+    # Pierre tombale : suppression à transmettre aux clients hors ligne (core.synchronisation).
+    # Pas de clé étrangère réelle : l'utilisateur concerné peut avoir été supprimé avec l'objet.
+    MODELES = [
+        ('logement', 'Logement'),
+        ('image', 'Image de logement'),
+        ('contrat', 'Contrat'),
+        ('paiement', 'Paiement'),
+        ('message', 'Message'),
+        ('utilisateur', 'Utilisateur'),
+    ]
+
+    utilisateur = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.DO_NOTHING,
+                                    db_constraint=False)
+    modele = models.CharField(max_length=20, choices=MODELES)
+    objet_id = models.BigIntegerField()
+    date_suppression = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['utilisateur', 'date_suppression']),
+        ]
+
+    def __str__(self):
+        return f"{self.modele} {self.objet_id} supprimé ({self.utilisateur_id})"
+
+
+class EvenementMobileMoney(models.Model):
+    # Notification brute d'un opérateur Mobile Money (core.mobile_money), en ajout seul :
+    # ni modifiée ni supprimée (triggers de la migration 0021). Traitement dans RapprochementMobileMoney.
+    transaction_id = models.CharField(max_length=100, unique=True, help_text="Identifiant chez l'opérateur")
+    corps = models.TextField(help_text="Corps JSON reçu, tel quel")
+    date_reception = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Transaction {self.transaction_id}"
+
+
+class RapprochementMobileMoney(models.Model):
+    # Résultat du traitement par lot d'une notification
+    A_VALIDER = 'a_valider'
+    VALIDE = 'valide'
+    REJETE = 'rejete'
+    STATUTS = [(A_VALIDER, 'À valider'), (VALIDE, 'Validé'), (REJETE, 'Rejeté')]
+
+    evenement = models.OneToOneField(EvenementMobileMoney, primary_key=True, related_name='rapprochement',
+                                     on_delete=models.PROTECT)
+    statut = models.CharField(max_length=10, choices=STATUTS)
+    paiement = models.ForeignKey(Payment, related_name='rapprochements_mobile_money', on_delete=models.SET_NULL,
+                                 null=True, blank=True)
+    motif = models.CharField(max_length=255, blank=True)
+    # Validations échouées (reçu, e-mail) : les moins tentées passent en premier
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    date_traitement = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Validations restées en suspens (worker interrompu, échec), reprises au passage suivant
+            models.Index(fields=['tentatives', 'evenement'], condition=models.Q(statut='a_valider'),
+                         name='rapprochement_a_valider'),
+        ]
+
+    def __str__(self):
+        return f"{self.evenement_id} ({self.statut})"
+
+
+class Relance(models.Model):
+    # Rappel de loyer envoyé à un locataire (core.relances) : un seul par mois et par nature,
+    # quel que soit le nombre d'exécutions de la commande relancer_loyers
+    ECHEANCE = 'echeance'
+    RETARD = 'retard'
+    NATURES = [(ECHEANCE, 'Loyer à payer'), (RETARD, 'Loyer en retard')]
+
+    locataire = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='relances', on_delete=models.CASCADE)
+    periode = models.DateField(help_text="Premier jour du mois concerné")
+    nature = models.CharField(max_length=10, choices=NATURES)
+    message = models.ForeignKey(Message, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    # File d'envoi des e-mails : NULL tant que l'e-mail n'est pas parti
+    date_email = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['locataire', 'periode', 'nature'], name='relance_unique_par_mois'),
+        ]
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(date_email__isnull=True), name='relance_email_en_attente'),
+        ]
+
+    def __str__(self):
+        return f"{self.locataire} - {self.nature} - {self.periode:%Y-%m}"
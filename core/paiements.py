@@ -0,0 +1,77 @@
+# core/paiements.py
+
+import logging
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from utils.email_utils import envoyer_recu_par_mail
+from utils.pdf_generator import generer_recu_paiement
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+
+def valider_paiement(paiement, admin_nom):
+    """Valide le paiement, génère son reçu PDF et l'envoie au locataire ; renvoie le chemin du reçu."""
+    paiement.est_valide = True
+
+    chemin_relatif = generer_recu_paiement(paiement, admin_nom)
+    paiement.fichier_recu = chemin_relatif
+    paiement.save()
+
+    # Chemin absolu du PDF pour l’envoi mail
+    chemin_absolu = os.path.join(settings.MEDIA_ROOT, chemin_relatif)
+    envoyer_recu_par_mail(paiement, chemin_absolu)
+    return chemin_relatif
+
+
+def valider_paiements(paiements, admin_nom):
+    """Valide un à un les paiements non validés du queryset ; renvoie (validés, en erreur)."""
+    valides, echecs = 0, 0
+    for paiement in paiements.filter(est_valide=False).select_related('locataire', 'logement').iterator(chunk_size=200):
+        try:
+            valider_paiement(paiement, admin_nom)
+            valides += 1
+        except Exception:
+            logger.exception("Validation du paiement %s impossible", paiement.pk)
+            echecs += 1
+    return valides, echecs
+
+
+def demander_validation(paiements):
+    """Met en file la validation des paiements non validés du queryset (une requête) ; renvoie leur nombre."""
+    return paiements.filter(est_valide=False, validation_demandee__isnull=True).update(
+        validation_demandee=timezone.now())
+
+
+def valider_demandes(taille):
+    """Valide jusqu'à ``taille`` paiements en file, demandes les plus anciennes d'abord ; renvoie (validés, en erreur).
+
+    Reçu signé par le propriétaire du logement. Une validation en échec repasse en fin de file
+    (demande redatée) sans bloquer les suivantes ; SKIP LOCKED : plusieurs workers se partagent la file.
+    """
+    valides, echecs = 0, 0
+    en_file = Payment.objects.filter(validation_demandee__isnull=False)
+    for identifiant in list(en_file.order_by('validation_demandee', 'pk').values_list('pk', flat=True)[:taille]):
+        with transaction.atomic():
+            paiement = en_file.select_for_update(skip_locked=True, of=('self',)).select_related(
+                'locataire', 'logement__proprietaire').filter(pk=identifiant).first()
+            if paiement is None:
+                continue  # traité par un autre worker
+            if paiement.est_valide:
+                Payment.objects.filter(pk=paiement.pk).update(validation_demandee=None)
+                continue
+            try:
+                with transaction.atomic():
+                    paiement.validation_demandee = None
+                    valider_paiement(paiement, paiement.logement.proprietaire.get_full_name())
+            except Exception:
+                logger.exception("Validation du paiement %s impossible", paiement.pk)
+                Payment.objects.filter(pk=paiement.pk).update(validation_demandee=timezone.now())
+                echecs += 1
+                continue
+            valides += 1
+    return valides, echecs
@@ -0,0 +1,133 @@
+# core/projections.py
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from utils.metrics import mesurer
+from .serializers import PaymentSerializer, MessageSerializer
+
+
+class Projection:
+    """Liste en lecture seule construite directement depuis les lignes ``values_list()``.
+
+    Produit les mêmes dictionnaires que ``serializer_class(objets, many=True).data`` sans
+    instancier de modèles ni passer par get_attribute/to_representation champ par champ :
+    les accesseurs (position de colonne + conversion) sont compilés une fois par requête à
+    partir des champs du serializer. Les SerializerMethodField sont réécrits dans ``specifiques``.
+    """
+
+    serializer_class = None
+
+    def __init__(self, contexte):
+        self.request = contexte.get('request')
+        serializer = self.serializer_class(context=contexte)
+        self.modele = serializer.Meta.model
+        self.colonnes = []
+        self.urls = {}
+        specifiques = self.specifiques()
+        self.accesseurs = [
+            (champ.field_name, specifiques[champ.field_name]() if champ.field_name in specifiques
+             else self.compiler(champ))
+            for champ in serializer.fields.values() if not champ.write_only
+        ]
+
+    def specifiques(self):
+        """{nom du champ: fonction renvoyant l'accesseur}"""
+        return {}
+
+    def colonne(self, nom):
+        # Position de la colonne dans les lignes values_list()
+        if nom not in self.colonnes:
+            self.colonnes.append(nom)
+        return self.colonnes.index(nom)
+
+    def compiler(self, champ):
+        nom = champ.source.replace('.', '__')
+        if isinstance(champ, serializers.FileField):
+            return self.url_fichier(nom)
+        i = self.colonne(nom)
+        if isinstance(champ, serializers.PrimaryKeyRelatedField):
+            # values_list('logement') donne déjà la clé primaire
+            return lambda ligne: ligne[i]
+        if isinstance(champ, serializers.DateTimeField) and getattr(champ, 'format', api_settings.DATETIME_FORMAT) \
+                == ISO_8601 and settings.USE_TZ:
+            return self.date_iso(i)
+        convertir = champ.to_representation
+        return lambda ligne: None if ligne[i] is None else convertir(ligne[i])
+
+    @staticmethod
+    def date_iso(i):
+        # DateTimeField.to_representation, fuseau courant lu une fois et non à chaque ligne
+        fuseau = timezone.get_current_timezone()
+
+        def accesseur(ligne):
+            valeur = ligne[i]
+            if not valeur:
+                return None
+            valeur = valeur.astimezone(fuseau).isoformat()
+            return valeur[:-6] + 'Z' if valeur.endswith('+00:00') else valeur
+        return accesseur
+
+    def url_fichier(self, nom):
+        # Comme serializers.FileField (UPLOADED_FILES_USE_URL) : URL absolue si la requête est connue.
+        # Un seul accesseur par colonne, qui garde la dernière URL : fichier_recu et fichier_recu_url
+        # la calculent une seule fois par ligne.
+        if nom in self.urls:
+            return self.urls[nom]
+        i = self.colonne(nom)
+        stockage = self.modele._meta.get_field(nom).storage
+        request = self.request
+        dernier = [None, None]
+
+        def accesseur(ligne):
+            fichier = ligne[i]
+            if not fichier:
+                return None
+            if fichier != dernier[0]:
+                url = stockage.url(fichier)
+                dernier[:] = fichier, request.build_absolute_uri(url) if request is not None else url
+            return dernier[1]
+        self.urls[nom] = accesseur
+        return accesseur
+
+    def nom_complet(self, prefixe):
+        # CustomUser.get_full_name() or username
+        prenom, nom = self.colonne(f'{prefixe}__first_name'), self.colonne(f'{prefixe}__last_name')
+        username = self.colonne(f'{prefixe}__username')
+        return lambda ligne: f"{ligne[prenom]} {ligne[nom]}".strip() or ligne[username]
+
+    def lignes(self, queryset):
+        return queryset.values_list(*self.colonnes)
+
+    def projeter(self, lignes):
+        accesseurs = self.accesseurs
+        with mesurer('serializer'):
+            return [{nom: accesseur(ligne) for nom, accesseur in accesseurs} for ligne in lignes]
+
+
+class PaymentProjection(Projection):
+    serializer_class = PaymentSerializer
+
+    def specifiques(self):
+        return {
+            'locataire_nom': lambda: self.nom_complet('locataire'),
+            'proprietaire_nom': lambda: self.nom_complet('logement__proprietaire'),
+            # get_fichier_recu_url : None sans requête
+            'fichier_recu_url': lambda: self.url_fichier('fichier_recu') if self.request is not None
+            else lambda ligne: None,
+        }
+
+
+class MessageProjection(Projection):
+    serializer_class = MessageSerializer
+
+    def specifiques(self):
+        return {'expediteur': lambda: self.utilisateur('expediteur'),
+                'destinataire': lambda: self.utilisateur('destinataire')}
+
+    def utilisateur(self, prefixe):
+        identifiant, username = self.colonne(prefixe), self.colonne(f'{prefixe}__username')
+        full_name = self.nom_complet(prefixe)
+        return lambda ligne: {'id': ligne[identifiant], 'username': ligne[username], 'full_name': full_name(ligne)}
@@ -0,0 +1,120 @@
+# core/proximite.py
+
+import math
+
+from django.db.models import F, Q, Value, FloatField
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+from rest_framework.exceptions import ValidationError
+
+# Geohash : chaque caractère ajoute 5 bits, alternativement longitude et latitude.
+# Property.cellule garde PRECISION caractères (~5 m) ; un préfixe désigne une case plus grande.
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9
+CELLULES_MAX = 16
+RAYON_TERRE_KM = 6371.0
+KM_PAR_DEGRE = 111.32
+RAYON_MAX_KM = 500
+
+
+def geohash(latitude, longitude, precision=PRECISION):
+    lat, lon = [-90.0, 90.0], [-180.0, 180.0]
+    caracteres, bits, valeur, pair = [], 0, 0, True
+    while len(caracteres) < precision:
+        intervalle, coordonnee = (lon, longitude) if pair else (lat, latitude)
+        milieu = (intervalle[0] + intervalle[1]) / 2
+        valeur <<= 1
+        if coordonnee >= milieu:
+            valeur |= 1
+            intervalle[0] = milieu
+        else:
+            intervalle[1] = milieu
+        pair = not pair
+        bits += 1
+        if bits == 5:
+            caracteres.append(BASE32[valeur])
+            bits, valeur = 0, 0
+    return ''.join(caracteres)
+
+
+def taille_case(precision):
+    # (hauteur en degrés de latitude, largeur en degrés de longitude) d'une case
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def cellules(sud, ouest, nord, est):
+    """Préfixes geohash couvrant le rectangle : la précision la plus fine qui tient en CELLULES_MAX cases."""
+    for precision in range(PRECISION, 0, -1):
+        hauteur, largeur = taille_case(precision)
+        lignes = range(int((sud + 90) // hauteur), int(min(nord + 90, 180 - 1e-9) // hauteur) + 1)
+        colonnes = range(int((ouest + 180) // largeur), int(min(est + 180, 360 - 1e-9) // largeur) + 1)
+        if len(lignes) * len(colonnes) <= CELLULES_MAX:
+            # Centre de chaque case : son geohash tronqué est le préfixe de la case
+            return sorted({
+                geohash((i + 0.5) * hauteur - 90, (j + 0.5) * largeur - 180, precision)
+                for i in lignes for j in colonnes
+            })
+    return ['']
+
+
+def dans_rectangle(logements, sud, ouest, nord, est):
+    # Préfixes : parcours d'index (LIKE 'abc%') ; bornes exactes ensuite sur les coordonnées
+    prefixes = Q()
+    for prefixe in cellules(sud, ouest, nord, est):
+        prefixes |= Q(cellule__startswith=prefixe)
+    return logements.filter(prefixes, latitude__range=(sud, nord), longitude__range=(ouest, est))
+
+
+def distance_km(latitude, longitude):
+    """Expression SQL : distance orthodromique (haversine) entre le logement et le point."""
+    dlat = Radians(F('latitude') - Value(latitude)) / 2
+    dlon = Radians(F('longitude') - Value(longitude)) / 2
+    a = Power(Sin(dlat), 2) + Value(math.cos(math.radians(latitude))) * Cos(Radians(F('latitude'))) * \
+        Power(Sin(dlon), 2)
+    return Value(2 * RAYON_TERRE_KM) * ASin(Sqrt(a), output_field=FloatField())
+
+
+def lire_nombre(params, cle, minimum, maximum):
+    if not params.get(cle):
+        raise ValidationError({cle: "Paramètre requis."})
+    try:
+        valeur = float(params[cle])
+    except (TypeError, ValueError):
+        raise ValidationError({cle: "Nombre attendu."})
+    if not (minimum <= valeur <= maximum) or math.isnan(valeur):
+        raise ValidationError({cle: f"Valeur attendue entre {minimum} et {maximum}."})
+    return valeur
+
+
+def recherche_geographique(params):
+    return any(cle in params for cle in ('bbox', 'lat', 'lon'))
+
+
+def filtrer_proximite(logements, params):
+    """?lat=...&lon=...&rayon=<km> : logements dans le cercle, du plus proche au plus lointain.
+
+    ?bbox=ouest,sud,est,nord (ordre GeoJSON) : logements dans le rectangle, pour une carte.
+    Les logements sans coordonnées sont exclus de ces recherches.
+    """
+    if 'bbox' in params:
+        try:
+            ouest, sud, est, nord = (float(x) for x in params['bbox'].split(','))
+        except ValueError:
+            raise ValidationError({'bbox': "Format attendu : ouest,sud,est,nord."})
+        if not (-90 <= sud <= nord <= 90 and -180 <= ouest <= est <= 180):
+            raise ValidationError({'bbox': "Rectangle invalide (ouest ≤ est, sud ≤ nord, en degrés)."})
+        logements = dans_rectangle(logements, sud, ouest, nord, est)
+
+    if 'lat' in params or 'lon' in params:
+        latitude = lire_nombre(params, 'lat', -90, 90)
+        longitude = lire_nombre(params, 'lon', -180, 180)
+        rayon = lire_nombre(params, 'rayon', 0, RAYON_MAX_KM) if 'rayon' in params else 5.0
+        # Rectangle englobant le cercle (bornes du globe ; pas de passage de l'antiméridien)
+        marge_lat = rayon / KM_PAR_DEGRE
+        cosinus = math.cos(math.radians(latitude))
+        marge_lon = rayon / (KM_PAR_DEGRE * cosinus) if cosinus > 1e-6 else 180
+        logements = dans_rectangle(logements, max(latitude - marge_lat, -90), max(longitude - marge_lon, -180),
+                                   min(latitude + marge_lat, 90), min(longitude + marge_lon, 180))
+        logements = logements.annotate(distance=distance_km(latitude, longitude)) \
+            .filter(distance__lte=rayon).order_by('distance', 'pk')
+    return logements
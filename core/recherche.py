@@ -0,0 +1,121 @@
+# core/recherche.py
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramSimilarity
+from django.core import signing
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import Message
+
+# Doit correspondre à la colonne générée de la migration 0019
+CONFIG = 'french'
+VECTEUR = RawSQL(f'"{Message._meta.db_table}"."texte_recherche"', [], output_field=SearchVectorField())
+INDEX_TRIGRAMMES = 'message_texte_trgm'
+MOTS = re.compile(r'[^\W_]+')
+MOTS_MAX = 8
+PREFIXE_MIN = 3
+SEL = 'core.recherche'
+
+# Index trigrammes présent (pg_trgm installé), par alias de base : vérifié une fois par processus
+_trigrammes = {}
+
+
+def termes(texte):
+    return MOTS.findall(texte)[:MOTS_MAX]
+
+
+def requete_plein_texte(mots, prefixe=False):
+    # Tous les mots ; avec ``prefixe``, le dernier peut être incomplet (« tuyau cass »)
+    if prefixe:
+        mots = mots[:-1] + [mots[-1] + ':*']
+    return SearchQuery(' & '.join(mots), config=CONFIG, search_type='raw')
+
+
+def participant(user_id):
+    # Lexème 'u<id>' de la colonne générée (migration 0019), hors dictionnaire français
+    return SearchQuery(f'u{int(user_id)}', config='simple', search_type='raw')
+
+
+def trigrammes(alias):
+    if alias not in _trigrammes:
+        with connections[alias].cursor() as curseur:
+            curseur.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [INDEX_TRIGRAMMES])
+            _trigrammes[alias] = curseur.fetchone() is not None
+    return _trigrammes[alias]
+
+
+def strategies(messages, texte, participants):
+    """Recherches à essayer dans l'ordre, chacune annotant ``score`` (plus grand = plus pertinent).
+
+    ``messages`` est déjà limité aux conversations voulues ; ``participants`` (identifiants
+    d'utilisateurs) permet à l'index plein texte d'appliquer lui-même cette restriction.
+    """
+    alias = messages.db
+    if connections[alias].vendor != 'postgresql':
+        return {'like': messages.filter(texte__icontains=texte).annotate(score=Value(0.0, FloatField()))}
+    mots = termes(texte)
+    restriction = None
+    for user_id in participants:
+        restriction = participant(user_id) if restriction is None else restriction & participant(user_id)
+
+    def plein_texte(requete):
+        # Index GIN sur texte_recherche, classement ts_rank converti en double (real relu inexact
+        # par Python : le curseur ne retrouverait pas sa ligne)
+        return messages.alias(vecteur=VECTEUR).filter(vecteur=requete & restriction) \
+            .annotate(score=Cast(SearchRank(VECTEUR, requete), FloatField()))
+
+    # Mots complets d'abord (rapide) ; le préfixe, plus coûteux dans l'index (correspondance
+    # partielle), n'est tenté qu'ensuite et pas pour un début de mot trop court
+    resultats = {'mots': plein_texte(requete_plein_texte(mots))}
+    if len(mots[-1]) >= PREFIXE_MIN:
+        resultats['prefixe'] = plein_texte(requete_plein_texte(mots, prefixe=True))
+    # Repli pour un morceau au milieu d'un mot (« uyau ») : seulement avec l'index trigrammes,
+    # un LIKE sans index parcourrait toutes les conversations de l'utilisateur
+    if trigrammes(alias):
+        resultats['trgm'] = messages.filter(texte__icontains=texte).annotate(
+            score=Cast(TrigramSimilarity('texte', texte), FloatField()))
+    return resultats
+
+
+def lire_curseur(curseur):
+    try:
+        mode, score, pk = signing.loads(curseur, salt=SEL)
+        return mode, float(score), int(pk)
+    except (TypeError, ValueError):
+        raise signing.BadSignature("Curseur invalide.")
+
+
+def page(queryset, mode, limite, score=None, pk=None):
+    # Pagination par curseur (score, id) : pas d'OFFSET, chaque page coûte autant que la première
+    if pk is not None:
+        queryset = queryset.filter(Q(score__lt=score) | Q(score=score, pk__lt=pk))
+    objets = list(queryset.order_by('-score', '-pk')[:limite + 1])
+    suivant = None
+    if len(objets) > limite:
+        objets = objets[:limite]
+        suivant = signing.dumps([mode, objets[-1].score, objets[-1].pk], salt=SEL)
+    return objets, suivant
+
+
+def rechercher(messages, texte, participants, curseur=None, limite=20):
+    """Messages de ``messages`` correspondant à ``texte``, les plus pertinents d'abord.
+
+    Renvoie (messages, curseur de la page suivante ou None). Les stratégies sont tentées
+    dans l'ordre jusqu'à la première qui trouve quelque chose ; le curseur retient celle
+    qui a servi.
+    """
+    candidates = strategies(messages, texte, participants)
+    if curseur:
+        mode, score, pk = lire_curseur(curseur)
+        if mode not in candidates:
+            raise signing.BadSignature("Curseur invalide.")
+        return page(candidates[mode], mode, limite, score, pk)
+    for mode, queryset in candidates.items():
+        objets, suivant = page(queryset, mode, limite)
+        if objets:
+            return objets, suivant
+    return [], None
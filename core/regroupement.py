@@ -0,0 +1,129 @@
+# core/regroupement.py
+
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+
+from utils.metrics import MesuresRequete, activer, desactiver, mesures_courantes
+
+logger = logging.getLogger(__name__)
+
+PREFIXE = '/api/'
+NOM_URL = 'batch'
+# En-têtes propres à la requête groupée, à ne pas transmettre aux sous-requêtes
+EN_TETES_EXCLUS = ('CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_IDEMPOTENCY_KEY', 'HTTP_IF_NONE_MATCH')
+
+
+def sous_requete(parent, user, methode, url, corps=None):
+    """Construit une requête Django à partir de la requête groupée, déjà authentifiée."""
+    morceaux = urlsplit(url)
+    contenu = b'' if corps is None else json.dumps(corps).encode()
+    environ = {cle: valeur for cle, valeur in parent.META.items() if cle not in EN_TETES_EXCLUS}
+    environ.update({
+        'REQUEST_METHOD': methode,
+        'PATH_INFO': morceaux.path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': morceaux.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(contenu)),
+        'wsgi.input': io.BytesIO(contenu),
+    })
+    requete = WSGIRequest(environ)
+    requete.user = user
+    # Authentification forcée (comme APIRequestFactory) : le JWT n'est pas relu à chaque sous-requête
+    requete._force_auth_user = user
+    requete._dont_enforce_csrf_checks = True
+    return requete
+
+
+def executer(parent, user, element):
+    """Exécute une sous-requête dans le processus ; renvoie {'id', 'statut', 'corps'}."""
+    methode, url = element['methode'], element['url']
+    resultat = {'id': element.get('id')}
+    try:
+        correspondance = resolve(urlsplit(url).path) if url.startswith(PREFIXE) else None
+    except Resolver404:
+        return dict(resultat, statut=404, corps={'detail': 'Introuvable.'})
+    if correspondance is None or correspondance.url_name == NOM_URL:
+        return dict(resultat, statut=400, corps={'detail': "URL non autorisée dans une requête groupée."})
+
+    # Vues hybrides ASGI (core.async_views) : on passe par le viewset DRF synchrone
+    vue = getattr(correspondance.func, 'vue_drf', correspondance.func)
+    try:
+        reponse = vue(sous_requete(parent, user, methode, url, element.get('corps')),
+                      *correspondance.args, **correspondance.kwargs)
+    except Exception:
+        logger.exception("Sous-requête %s %s en erreur", methode, url)
+        return dict(resultat, statut=500, corps={'detail': 'Erreur interne.'})
+    return dict(resultat, statut=reponse.status_code, corps=contenu(reponse))
+
+
+def contenu(reponse):
+    if isinstance(reponse, Response):
+        # Données déjà sérialisées : rendues une seule fois avec la réponse groupée
+        return reponse.data
+    if getattr(reponse, 'streaming', False):
+        brut = b''.join(reponse.streaming_content)
+    else:
+        if hasattr(reponse, 'render') and not reponse.is_rendered:
+            reponse.render()
+        brut = reponse.content
+    if not brut:
+        return None
+    if reponse.get('Content-Type', '').startswith('application/json'):
+        return json.loads(brut)
+    return brut.decode(reponse.charset or 'utf-8', errors='replace')
+
+
+def _executer_isole(parent, user, element):
+    # Thread du pool, dans une copie du contexte de la requête groupée (réplica, mesures) : connexion
+    # propre, rendue (ou fermée) à la fin, et mesures propres, cumulées ensuite par le thread principal
+    mesures = MesuresRequete() if mesures_courantes() is not None else None
+    jeton = activer(mesures)
+    try:
+        return executer(parent, user, element), mesures
+    finally:
+        desactiver(jeton)
+        connections.close_all()
+
+
+def executer_lot(parent, user, elements):
+    """Lectures consécutives exécutées en parallèle ; chaque écriture attend les précédentes.
+
+    L'ordre des résultats suit celui des sous-requêtes.
+    """
+    resultats = [None] * len(elements)
+    lectures = []
+
+    def vider(pool):
+        if len(lectures) == 1:
+            i = lectures[0]
+            resultats[i] = executer(parent, user, elements[i])
+        elif lectures:
+            # Une copie du contexte par tâche : un contexte ne peut être actif que dans un thread à la fois
+            taches = [pool.submit(copy_context().run, _executer_isole, parent, user, elements[i])
+                      for i in lectures]
+            for i, tache in zip(lectures, taches):
+                resultats[i], mesures = tache.result()
+                if mesures is not None:
+                    mesures_courantes().cumuler(mesures)
+        lectures.clear()
+
+    with ThreadPoolExecutor(max_workers=settings.BATCH_PARALLELISME) as pool:
+        for i, element in enumerate(elements):
+            if element['methode'] == 'GET':
+                lectures.append(i)
+                continue
+            vider(pool)
+            resultats[i] = executer(parent, user, element)
+        vider(pool)
+    return resultats
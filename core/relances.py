@@ -0,0 +1,135 @@
+# core/relances.py
+
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from utils.metrics import mesurer
+from .facturation import contrats_actifs, fin_de_mois, libelle_mois, motif_mois
+from .models import Echeance, Message, Payment, Relance
+
+SUJETS = {
+    Relance.ECHEANCE: "Rappel : loyer de {mois}",
+    Relance.RETARD: "Loyer de {mois} en retard",
+}
+TEXTES = {
+    Relance.ECHEANCE: "Bonjour {prenom}, rappel : votre loyer de {mois} ({logements}, {total} FCFA) "
+                      "est à régler avant le {date_limite:%d/%m/%Y}.",
+    Relance.RETARD: "Bonjour {prenom}, votre loyer de {mois} ({logements}, {total} FCFA) n'a pas encore "
+                    "été réglé : la date limite était le {date_limite:%d/%m/%Y}. Merci de régulariser rapidement.",
+}
+
+
+def date_limite(periode):
+    # Même échéance que la facturation mensuelle
+    return periode.replace(day=min(settings.FACTURATION_JOUR_LIMITE, fin_de_mois(periode).day))
+
+
+def nature_du_jour(periode, jour=None):
+    """Rappel avant la date limite, relance pour retard après."""
+    jour = jour or timezone.localdate()
+    return Relance.RETARD if jour > date_limite(periode) else Relance.ECHEANCE
+
+
+def a_relancer(periode, nature):
+    """Contrats actifs du mois sans loyer déclaré, dont le locataire n'a pas encore reçu cette relance.
+
+    Une seule requête (anti-jointures) ; un paiement en attente de validation suffit pour ne pas
+    relancer, comme une échéance de loyer du mois déjà réglée. Le mois saisi par le locataire
+    est comparé sans tenir compte de la casse, des espaces ni des accents.
+    """
+    loyer_declare = Payment.objects.filter(locataire=OuterRef('locataire'), logement=OuterRef('logement'),
+                                           type_paiement='loyer', mois_concerne__iregex=motif_mois(periode))
+    echeance_reglee = Echeance.objects.filter(contrat=OuterRef('pk'), periode=periode, type_charge='loyer',
+                                              paiement__isnull=False)
+    deja_relance = Relance.objects.filter(locataire=OuterRef('locataire'), periode=periode, nature=nature)
+    return contrats_actifs(periode).filter(~Exists(loyer_declare), ~Exists(echeance_reglee), ~Exists(deja_relance))
+
+
+def creer_relances(periode, nature, taille_lot=None, progression=None):
+    """Crée un message de relance par locataire concerné, environ ``taille_lot`` contrats par transaction.
+
+    Les contrats sont parcourus par locataire croissant (mémoire bornée à un lot). La contrainte
+    d'unicité (locataire, mois, nature) annule le lot d'une exécution concurrente, qui le relit
+    alors sans les locataires déjà relancés. Renvoie le nombre de relances créées.
+    """
+    taille_lot = taille_lot or settings.RELANCES_TAILLE_LOT
+    contrats = a_relancer(periode, nature)
+    mois, limite = libelle_mois(periode), date_limite(periode)
+    curseur, creees, conflits = 0, 0, 0
+    colonnes = ('locataire_id', 'locataire__first_name', 'locataire__username', 'logement__nom',
+                'logement__loyer_mensuel', 'logement__proprietaire_id')
+    while True:
+        lignes = list(contrats.filter(locataire_id__gt=curseur).order_by('locataire_id', 'pk').values_list(
+            *colonnes)[:taille_lot + 1])
+        if not lignes:
+            return creees
+        if len(lignes) > taille_lot:
+            # Lot coupé aux contrats du dernier locataire, repris en entier au lot suivant
+            dernier = lignes[-1][0]
+            lignes = [ligne for ligne in lignes if ligne[0] != dernier] or list(
+                contrats.filter(locataire_id=dernier).order_by('pk').values_list(*colonnes))
+
+        relances = []
+        for locataire_id, contrats_locataire in groupby(lignes, key=lambda ligne: ligne[0]):
+            contrats_locataire = list(contrats_locataire)
+            _, prenom, username, _, _, proprietaire_id = contrats_locataire[0]
+            texte = TEXTES[nature].format(
+                prenom=prenom or username, mois=mois, date_limite=limite,
+                logements=', '.join(ligne[3] for ligne in contrats_locataire),
+                total=sum(ligne[4] for ligne in contrats_locataire),
+            )
+            # Envoyé par le propriétaire du premier logement, comme un message saisi à la main
+            message = Message(expediteur_id=proprietaire_id, destinataire_id=locataire_id, texte=texte)
+            relances.append(Relance(locataire_id=locataire_id, periode=periode, nature=nature, message=message))
+
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create([relance.message for relance in relances], batch_size=1000)
+                Relance.objects.bulk_create(relances, batch_size=1000)
+        except IntegrityError:
+            conflits += 1
+            if conflits > 3:
+                raise
+            continue
+        conflits = 0
+        curseur = lignes[-1][0]
+        creees += len(relances)
+        if progression:
+            progression(creees)
+
+
+def envoyer_emails(taille_lot=None):
+    """Envoie les e-mails des relances en attente, lus par lots, sur une même connexion SMTP.
+
+    Chaque relance est verrouillée (SKIP LOCKED) et marquée envoyée dans sa propre transaction,
+    juste après son envoi : une erreur SMTP en cours de lot ne fait repartir aucun e-mail déjà
+    envoyé, et deux exécutions simultanées n'envoient pas deux fois le même. Une erreur SMTP
+    interrompt l'envoi ; les relances restantes partent à l'exécution suivante. Renvoie le nombre d'e-mails.
+    """
+    taille_lot = taille_lot or settings.RELANCES_EMAILS_PAR_LOT
+    en_attente = Relance.objects.filter(date_email__isnull=True).exclude(locataire__email='')
+    envoyes, curseur = 0, 0
+    with get_connection() as connexion:
+        while True:
+            lot = list(en_attente.filter(pk__gt=curseur).order_by('pk').values_list('pk', flat=True)[:taille_lot])
+            if not lot:
+                return envoyes
+            curseur = lot[-1]
+            for pk in lot:
+                with transaction.atomic():
+                    ligne = en_attente.select_for_update(skip_locked=True, of=('self',)).filter(pk=pk).values_list(
+                        'locataire__email', 'message__texte', 'periode', 'nature').first()
+                    if ligne is None:
+                        continue  # envoyée par une autre exécution
+                    email, texte, periode, nature = ligne
+                    courriel = EmailMessage(SUJETS[nature].format(mois=libelle_mois(periode)), texte or '',
+                                            settings.DEFAULT_FROM_EMAIL, [email], connection=connexion)
+                    with mesurer('smtp'):
+                        connexion.send_messages([courriel])
+                    Relance.objects.filter(pk=pk).update(date_email=timezone.now())
+                envoyes += 1
@@ -0,0 +1,209 @@
+# core/releves.py
+
+import csv
+import datetime
+import io
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Payment, CustomUser
+from .paiements import demander_validation, valider_paiements
+
+# Colonnes reconnues dans l'en-tête du relevé (minuscules), par champ
+COLONNES = {
+    'date': ('date', 'date_operation', 'date operation'),
+    'montant': ('montant', 'credit', 'crédit', 'amount'),
+    'reference': ('reference', 'référence', 'ref', 'locataire'),
+    'mois': ('mois', 'mois_concerne', 'mois concerné'),
+}
+FORMATS_DATE = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+
+class ReleveInvalide(ValueError):
+    pass
+
+
+def lire_date(texte):
+    texte = texte.strip()[:10]
+    for format_date in FORMATS_DATE:
+        try:
+            return datetime.datetime.strptime(texte, format_date).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Date illisible : {texte!r}.")
+
+
+def lire_montant(texte):
+    # '25 000,00' ou '25000.00' ; seuls les crédits sont rapprochés
+    try:
+        montant = Decimal(texte.replace('\xa0', '').replace(' ', '').replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"Montant illisible : {texte!r}.")
+    if not montant.is_finite() or montant <= 0:
+        raise ValueError(f"Montant non positif : {texte!r}.")
+    return montant
+
+
+def normaliser(texte):
+    return ' '.join((texte or '').split()).casefold()
+
+
+def lire_releve(fichier):
+    """Lignes du relevé CSV (séparateur ; , ou tabulation) -> (lignes, invalides).
+
+    Chaque ligne : {'ligne', 'date', 'montant', 'reference', 'mois'} ; ``ligne`` est le numéro
+    dans le fichier (en-tête = 1).
+    """
+    contenu = fichier.read()
+    if isinstance(contenu, bytes):
+        try:
+            contenu = contenu.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            contenu = contenu.decode('latin-1')
+    try:
+        dialecte = csv.Sniffer().sniff(contenu[:4096], delimiters=';,\t')
+    except csv.Error:
+        dialecte = csv.excel
+    lecteur = csv.reader(io.StringIO(contenu), dialecte)
+    entete = [normaliser(colonne) for colonne in next(lecteur, [])]
+    positions = {}
+    for champ, noms in COLONNES.items():
+        position = next((entete.index(nom) for nom in noms if nom in entete), None)
+        if position is not None:
+            positions[champ] = position
+    manquantes = {'date', 'montant', 'reference'} - set(positions)
+    if manquantes:
+        raise ReleveInvalide(f"Colonnes manquantes : {', '.join(sorted(manquantes))}.")
+
+    lignes, invalides = [], []
+    for numero, valeurs in enumerate(lecteur, start=2):
+        if not any(valeurs):
+            continue
+        try:
+            if len(valeurs) <= max(positions.values()):
+                raise ValueError("Colonnes manquantes sur la ligne.")
+            lignes.append({
+                'ligne': numero,
+                'date': lire_date(valeurs[positions['date']]),
+                'montant': lire_montant(valeurs[positions['montant']]),
+                'reference': valeurs[positions['reference']].strip(),
+                'mois': normaliser(valeurs[positions['mois']]) if 'mois' in positions else '',
+            })
+        except ValueError as exc:
+            invalides.append({'ligne': numero, 'erreur': str(exc)})
+    return lignes, invalides
+
+
+def rapprocher(proprietaire, lignes, fenetre=3, mode=None):
+    """Rapproche les lignes du relevé des paiements des logements du propriétaire.
+
+    Clé de jointure (locataire, montant) : les paiements candidats sont lus en une requête
+    (période du relevé ± ``fenetre`` jours, sur l'index date_paiement) et rangés dans un
+    dictionnaire ; chaque ligne y cherche ses candidats en temps constant, puis garde ceux
+    du bon mois et à ``fenetre`` jours au plus. La référence est le nom d'utilisateur ou
+    l'e-mail du locataire, ou « P<id> » du paiement (références Mobile Money).
+
+    Un candidat unique, ou strictement le plus proche en date, est rapproché ; une égalité, ou
+    un paiement désigné par plusieurs lignes, rend la ligne ambiguë.
+    """
+    rapport = {'rapproches': [], 'ambigus': [], 'manquants': [], 'non_releves': []}
+    if not lignes:
+        return rapport
+
+    du = min(ligne['date'] for ligne in lignes)
+    au = max(ligne['date'] for ligne in lignes)
+    marge = datetime.timedelta(days=fenetre)
+    fuseau = timezone.get_current_timezone()
+    debut = timezone.make_aware(datetime.datetime.combine(du - marge, datetime.time.min), fuseau)
+    fin = timezone.make_aware(datetime.datetime.combine(au + marge + datetime.timedelta(days=1), datetime.time.min),
+                              fuseau)
+    paiements = Payment.objects.filter(logement__proprietaire=proprietaire, date_paiement__gte=debut,
+                                       date_paiement__lt=fin)
+    if mode:
+        paiements = paiements.filter(mode_paiement=mode)
+
+    par_cle, par_id = defaultdict(list), {}
+    for pk, locataire_id, montant, date_paiement, mois_concerne, est_valide in paiements.values_list(
+            'pk', 'locataire_id', 'montant', 'date_paiement', 'mois_concerne', 'est_valide').iterator(chunk_size=5000):
+        candidat = (pk, date_paiement.astimezone(fuseau).date(), normaliser(mois_concerne), est_valide)
+        par_cle[locataire_id, montant].append(candidat)
+        par_id[pk] = (locataire_id, montant, candidat)
+
+    # Locataires rattachés au propriétaire, et tous ceux qui ont payé pour ses logements sur la
+    # période (leur CustomUser.proprietaire peut être vide ou désigner un autre compte)
+    locataires = {}
+    for pk, username, email in CustomUser.objects.filter(
+            Q(proprietaire=proprietaire) | Q(pk__in=paiements.values('locataire_id'))).values_list(
+            'pk', 'username', 'email'):
+        locataires[username.casefold()] = pk
+        if email:
+            locataires.setdefault(email.casefold(), pk)
+
+    choix, cites = {}, set()
+    for ligne in lignes:
+        reference = ligne['reference'].casefold()
+        if reference[:1] == 'p' and reference[1:].isdigit():
+            locataire_id, montant, candidat = par_id.get(int(reference[1:]), (None, None, None))
+            candidats = [candidat] if montant == ligne['montant'] else []
+        elif reference in locataires:
+            candidats = par_cle.get((locataires[reference], ligne['montant']), [])
+        else:
+            rapport['manquants'].append({'ligne': ligne['ligne'], 'motif': "Référence inconnue."})
+            continue
+
+        proches = sorted(
+            (abs((date - ligne['date']).days), pk) for pk, date, mois, _ in candidats
+            if abs((date - ligne['date']).days) <= fenetre and (not ligne['mois'] or mois == ligne['mois'])
+        )
+        if not proches:
+            rapport['manquants'].append({'ligne': ligne['ligne'], 'motif': "Aucun paiement correspondant."})
+        elif len(proches) > 1 and proches[0][0] == proches[1][0]:
+            egaux = [pk for ecart, pk in proches if ecart == proches[0][0]]
+            rapport['ambigus'].append({'ligne': ligne['ligne'], 'paiements': egaux})
+            cites.update(egaux)
+        else:
+            choix[ligne['ligne']] = proches[0][1]
+
+    # Un paiement choisi par plusieurs lignes ne peut être attribué à aucune d'elles
+    lignes_par_paiement = defaultdict(list)
+    for numero, pk in choix.items():
+        lignes_par_paiement[pk].append(numero)
+    for pk, numeros in lignes_par_paiement.items():
+        if len(numeros) > 1:
+            rapport['ambigus'].extend({'ligne': numero, 'paiements': [pk]} for numero in numeros)
+        else:
+            rapport['rapproches'].append({'ligne': numeros[0], 'paiement': pk, 'deja_valide': par_id[pk][2][3]})
+    rapport['rapproches'].sort(key=lambda rapproche: rapproche['ligne'])
+    rapport['ambigus'].sort(key=lambda ambigu: ambigu['ligne'])
+
+    # Paiements déclarés sur la période du relevé qui n'y figurent pas
+    rapport['non_releves'] = sorted(
+        pk for pk, (_, _, (_, date, _, _)) in par_id.items()
+        if du <= date <= au and pk not in lignes_par_paiement and pk not in cites
+    )
+    return rapport
+
+
+def valider_rapproches(rapport, proprietaire, taille_lot=500):
+    """Valide (reçu PDF + e-mail) les paiements rapprochés pas encore validés ; renvoie (validés, en erreur)."""
+    identifiants = [rapproche['paiement'] for rapproche in rapport['rapproches'] if not rapproche['deja_valide']]
+    valides, echecs = 0, 0
+    for i in range(0, len(identifiants), taille_lot):
+        v, e = valider_paiements(Payment.objects.filter(pk__in=identifiants[i:i + taille_lot],
+                                                        logement__proprietaire=proprietaire),
+                                 proprietaire.get_full_name())
+        valides, echecs = valides + v, echecs + e
+    return valides, echecs
+
+
+def demander_validation_rapproches(rapport, proprietaire, taille_lot=500):
+    """Met en file la validation des paiements rapprochés (commande valider_paiements) ; renvoie leur nombre."""
+    identifiants = [rapproche['paiement'] for rapproche in rapport['rapproches'] if not rapproche['deja_valide']]
+    return sum(
+        demander_validation(Payment.objects.filter(pk__in=identifiants[i:i + taille_lot],
+                                                   logement__proprietaire=proprietaire))
+        for i in range(0, len(identifiants), taille_lot)
+    )
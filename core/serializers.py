@@ -1,12 +1,28 @@
 #core/serializers.py
 
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
-from rest_framework import serializers
-from rest_framework.templatetags.rest_framework import data
-from .models import Property, Contract, Payment, Message, CustomUser, ImageLogement
-from utils.pdf_generator import generer_recu_paiement
-
-class ProfileSerializer(serializers.ModelSerializer):
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from .disponibilite import CONTRAINTE_CHEVAUCHEMENT, est_loue
+from .facturation import periode_depuis
+from .models import Property, Contract, Payment, Message, CustomUser, ImageLogement, Echeance, CycleFacturation, \
+    TeleversementConfirme, MODE_PAIEMENT
+from utils.metrics import mesurer
+from utils.uploads import CIBLES, lire_jeton, verifier_fichier
+
+
+class MesureSerializerMixin:
+    # Temps de sérialisation reporté dans Server-Timing (les imbrications ne comptent qu'une fois)
+    def to_representation(self, instance):
+        with mesurer('serializer'):
+            return super().to_representation(instance)
+
+
+class ProfileSerializer(MesureSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'photo']
@@ -36,9 +52,14 @@ class PropertyCreateSerializer(serializers.ModelSerializer):
         model = Property
         fields = [
             'nom', 'type_logement', 'adresse', 'description',
-            'loyer_mensuel', 'caution', 'minimum_mois', 'images'
+            'loyer_mensuel', 'caution', 'minimum_mois', 'latitude', 'longitude', 'images'
         ]
 
+    def validate(self, attrs):
+        if (attrs.get('latitude') is None) != (attrs.get('longitude') is None):
+            raise serializers.ValidationError("Latitude et longitude vont ensemble.")
+        return attrs
+
     def create(self, validated_data):
         images_data = validated_data.pop('images', [])
         proprietaire = self.context['request'].user
@@ -50,27 +71,41 @@ class PropertyCreateSerializer(serializers.ModelSerializer):
         return property_instance
 
 
-class PropertySerializer(serializers.ModelSerializer):
+class PropertySerializer(MesureSerializerMixin, serializers.ModelSerializer):
     images = ImageLogementSerializer(many=True, read_only=True)
     est_loue = serializers.SerializerMethodField()
     contrat_pdf_url = serializers.SerializerMethodField()  # Nouveau champ
 
     class Meta:
         model = Property
-        fields = '__all__'
+        exclude = ['cellule']
         read_only_fields = ['proprietaire']
 
+    def validate(self, attrs):
+        # PATCH d'une seule coordonnée : l'autre est celle déjà enregistrée
+        latitude = attrs.get('latitude', getattr(self.instance, 'latitude', None))
+        longitude = attrs.get('longitude', getattr(self.instance, 'longitude', None))
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError("Latitude et longitude vont ensemble.")
+        return attrs
+
     def get_est_loue(self, obj):
-        return obj.contract_set.exists()
+        # Loué aujourd'hui (annotation ``loue`` des viewsets, sinon requête indexée)
+        return est_loue(obj)
 
     def get_contrat_pdf_url(self, obj):
-        contract = obj.contract_set.first()  # Prend le premier contrat trouvé
+        contrats = obj.contract_set.all()
+        user = self.context['request'].user
+        if user.role != 'admin':
+            # Un locataire ne voit que son propre bail (les logements libres lui sont visibles en recherche)
+            contrats = contrats.filter(locataire=user)
+        contract = contrats.first()  # Prend le premier contrat trouvé
         if contract and contract.fichier_pdf:
             return self.context['request'].build_absolute_uri(contract.fichier_pdf.url)
         return None
 
 
-class ContractSerializer(serializers.ModelSerializer):
+class ContractSerializer(MesureSerializerMixin, serializers.ModelSerializer):
     locataire_display = serializers.SerializerMethodField(read_only=True)
     logement_detail = PropertySerializer(source='logement', read_only=True)  # 🔥 Nouveau champ détaillé
 
@@ -99,11 +134,23 @@ class ContractSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("La date de fin doit être postérieure à la date de début.")
         return data
 
+    def save(self, **kwargs):
+        # Le chevauchement avec un autre contrat du logement est refusé par la base
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError as exc:
+            if CONTRAINTE_CHEVAUCHEMENT not in str(exc):
+                raise
+            raise serializers.ValidationError(
+                {"date_debut": "Ce logement a déjà un contrat sur cette période."}
+            )
+
     def get_locataire_display(self, obj):
         return f"{obj.locataire.first_name} {obj.locataire.last_name}".strip() or obj.locataire.username
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(MesureSerializerMixin, serializers.ModelSerializer):
     fichier_recu_url = serializers.SerializerMethodField()
     locataire_nom = serializers.SerializerMethodField()
     proprietaire_nom = serializers.SerializerMethodField()
@@ -157,7 +204,7 @@ class PaymentSerializer(serializers.ModelSerializer):
 #         return data
 
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(MesureSerializerMixin, serializers.ModelSerializer):
     expediteur = serializers.SerializerMethodField(read_only=True)
     destinataire = serializers.SerializerMethodField(read_only=True)
 
@@ -258,7 +305,7 @@ class CreateLocataireSerializer(serializers.ModelSerializer):
         return user
 
 
-class LocataireListSerializer(serializers.ModelSerializer):
+class LocataireListSerializer(MesureSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['id', 'username', 'first_name', 'last_name', 'email']
@@ -278,3 +325,160 @@ class LocataireUpdateSerializer(serializers.ModelSerializer):
             instance.set_password(password)
             instance.save()
         return instance
+
+
+# ======================== TÉLÉVERSEMENT DIRECT =============================
+
+class DemandeUploadSerializer(serializers.Serializer):
+    cible = serializers.ChoiceField(choices=list(CIBLES))
+    nom_fichier = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=100)
+    taille = serializers.IntegerField(min_value=1)
+
+    def validate(self, data):
+        regles = CIBLES[data['cible']]
+        if data['content_type'] not in regles['types']:
+            raise serializers.ValidationError({"content_type": "Type de fichier non autorisé."})
+        if data['taille'] > regles['taille_max']:
+            raise serializers.ValidationError({"taille": f"Fichier trop volumineux (maximum {regles['taille_max']} octets)."})
+        return data
+
+
+class TeleversementDejaConfirme(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Ce téléversement a déjà été confirmé."
+    default_code = 'upload_already_confirmed'
+
+
+class ConfirmationUploadSerializer(serializers.Serializer):
+    jeton = serializers.CharField()
+    objet_id = serializers.IntegerField(required=False)        # logement ou contrat
+    destinataire_id = serializers.IntegerField(required=False)  # message
+    texte = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, data):
+        user = self.context['request'].user
+        try:
+            infos = lire_jeton(data['jeton'], settings.UPLOAD_CONFIRMATION_DELAY)
+        except signing.BadSignature:
+            raise serializers.ValidationError({"jeton": "Jeton de téléversement invalide ou expiré."})
+        if infos['user'] != user.pk:
+            raise serializers.ValidationError({"jeton": "Jeton de téléversement invalide ou expiré."})
+        if TeleversementConfirme.objects.filter(cle=infos['cle']).exists():
+            raise TeleversementDejaConfirme()
+
+        cible = infos['cible']
+        if cible == 'logement_image':
+            data['objet'] = Property.objects.filter(pk=data.get('objet_id'), proprietaire=user).first()
+        elif cible == 'contrat':
+            data['objet'] = Contract.objects.filter(pk=data.get('objet_id'), logement__proprietaire=user).first()
+        elif cible == 'message_image':
+            data['objet'] = CustomUser.objects.filter(pk=data.get('destinataire_id')).first()
+        else:
+            data['objet'] = user
+        if data['objet'] is None:
+            raise serializers.ValidationError("Objet introuvable pour ce téléversement.")
+
+        erreur = verifier_fichier(infos['cle'], cible, infos['taille_max'])
+        if erreur:
+            default_storage.delete(infos['cle'])
+            raise serializers.ValidationError({"fichier": erreur})
+
+        data['cle'] = infos['cle']
+        data['cible'] = cible
+        return data
+
+    def create(self, validated_data):
+        # La clé consommée et l'objet sont enregistrés ensemble : une confirmation concurrente
+        # du même jeton bute sur l'unicité de la clé
+        try:
+            with transaction.atomic():
+                TeleversementConfirme.objects.create(cle=validated_data['cle'],
+                                                     utilisateur=self.context['request'].user)
+                return self.rattacher(validated_data)
+        except IntegrityError:
+            raise TeleversementDejaConfirme()
+
+    def rattacher(self, validated_data):
+        cible, cle, objet = validated_data['cible'], validated_data['cle'], validated_data['objet']
+        if cible == 'photo':
+            objet.photo.name = cle
+            objet.save(update_fields=['photo', 'date_modification'])
+            return objet
+        if cible == 'logement_image':
+            return ImageLogement.objects.create(logement=objet, image=cle)
+        if cible == 'contrat':
+            objet.fichier_pdf.name = cle
+            objet.save(update_fields=['fichier_pdf', 'date_modification'])
+            return objet
+        return Message.objects.create(
+            expediteur=self.context['request'].user,
+            destinataire=objet,
+            texte=validated_data.get('texte') or None,
+            image=cle,
+        )
+
+
+# ======================== FACTURATION =============================
+
+class EcheanceSerializer(MesureSerializerMixin, serializers.ModelSerializer):
+    logement_nom = serializers.CharField(source="logement.nom", read_only=True)
+
+    class Meta:
+        model = Echeance
+        fields = [
+            'id', 'contrat', 'logement', 'logement_nom', 'locataire',
+            'type_charge', 'montant', 'periode', 'mois_concerne', 'date_limite', 'paiement'
+        ]
+
+
+class FacturationSerializer(serializers.Serializer):
+    periode = serializers.CharField(help_text="Mois à facturer, ex: 2025-06")
+    forcer = serializers.BooleanField(default=False)
+
+    def validate_periode(self, value):
+        try:
+            return periode_depuis(value)
+        except ValueError:
+            raise serializers.ValidationError("Format attendu : AAAA-MM.")
+
+
+class CycleFacturationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CycleFacturation
+        fields = ['periode', 'statut', 'nb_contrats', 'nb_echeances', 'date_debut', 'date_fin']
+
+
+# ======================== RAPPROCHEMENT DE RELEVÉS =============================
+
+class RapprochementReleveSerializer(serializers.Serializer):
+    TAILLE_MAX = 20 * 1024 * 1024
+
+    fichier = serializers.FileField(help_text="Relevé CSV : date, montant, reference[, mois]")
+    fenetre = serializers.IntegerField(min_value=0, max_value=31, default=3,
+                                       help_text="Écart toléré entre les dates (jours)")
+    mode = serializers.ChoiceField(choices=MODE_PAIEMENT, required=False)
+    valider = serializers.BooleanField(default=False, help_text="Mettre en file la validation des paiements rapprochés")
+
+    def validate_fichier(self, value):
+        if value.size > self.TAILLE_MAX:
+            raise serializers.ValidationError(f"Fichier trop volumineux (maximum {self.TAILLE_MAX} octets).")
+        return value
+
+
+# ======================== REQUÊTES GROUPÉES =============================
+
+class SousRequeteSerializer(serializers.Serializer):
+    id = serializers.CharField(max_length=100, required=False)
+    methode = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    url = serializers.CharField(max_length=2000, help_text="Ex: /api/paiements/mes_paiements/")
+    corps = serializers.JSONField(required=False)
+
+
+class RequetesGroupeesSerializer(serializers.Serializer):
+    requetes = SousRequeteSerializer(many=True, allow_empty=False)
+
+    def validate_requetes(self, value):
+        if len(value) > settings.BATCH_MAX_REQUETES:
+            raise serializers.ValidationError(f"{settings.BATCH_MAX_REQUETES} sous-requêtes au maximum.")
+        return value
@@ -0,0 +1,131 @@
+# core/storage.py
+
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import Storage, storages
+from django.db import transaction
+from django.db.models import F, FileField
+from django.utils.functional import cached_property
+
+# Cycle de vie d'un contenu cas/ : pas de compteur de références tenu à jour par les lignes.
+# Un même fichier est partagé par des lignes de plusieurs tables (Message et MessageArchive,
+# photos identiques...) et beaucoup de suppressions passent par QuerySet.delete() ou par
+# l'archivage (core.archivage), qui ne notifient pas le stockage : un compteur décrémenté
+# à ces endroits dériverait et finirait par libérer un fichier encore utilisé. La seule
+# source de vérité est donc l'ensemble des colonnes fichier en base : ``delete`` laisse le
+# contenu en place et la commande nettoyer_medias retire, après un délai de grâce, ceux
+# qu'aucune colonne ne référence plus (FichierContenu.envois lui sert à détecter un envoi
+# concurrent du même contenu pendant son passage).
+PREFIXE = 'cas/'
+TAILLE_BLOC = 1024 * 1024
+
+
+def chemin_contenu(empreinte, nom):
+    # cas/ab/cd/abcd...ef.png : répartition sur 65 536 répertoires
+    extension = os.path.splitext(nom)[1].lower()[:10]
+    return f"{PREFIXE}{empreinte[:2]}/{empreinte[2:4]}/{empreinte}{extension}"
+
+
+def champs_fichiers():
+    """(modèle, champ) de chaque FileField de core, tables chaudes et archives : tout ce qui référence un fichier."""
+    return tuple(
+        (modele, champ.name) for modele in apps.get_app_config('core').get_models()
+        for champ in modele._meta.get_fields() if isinstance(champ, FileField)
+    )
+
+
+def empreinte_flux(contenu):
+    """Calcule le SHA-256 d'un fichier en le lisant par blocs.
+
+    Renvoie (empreinte, taille, fichier relisible depuis le début) : un flux
+    non repositionnable est recopié au passage dans un fichier temporaire.
+    """
+    hachage = hashlib.sha256()
+    taille = 0
+    try:
+        contenu.seek(0)
+        copie = None
+    except (AttributeError, OSError):
+        copie = tempfile.SpooledTemporaryFile(max_size=TAILLE_BLOC * 5)
+    for bloc in contenu.chunks(TAILLE_BLOC):
+        hachage.update(bloc)
+        taille += len(bloc)
+        if copie is not None:
+            copie.write(bloc)
+    source = copie if copie is not None else contenu
+    source.seek(0)
+    return hachage.hexdigest(), taille, source
+
+
+class StockageDedup(Storage):
+    """Stocke chaque contenu distinct une seule fois, sous son empreinte SHA-256.
+
+    Délègue les octets au stockage ``default`` (disque ou S3) et inscrit chaque contenu
+    dans core.FichierContenu. Un contenu peut servir à plusieurs lignes, archives comprises :
+    ``delete`` ne le supprime jamais, la commande nettoyer_medias retire ceux qui ne sont
+    plus référencés.
+    """
+
+    @cached_property
+    def base(self):
+        return storages['default']
+
+    def get_available_name(self, name, max_length=None):
+        # Le nom réel est calculé dans _save à partir du contenu
+        return name
+
+    def _save(self, name, content):
+        from .models import FichierContenu
+
+        empreinte, taille, source = empreinte_flux(content)
+        chemin = chemin_contenu(empreinte, name)
+        with transaction.atomic():
+            fichier, _ = FichierContenu.objects.select_for_update().get_or_create(
+                chemin=chemin, defaults={'empreinte': empreinte, 'taille': taille}
+            )
+            if not self.base.exists(chemin):
+                enregistre = self.base.save(chemin, File(source, name=os.path.basename(chemin)))
+                if enregistre != chemin:
+                    # Écrit en parallèle par un autre worker : même contenu, on garde l'original
+                    self.base.delete(enregistre)
+            FichierContenu.objects.filter(pk=fichier.pk).update(envois=F('envois') + 1)
+        return chemin
+
+    def delete(self, name):
+        if not name.startswith(PREFIXE):
+            # Fichier antérieur à la déduplication : propre à sa ligne
+            return self.base.delete(name)
+        # Contenu partagé : retiré par nettoyer_medias une fois plus référencé nulle part
+
+    def _open(self, name, mode='rb'):
+        return self.base.open(name, mode)
+
+    def exists(self, name):
+        return self.base.exists(name)
+
+    def size(self, name):
+        return self.base.size(name)
+
+    def url(self, name):
+        return self.base.url(name)
+
+    def path(self, name):
+        return self.base.path(name)
+
+    def listdir(self, path):
+        return self.base.listdir(path)
+
+    def get_modified_time(self, name):
+        return self.base.get_modified_time(name)
+
+
+stockage_dedup_instance = StockageDedup()
+
+
+def stockage_dedup():
+    # Callable passé à storage= : les migrations référencent la fonction, pas l'instance
+    return stockage_dedup_instance
@@ -0,0 +1,179 @@
+# core/synchronisation.py
+
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .archivage import avec_archives, deplacement_en_cours
+from .disponibilite import avec_occupation
+from .models import CustomUser, Property, ImageLogement, Contract, Payment, Message, Suppression, \
+    PaymentArchive, MessageArchive
+from .serializers import PropertySerializer, ContractSerializer, PaymentSerializer, MessageSerializer, \
+    ProfileSerializer
+
+SEL = 'core.synchronisation'
+SECTIONS = {
+    'logement': 'logements',
+    'image': 'images',
+    'contrat': 'contrats',
+    'paiement': 'paiements',
+    'message': 'messages',
+    'utilisateur': 'utilisateurs',
+}
+
+
+# ----- Pierres tombales -----
+
+def _concernes_logement(logement_id):
+    proprietaire = Property.objects.filter(pk=logement_id).values_list('proprietaire_id', flat=True)
+    locataires = Contract.objects.filter(logement_id=logement_id).values_list('locataire_id', flat=True)
+    return set(proprietaire) | set(locataires)
+
+
+def concernes(instance):
+    """Utilisateurs qui voyaient ``instance`` : ils doivent apprendre sa suppression."""
+    if isinstance(instance, Property):
+        return 'logement', _concernes_logement(instance.pk)
+    if isinstance(instance, ImageLogement):
+        return 'image', _concernes_logement(instance.logement_id)
+    if isinstance(instance, (Contract, Payment)):
+        proprietaire = Property.objects.filter(pk=instance.logement_id).values_list('proprietaire_id', flat=True)
+        return ('contrat' if isinstance(instance, Contract) else 'paiement'), \
+            {instance.locataire_id, *proprietaire}
+    if isinstance(instance, Message):
+        return 'message', {instance.expediteur_id, instance.destinataire_id}
+    locataires = CustomUser.objects.filter(proprietaire=instance).values_list('pk', flat=True)
+    return 'utilisateur', {instance.pk, instance.proprietaire_id, *locataires}
+
+
+def enregistrer_suppression(sender, instance, **kwargs):
+    # pre_delete : les relations (contrats, propriétaire) existent encore, même en cascade
+    if deplacement_en_cours.get():
+        # Archivage : la ligne change de table mais reste lisible (?archives=1)
+        return
+    modele, utilisateurs = concernes(instance)
+    tombes = [Suppression(utilisateur_id=u, modele=modele, objet_id=instance.pk) for u in utilisateurs if u]
+    if isinstance(instance, Contract) and not Contract.objects.filter(
+            locataire_id=instance.locataire_id, logement_id=instance.logement_id).exclude(pk=instance.pk).exists():
+        # Dernier contrat du locataire sur ce logement : le logement sort de sa vue
+        tombes.append(Suppression(utilisateur_id=instance.locataire_id, modele='logement',
+                                  objet_id=instance.logement_id))
+    Suppression.objects.bulk_create(tombes)
+
+
+def toucher_logement(sender, instance, **kwargs):
+    # Images imbriquées dans PropertySerializer : le logement est renvoyé au prochain delta
+    Property.objects.filter(pk=instance.logement_id).update(date_modification=timezone.now())
+
+
+def purger_suppressions(jours=None, taille_lot=1000):
+    limite = timezone.now() - datetime.timedelta(days=jours or settings.SYNC_RETENTION_JOURS)
+    total = 0
+    while True:
+        lot = list(Suppression.objects.filter(date_suppression__lt=limite).values_list('pk', flat=True)[:taille_lot])
+        if not lot:
+            return total
+        total += Suppression.objects.filter(pk__in=lot).delete()[0]
+
+
+# ----- Jetons -----
+
+def jeton_pour(instant):
+    return signing.dumps(instant.isoformat(), salt=SEL)
+
+
+def lire_jeton(jeton):
+    """Instant encodé dans le jeton ; lève signing.BadSignature s'il a été altéré."""
+    try:
+        return datetime.datetime.fromisoformat(signing.loads(jeton, salt=SEL))
+    except (TypeError, ValueError):
+        raise signing.BadSignature("Jeton de synchronisation invalide.")
+
+
+# ----- Données visibles -----
+
+def logements_visibles(user, seuil=None):
+    if user.role == 'admin':
+        queryset = Property.objects.filter(proprietaire=user)
+        if seuil:
+            queryset = queryset.filter(date_modification__gt=seuil)
+    else:
+        # Un nouveau contrat rend visible un logement qui, lui, n'a pas changé
+        condition = Q(contract__locataire=user)
+        if seuil:
+            condition &= Q(date_modification__gt=seuil) | Q(contract__date_modification__gt=seuil)
+        queryset = Property.objects.filter(condition).distinct()
+    return avec_occupation(queryset).prefetch_related('images')
+
+
+def visibles(user, seuil=None):
+    """Querysets des objets visibles par ``user``, limités à ceux modifiés après ``seuil``."""
+    if user.role == 'admin':
+        contrats = Contract.objects.filter(logement__proprietaire=user)
+        paiements = Payment.objects.filter(logement__proprietaire=user)
+    else:
+        contrats = Contract.objects.filter(locataire=user)
+        paiements = Payment.objects.filter(locataire=user)
+    querysets = {
+        'logements': logements_visibles(user, seuil),
+        'contrats': contrats.select_related('locataire', 'logement').prefetch_related('logement__images'),
+        'paiements': paiements.select_related('locataire', 'logement__proprietaire'),
+        'messages': Message.objects.filter(Q(expediteur=user) | Q(destinataire=user))
+                    .select_related('expediteur', 'destinataire'),
+        'utilisateurs': CustomUser.objects.filter(Q(pk=user.pk) | Q(pk=user.proprietaire_id) | Q(proprietaire=user)),
+    }
+    if seuil:
+        for section in ('contrats', 'paiements', 'messages', 'utilisateurs'):
+            querysets[section] = querysets[section].filter(date_modification__gt=seuil)
+    return querysets
+
+
+def synchroniser(request, jeton=None, archives=False):
+    """Changements visibles par l'utilisateur depuis ``jeton`` (tout si absent ou trop ancien).
+
+    Le client applique ``suppressions`` puis remplace les objets reçus par identifiant, et
+    garde ``jeton`` pour le prochain appel. Le delta recouvre SYNC_MARGE secondes avant le
+    jeton : une transaction encore ouverte à l'appel précédent n'est pas perdue.
+    """
+    user = request.user
+    maintenant = timezone.now()
+    depuis = lire_jeton(jeton) if jeton else None
+    complet = depuis is None or depuis < maintenant - datetime.timedelta(days=settings.SYNC_RETENTION_JOURS)
+    seuil = None if complet else depuis - datetime.timedelta(seconds=settings.SYNC_MARGE)
+
+    querysets = visibles(user, seuil)
+    if complet and archives:
+        # Les archives ne changent plus : envoyées uniquement lors d'une synchronisation complète
+        querysets['messages'] = avec_archives(
+            querysets['messages'],
+            MessageArchive.objects.filter(Q(expediteur=user) | Q(destinataire=user))
+            .select_related('expediteur', 'destinataire'),
+            'date_envoi')
+        archives_paiements = PaymentArchive.objects.filter(
+            logement__proprietaire=user) if user.role == 'admin' else PaymentArchive.objects.filter(locataire=user)
+        querysets['paiements'] = avec_archives(
+            querysets['paiements'], archives_paiements.select_related('locataire', 'logement__proprietaire'),
+            'date_paiement')
+
+    contexte = {'request': request}
+    donnees = {
+        'jeton': jeton_pour(maintenant),
+        'complet': complet,
+        'logements': PropertySerializer(querysets['logements'], many=True, context=contexte).data,
+        'contrats': ContractSerializer(querysets['contrats'], many=True, context=contexte).data,
+        'paiements': PaymentSerializer(querysets['paiements'], many=True, context=contexte).data,
+        'messages': MessageSerializer(querysets['messages'], many=True, context=contexte).data,
+        'utilisateurs': ProfileSerializer(querysets['utilisateurs'], many=True, context=contexte).data,
+    }
+
+    suppressions = defaultdict(list)
+    if not complet:
+        for modele, objet_id in Suppression.objects.filter(utilisateur=user, date_suppression__gt=seuil) \
+                .values_list('modele', 'objet_id').distinct():
+            suppressions[SECTIONS[modele]].append(objet_id)
+    donnees['suppressions'] = {section: suppressions[section] for section in SECTIONS.values()}
+    return donnees
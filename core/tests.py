@@ -1,3 +1,1018 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from utils.metrics import MesuresRequete, activer, desactiver, mesures_courantes, registre
+from utils.throttling import lire_taux
+
+from . import db_router
+from .archivage import archiver_messages, archiver_paiements
+from .facturation import lancer_facturation
+from .idempotence import RequeteEnCours, reserver
+from .mobile_money import signer, traiter, rapprocher_lot, valider_en_attente
+from .paiements import valider_paiement
+from .proximite import filtrer_proximite
+from .recherche import strategies
+from .regroupement import executer_lot
+from .relances import a_relancer, envoyer_emails
+from .views import PaymentViewSet, MessageViewSet
+from .storage import stockage_dedup_instance as stockage
+from .synchronisation import jeton_pour
+from .models import ChargeRecurrente, CycleFacturation, FichierContenu, MessageArchive, PaymentArchive, CustomUser, Property, Contract, Echeance, Payment, Message, ImageLogement, Relance, EvenementMobileMoney, RapprochementMobileMoney, RequeteIdempotente
+
+MEDIA_TEST = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class DonneesTestCase(TestCase):
+    """Un propriétaire, un locataire et un logement ; reçus PDF écrits dans un dossier temporaire."""
+    client_class = APIClient
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TEST, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.proprietaire = CustomUser.objects.create_user('proprio', 'proprio@example.com', 'x', role='admin',
+                                                          first_name='Awa')
+        cls.locataire = CustomUser.objects.create_user('loc', 'loc@example.com', 'x', role='locataire',
+                                                       first_name='Koffi', proprietaire=cls.proprietaire)
+        cls.logement = Property.objects.create(nom='Studio', type_logement='studio', adresse='Lomé',
+                                               loyer_mensuel=Decimal('25000'), caution=Decimal('50000'),
+                                               minimum_mois=1, proprietaire=cls.proprietaire)
+
+    def paiement(self, **champs):
+        champs = {'locataire': self.locataire, 'logement': self.logement, 'montant': Decimal('25000'),
+                  'type_paiement': 'loyer', 'mois_concerne': 'Juin 2025', **champs}
+        return Payment.objects.create(**champs)
+
+
+class ReplicaTests(DonneesTestCase):
+    """Deux bases locales : le primaire de test et un réplica SQLite aux données distinctes.
+
+    Le réplica n'existe que le temps de ces tests : les autres lisent tous sur le primaire.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.databases = {'default', 'replica_1'}
+        descripteur, cls.fichier_replica = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(descripteur)
+        replica = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': cls.fichier_replica}
+        settings.DATABASES['replica_1'] = connections.configure_settings({**settings.DATABASES,
+                                                                          'replica_1': replica})['replica_1']
+        call_command('migrate', database='replica_1', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica_1'].close()
+        del connections['replica_1']
+        del settings.DATABASES['replica_1']
+        os.remove(cls.fichier_replica)
+
+    def setUp(self):
+        cache.clear()
+        db_router._sante.clear()
+        for utilisateur in (self.proprietaire, self.locataire):
+            CustomUser.objects.using('replica_1').create(pk=utilisateur.pk, username=utilisateur.username)
+        Message.objects.using('replica_1').create(expediteur=self.proprietaire, destinataire=self.locataire,
+                                                  texte='sur le réplica')
+        Message.objects.create(expediteur=self.proprietaire, destinataire=self.locataire, texte='sur le primaire')
+        self.client.force_authenticate(self.locataire)
+
+    def textes(self):
+        reponse = self.client.get('/api/messages/')
+        self.assertEqual(reponse.status_code, 200)
+        return [message['texte'] for message in json.loads(b''.join(reponse.streaming_content)
+                                                             if reponse.streaming else reponse.content)]
+
+    def test_lecture_sur_le_replica(self):
+        self.assertEqual(self.textes(), ['sur le réplica'])
+
+    def test_lecture_collante_apres_ecriture(self):
+        reponse = self.client.post('/api/messages/', {'destinataire_id': self.proprietaire.pk, 'texte': 'nouveau'})
+        self.assertEqual(reponse.status_code, 201)
+        self.assertEqual(Message.objects.using('replica_1').filter(texte='nouveau').count(), 0)
+        self.assertEqual(sorted(self.textes()), ['nouveau', 'sur le primaire'])
+        # Délai écoulé : retour au réplica
+        cache.clear()
+        self.assertEqual(self.textes(), ['sur le réplica'])
+
+    def test_replica_indisponible(self):
+        with mock.patch('core.db_router.verifier_replica', return_value=False):
+            self.assertEqual(self.textes(), ['sur le primaire'])
+
+
+# Plus petit PNG valide : sa signature binaire est contrôlée à la confirmation
+PNG = (b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f'
+       b'\x15\xc4\x89\x00\x00\x00\rIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05\x18\xd8N\x00\x00\x00\x00IEND\xaeB`\x82')
+
+
+class TeleversementTests(DonneesTestCase):
+    """Téléversement direct sur le stockage local, qui tient lieu de S3 hors production."""
+
+    def setUp(self):
+        self.client.force_authenticate(self.proprietaire)
+
+    def televerser(self, contenu=PNG, cible='logement_image'):
+        demande = self.client.post(reverse('uploads-list'), {
+            'cible': cible, 'nom_fichier': 'salon.png', 'content_type': 'image/png', 'taille': len(contenu),
+        }, format='json')
+        self.assertEqual(demande.status_code, 201)
+        demande = demande.json()
+        self.assertEqual(demande['methode'], 'PUT')
+        envoi = self.client.generic('PUT', demande['url'], contenu, content_type='image/png')
+        self.assertEqual(envoi.status_code, 201)
+        return demande
+
+    def confirmer(self, jeton):
+        return self.client.post(reverse('uploads-confirmer'), {'jeton': jeton, 'objet_id': self.logement.pk},
+                                format='json')
+
+    def test_confirmation(self):
+        demande = self.televerser()
+        reponse = self.confirmer(demande['jeton'])
+        self.assertEqual(reponse.status_code, 201)
+        image = ImageLogement.objects.get(logement=self.logement)
+        self.assertEqual(image.image.name, demande['cle'])
+
+    def test_jeton_d_un_autre_utilisateur(self):
+        demande = self.televerser()
+        self.client.force_authenticate(self.locataire)
+        self.assertEqual(self.confirmer(demande['jeton']).status_code, 400)
+        self.assertFalse(ImageLogement.objects.exists())
+
+    def test_contenu_different_du_type_annonce(self):
+        demande = self.televerser(contenu=b'%PDF-1.4 faux')
+        self.assertEqual(self.confirmer(demande['jeton']).status_code, 400)
+        self.assertFalse(ImageLogement.objects.exists())
+
+    def test_rejeu_du_jeton(self):
+        demande = self.televerser()
+        self.assertEqual(self.confirmer(demande['jeton']).status_code, 201)
+        self.assertEqual(self.confirmer(demande['jeton']).status_code, 409)
+        self.assertEqual(ImageLogement.objects.filter(logement=self.logement).count(), 1)
+
+
+class ProjectionTests(DonneesTestCase):
+    """Conformité : les projections produisent exactement le JSON des serializers."""
+
+    def setUp(self):
+        recu = self.paiement(est_valide=True, mode_paiement='Espèces', fichier_recu='recus/recu_paiement_1.pdf')
+        self.paiement(montant=Decimal('1234.50'), type_paiement='caution', mois_concerne='Juillet 2025')
+        anonyme = CustomUser.objects.create_user('anonyme', role='locataire', proprietaire=self.proprietaire)
+        self.paiement(locataire=anonyme, date_paiement=recu.date_paiement.replace(microsecond=0))
+        Message.objects.create(expediteur=self.proprietaire, destinataire=self.locataire, texte='Bonjour « Koffi »')
+        Message.objects.create(expediteur=self.locataire, destinataire=self.proprietaire, texte=None,
+                               image='messages/photo.png')
+        Message.objects.create(expediteur=anonyme, destinataire=self.proprietaire, texte='')
+
+    def comparer(self, viewset, url, user):
+        vue = viewset(request=Request(APIRequestFactory().get(url)), format_kwarg=None, action='list')
+        vue.request.user = user
+        queryset, contexte = vue.get_queryset(), vue.get_serializer_context()
+        projection = vue.projection_class(contexte)
+        renderer = JSONRenderer()
+        attendu = renderer.render(vue.get_serializer_class()(queryset, many=True, context=contexte).data)
+        self.assertEqual(renderer.render(projection.projeter(projection.lignes(queryset))), attendu)
+        self.assertGreater(len(json.loads(attendu)), 1)
+
+    def test_paiements(self):
+        self.comparer(PaymentViewSet, '/api/paiements/', self.proprietaire)
+
+    def test_messages(self):
+        for user in (self.proprietaire, self.locataire):
+            self.comparer(MessageViewSet, '/api/messages/', user)
+
+
+class StockageDedupTests(DonneesTestCase):
+    def test_contenu_partage_conserve(self):
+        premier = stockage.save('messages/a.txt', SimpleUploadedFile('a.txt', b'contenu'))
+        second = stockage.save('messages/b.txt', SimpleUploadedFile('b.txt', b'contenu'))
+        self.assertEqual(premier, second)
+        self.assertEqual(FichierContenu.objects.get(chemin=premier).envois, 2)
+        # Les archives partagent le contenu sans envoi : seul nettoyer_medias le retire
+        stockage.delete(premier)
+        stockage.delete(second)
+        self.assertTrue(stockage.exists(second))
+        self.assertTrue(FichierContenu.objects.filter(chemin=second).exists())
+
+
+class NettoyageMediasTests(DonneesTestCase):
+    def vieillir(self, *chemins):
+        ancien = (timezone.now() - datetime.timedelta(days=2)).timestamp()
+        for chemin in chemins:
+            os.utime(stockage.path(chemin), (ancien, ancien))
+
+    def test_contenu_retire_apres_sa_derniere_reference(self):
+        partage = stockage.save('messages/a.txt', SimpleUploadedFile('a.txt', b'partage'))
+        orphelin = stockage.save('messages/b.txt', SimpleUploadedFile('b.txt', b'orphelin'))
+        message = Message.objects.create(expediteur=self.proprietaire, destinataire=self.locataire, image=partage)
+        MessageArchive.objects.create(id=message.pk, expediteur=self.proprietaire, destinataire=self.locataire,
+                                      image=partage, date_envoi=message.date_envoi)
+        Message.objects.filter(pk=message.pk).delete()
+        self.vieillir(partage, orphelin)
+
+        call_command('nettoyer_medias', stdout=io.StringIO())
+        # Encore référencé par l'archive : conservé ; plus référencé nulle part : retiré
+        self.assertTrue(stockage.exists(partage))
+        self.assertFalse(stockage.exists(orphelin))
+        self.assertFalse(FichierContenu.objects.filter(chemin=orphelin).exists())
+
+        MessageArchive.objects.all().delete()
+        call_command('nettoyer_medias', stdout=io.StringIO())
+        self.assertFalse(stockage.exists(partage))
+
+    def test_contenu_recent_conserve(self):
+        orphelin = stockage.save('messages/c.txt', SimpleUploadedFile('c.txt', b'recent'))
+        call_command('nettoyer_medias', stdout=io.StringIO())
+        self.assertTrue(stockage.exists(orphelin))
+
+
+class DedupMediasTests(DonneesTestCase):
+    def test_ancien_fichier_partage_avec_une_archive(self):
+        ancien = default_storage.save('messages/ancien.txt', SimpleUploadedFile('ancien.txt', b'ancien'))
+        message = Message.objects.create(expediteur=self.proprietaire, destinataire=self.locataire)
+        Message.objects.filter(pk=message.pk).update(image=ancien)
+        archive = MessageArchive.objects.create(id=message.pk + 1, expediteur=self.proprietaire,
+                                                destinataire=self.locataire, image=ancien,
+                                                date_envoi=message.date_envoi)
+
+        call_command('dedup_medias', workers=1, stdout=io.StringIO())
+        message.refresh_from_db()
+        archive.refresh_from_db()
+        # L'archive est migrée aussi ; l'ancien fichier n'est retiré qu'après la dernière ligne
+        self.assertTrue(message.image.name.startswith('cas/'))
+        self.assertEqual(archive.image.name, message.image.name)
+        self.assertEqual(archive.image.read(), b'ancien')
+        self.assertFalse(default_storage.exists(ancien))
+
+    def test_recu_jamais_supprime(self):
+        recu = default_storage.save('messages/recu.txt', SimpleUploadedFile('recu.txt', b'recu'))
+        self.paiement(fichier_recu=recu)
+        message = Message.objects.create(expediteur=self.proprietaire, destinataire=self.locataire)
+        Message.objects.filter(pk=message.pk).update(image=recu)
+
+        call_command('dedup_medias', workers=1, stdout=io.StringIO())
+        # Encore référencé par Payment.fichier_recu (stockage par défaut, non migré)
+        self.assertTrue(default_storage.exists(recu))
+
+
+class ProximiteTests(DonneesTestCase):
+    def test_coordonnee_manquante(self):
+        with self.assertRaises(ValidationError) as erreur:
+            filtrer_proximite(Property.objects.all(), QueryDict('lon=2'))
+        self.assertEqual(erreur.exception.detail, {'lat': "Paramètre requis."})
+
+        self.client.force_authenticate(self.proprietaire)
+        reponse = self.client.get(reverse('property-list'), {'lat': '6.13'})
+        self.assertEqual(reponse.status_code, 400)
+        self.assertEqual(reponse.json(), {'lon': "Paramètre requis."})
+
+    def logement_a(self, nom, latitude, longitude, proprietaire=None):
+        return Property.objects.create(nom=nom, type_logement='studio', adresse='Lomé', loyer_mensuel=Decimal('30000'),
+                                       caution=Decimal('60000'), minimum_mois=1, latitude=latitude,
+                                       longitude=longitude, proprietaire=proprietaire or self.proprietaire)
+
+    def contrat(self, locataire, logement, debut, fin):
+        return Contract.objects.create(locataire=locataire, logement=logement, fichier_pdf='contrats/bail.pdf',
+                                       date_debut=debut, date_fin=fin)
+
+    def ids(self, reponse):
+        self.assertEqual(reponse.status_code, 200)
+        return [logement['id'] for logement in reponse.json()]
+
+    def test_recherche_proprietaire(self):
+        self.logement.latitude, self.logement.longitude = 6.1375, 1.2123
+        self.logement.save()
+        proche = self.logement_a('Proche', 6.1475, 1.2123)
+        loin = self.logement_a('Loin', 7.1375, 1.2123)
+        self.logement_a('Sans coordonnées', None, None)
+        self.client.force_authenticate(self.proprietaire)
+
+        url = reverse('property-list')
+        self.assertEqual(self.ids(self.client.get(url, {'lat': '6.1480', 'lon': '1.2123', 'rayon': '5'})),
+                         [proche.pk, self.logement.pk])
+        self.assertEqual(self.ids(self.client.get(url, {'lat': '6.1375', 'lon': '1.2123', 'rayon': '200'})),
+                         [self.logement.pk, proche.pk, loin.pk])
+        self.assertEqual(sorted(self.ids(self.client.get(url, {'bbox': '1.0,6.0,1.5,6.5'}))),
+                         sorted([self.logement.pk, proche.pk]))
+        self.assertEqual(self.client.get(url, {'bbox': '1.5,6.0,1.0,6.5'}).status_code, 400)
+
+    def test_decouverte_locataire(self):
+        autre_proprio = CustomUser.objects.create_user('proprio2', 'p2@example.com', 'x', role='admin')
+        autre_locataire = CustomUser.objects.create_user('loc2', 'loc2@example.com', 'x', role='locataire')
+        aujourd_hui = timezone.localdate()
+        un_an = datetime.timedelta(days=365)
+        self.contrat(self.locataire, self.logement, aujourd_hui - un_an, aujourd_hui + un_an)
+        libre = self.logement_a('Libre', 6.1385, 1.2123, autre_proprio)
+        # Bail terminé d'un autre locataire : le logement est libre, son bail reste privé
+        self.contrat(autre_locataire, libre, aujourd_hui - 2 * un_an, aujourd_hui - un_an)
+        occupe = self.logement_a('Occupé', 6.1380, 1.2123, autre_proprio)
+        self.contrat(autre_locataire, occupe, aujourd_hui - un_an, aujourd_hui + un_an)
+        self.client.force_authenticate(self.locataire)
+
+        url = reverse('property-list')
+        self.assertEqual(self.ids(self.client.get(url)), [self.logement.pk])
+        reponse = self.client.get(url, {'lat': '6.1385', 'lon': '1.2123', 'rayon': '5'})
+        self.assertEqual(self.ids(reponse), [libre.pk])
+        self.assertIsNone(reponse.json()[0]['contrat_pdf_url'])
+        # Visible en recherche seulement : ni détail ni modification
+        self.assertEqual(self.client.get(reverse('property-detail', args=[libre.pk])).status_code, 404)
+        self.assertEqual(self.client.patch(reverse('property-detail', args=[libre.pk]), {'nom': 'X'}).status_code, 404)
+
+
+class ArchivageTests(DonneesTestCase):
+    def test_message_de_relance_a_envoyer_conserve(self):
+        message = Message.objects.create(expediteur=self.proprietaire, destinataire=self.locataire, texte="Rappel")
+        Message.objects.filter(pk=message.pk).update(date_envoi=timezone.now() - datetime.timedelta(days=10))
+        relance = Relance.objects.create(locataire=self.locataire, periode=datetime.date(2025, 6, 1),
+                                         nature=Relance.ECHEANCE, message=message)
+
+        self.assertEqual(archiver_messages(jours=1), 0)
+        self.assertEqual(envoyer_emails(), 1)
+        self.assertEqual(mail.outbox[0].body, "Rappel")
+        self.assertEqual(archiver_messages(jours=1), 1)
+        relance.refresh_from_db()
+        self.assertIsNone(relance.message)
+        self.assertTrue(MessageArchive.objects.filter(pk=message.pk, texte="Rappel").exists())
+
+    def test_paiement_a_valider_conserve(self):
+        aujourd_hui = timezone.localdate()
+        Contract.objects.create(locataire=self.locataire, logement=self.logement, fichier_pdf='contrats/bail.pdf',
+                                date_debut=aujourd_hui - datetime.timedelta(days=400),
+                                date_fin=aujourd_hui - datetime.timedelta(days=30))
+        paiement = self.paiement(est_valide=True)
+        rapprochement = RapprochementMobileMoney.objects.create(
+            evenement=EvenementMobileMoney.objects.create(transaction_id='archive-1', corps='{}'),
+            statut=RapprochementMobileMoney.A_VALIDER, paiement=paiement)
+
+        self.assertEqual(archiver_paiements(jours=1), 0)
+        self.assertEqual(valider_en_attente(10), (0, 0))
+        rapprochement.refresh_from_db()
+        self.assertEqual(rapprochement.statut, RapprochementMobileMoney.VALIDE)
+        self.assertEqual(archiver_paiements(jours=1), 1)
+        self.assertTrue(PaymentArchive.objects.filter(pk=paiement.pk).exists())
+
+
+class RegroupementTests(DonneesTestCase):
+    def groupe(self, *requetes):
+        return self.client.post(reverse('batch'), {'requetes': [
+            {'id': str(i), 'methode': methode, 'url': url, **({'corps': corps} if corps is not None else {})}
+            for i, (methode, url, corps) in enumerate(requetes)
+        ]}, format='json')
+
+    def test_ordre_et_statuts(self):
+        self.client.force_authenticate(self.locataire)
+        # Lectures non consécutives : exécutées dans ce thread, qui voit les données du test
+        reponse = self.groupe(
+            ('GET', '/api/profil/me/', None),
+            ('POST', '/api/messages/', {'destinataire_id': self.proprietaire.pk, 'texte': 'Bonjour'}),
+            ('GET', '/api/messages/', None),
+            ('POST', '/api/batch/', {'requetes': []}),
+            ('GET', '/api/inconnue/', None),
+        )
+        self.assertEqual(reponse.status_code, 200)
+        reponses = reponse.json()['reponses']
+        self.assertEqual([r['id'] for r in reponses], ['0', '1', '2', '3', '4'])
+        self.assertEqual([r['statut'] for r in reponses], [200, 201, 200, 400, 404])
+        # Sous-requêtes authentifiées comme la requête groupée ; l'écriture précède la lecture suivante
+        self.assertEqual(reponses[0]['corps']['username'], 'loc')
+        self.assertEqual(reponses[1]['corps']['expediteur']['id'], self.locataire.pk)
+        self.assertIn('Bonjour', [message['texte'] for message in reponses[2]['corps']])
+
+    def test_authentification_requise(self):
+        reponse = self.groupe(('GET', '/api/profil/me/', None))
+        self.assertEqual(reponse.status_code, 401)
+
+    @override_settings(BATCH_MAX_REQUETES=2)
+    def test_nombre_limite(self):
+        self.client.force_authenticate(self.locataire)
+        reponse = self.groupe(*[('GET', '/api/profil/me/', None)] * 3)
+        self.assertEqual(reponse.status_code, 400)
+        self.assertIn('requetes', reponse.json())
+
+    def test_lectures_paralleles_dans_le_contexte_de_la_requete(self):
+        vus = []
+
+        def executer_observe(parent, user, element):
+            vus.append((mesures_courantes(), db_router._lecture_replica.get()))
+            mesures_courantes().enregistrer_sql(0.5, 'SELECT 1')
+            return {'id': element.get('id'), 'statut': 200, 'corps': None}
+
+        self.client.force_authenticate(self.locataire)
+        jeton = db_router.activer_lecture_replica()
+        try:
+            with mock.patch('core.regroupement.executer', executer_observe), \
+                    mock.patch('core.regroupement.connections.close_all'):
+                mesures = MesuresRequete()
+                jeton_mesures = activer(mesures)
+                try:
+                    executer_lot(None, self.locataire, [{'methode': 'GET', 'url': '/api/profil/me/'}] * 3)
+                finally:
+                    desactiver(jeton_mesures)
+        finally:
+            db_router.desactiver_lecture_replica(jeton)
+        # Mesures propres à chaque thread, réplica hérité de la requête groupée
+        self.assertEqual(len(vus), 3)
+        self.assertTrue(all(isinstance(m, MesuresRequete) and m is not mesures for m, _ in vus))
+        self.assertTrue(all(replica for _, replica in vus))
+        # ... cumulées dans celles de la requête groupée (Server-Timing, métriques)
+        self.assertEqual((mesures.nb_sql, mesures.durees['sql']), (3, 1.5))
+
+
+class RapprochementReleveTests(DonneesTestCase):
+    def setUp(self):
+        self.client.force_authenticate(self.proprietaire)
+
+    def rapprocher(self, lignes, **options):
+        releve = 'date;montant;reference\n' + ''.join(f'{ligne}\n' for ligne in lignes)
+        reponse = self.client.post(reverse('payment-rapprochement'), {
+            'fichier': SimpleUploadedFile('releve.csv', releve.encode()), **options,
+        }, format='multipart')
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.json()
+
+    def test_validation_mise_en_file(self):
+        paiement = self.paiement()
+        rapport = self.rapprocher([f'{paiement.date_paiement:%d/%m/%Y};25000;loc'], valider=True)
+        self.assertEqual([rapproche['paiement'] for rapproche in rapport['rapproches']], [paiement.pk])
+        self.assertEqual(rapport['validations_en_file'], 1)
+        # Aucun reçu ni e-mail pendant la requête
+        paiement.refresh_from_db()
+        self.assertFalse(paiement.est_valide)
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('valider_paiements', stdout=io.StringIO())
+        paiement.refresh_from_db()
+        self.assertTrue(paiement.est_valide)
+        self.assertIsNone(paiement.validation_demandee)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_locataire_rattache_a_un_autre_compte(self):
+        autre = CustomUser.objects.create_user('autre', role='admin')
+        locataire = CustomUser.objects.create_user('sans-proprio', 'sp@example.com', role='locataire',
+                                                   proprietaire=autre)
+        paiement = self.paiement(locataire=locataire)
+        rapport = self.rapprocher([f'{paiement.date_paiement:%d/%m/%Y};25000;SP@example.com'])
+        self.assertEqual([rapproche['paiement'] for rapproche in rapport['rapproches']], [paiement.pk])
+        self.assertEqual(rapport['manquants'], [])
+
+
+class RelanceTests(DonneesTestCase):
+    def setUp(self):
+        self.contrat = Contract.objects.create(locataire=self.locataire, logement=self.logement,
+                                               fichier_pdf='contrats/bail.pdf', date_debut=datetime.date(2025, 1, 1),
+                                               date_fin=datetime.date(2025, 12, 31))
+
+    def relances(self, periode):
+        return list(a_relancer(periode, Relance.ECHEANCE).values_list('pk', flat=True))
+
+    def test_sans_paiement(self):
+        self.assertEqual(self.relances(datetime.date(2025, 6, 1)), [self.contrat.pk])
+
+    def test_mois_saisi_librement(self):
+        for mois, periode in (('juin 2025', datetime.date(2025, 6, 1)), (' Juin  2025 ', datetime.date(2025, 6, 1)),
+                              ('FEVRIER 2025', datetime.date(2025, 2, 1)), ('aout 2025', datetime.date(2025, 8, 1))):
+            with self.subTest(mois=mois):
+                paiement = self.paiement(mois_concerne=mois)
+                self.assertEqual(self.relances(periode), [])
+                paiement.delete()
+        self.paiement(mois_concerne='Juin 2024')
+        self.assertEqual(self.relances(datetime.date(2025, 6, 1)), [self.contrat.pk])
+
+    def test_echeance_reglee(self):
+        periode = datetime.date(2025, 6, 1)
+        paiement = self.paiement(mois_concerne='06/2025')
+        Echeance.objects.create(contrat=self.contrat, locataire=self.locataire, logement=self.logement,
+                                type_charge='loyer', montant=Decimal('25000'), periode=periode,
+                                mois_concerne='Juin 2025', date_limite=datetime.date(2025, 6, 5), paiement=paiement)
+        self.assertEqual(self.relances(periode), [])
+
+    def test_erreur_smtp_sans_doublon(self):
+        periode = datetime.date(2025, 6, 1)
+        for numero in range(3):
+            locataire = CustomUser.objects.create_user(f'loc{numero}', f'loc{numero}@example.com', role='locataire')
+            message = Message.objects.create(expediteur=self.proprietaire, destinataire=locataire, texte='Rappel')
+            Relance.objects.create(locataire=locataire, periode=periode, nature=Relance.ECHEANCE, message=message)
+
+        envoyer = mail.get_connection().__class__.send_messages
+        appels = []
+
+        def envoyer_puis_echouer(connexion, messages):
+            appels.append(messages)
+            if len(appels) == 2:
+                raise ConnectionResetError("SMTP coupé")
+            return envoyer(connexion, messages)
+
+        with mock.patch.object(mail.get_connection().__class__, 'send_messages', envoyer_puis_echouer):
+            with self.assertRaises(ConnectionResetError):
+                envoyer_emails(taille_lot=10)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(Relance.objects.filter(date_email__isnull=False).count(), 1)
+
+        self.assertEqual(envoyer_emails(taille_lot=10), 2)
+        self.assertEqual(sorted(courriel.to[0] for courriel in mail.outbox),
+                         ['loc0@example.com', 'loc1@example.com', 'loc2@example.com'])
+
+
+class AdminPaiementTests(DonneesTestCase):
+    def test_action_valider_paiements(self):
+        superuser = CustomUser.objects.create_superuser('root', 'root@example.com', 'x', role='admin')
+        self.client.force_login(superuser)
+        paiement = self.paiement()
+        reponse = self.client.post(reverse('admin:core_payment_changelist'), {
+            'action': 'action_valider_paiements', '_selected_action': [paiement.pk],
+        }, follow=True)
+        self.assertContains(reponse, "1 paiement(s) mis en file de validation.")
+        paiement.refresh_from_db()
+        self.assertFalse(paiement.est_valide)
+        self.assertIsNotNone(paiement.validation_demandee)
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('valider_paiements', stdout=io.StringIO())
+        paiement.refresh_from_db()
+        self.assertTrue(paiement.est_valide)
+        self.assertEqual(paiement.fichier_recu.name, f'recus/recu_paiement_{paiement.pk}.pdf')
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class MesuresFluxTests(DonneesTestCase):
+    def test_lecture_du_flux_mesuree(self):
+        for mois in ('Avril 2025', 'Mai 2025', 'Juin 2025'):
+            self.paiement(mois_concerne=mois)
+        self.client.force_authenticate(self.proprietaire)
+        registre.reinitialiser()
+        reponse = self.client.get(reverse('payment-list'))
+        self.assertTrue(reponse.streaming)
+        self.assertIn('sql;dur=', reponse['Server-Timing'])
+        with self.assertLogs('core.performance', 'INFO') as journaux:
+            corps = b''.join(reponse.streaming_content)  # le client de test ferme la réponse en fin de lecture
+        self.assertEqual(len(json.loads(corps)), 3)
+        # SQL du parcours par curseur et sérialisation, faits pendant la lecture, comptés à la fermeture
+        avant = int(re.search(r'desc="(\d+) requetes"', reponse['Server-Timing'])[1])
+        apres = int(re.search(r"Flux GET /api/paiements/ \(payment-list\) : .* (\d+) requêtes SQL", journaux.output[0])[1])
+        self.assertGreater(apres, avant)
+        self.assertIn('http_request_sql_queries_count{vue="payment-list"} 1', registre.exporter())
+
+
+class IndexRechercheAdminTests(TestCase):
+    def test_recherche_par_prefixe_indexee(self):
+        for modele, champ in ((Property, 'nom'), (Payment, 'mois_concerne')):
+            with connection.cursor() as curseur:
+                contraintes = connection.introspection.get_constraints(curseur, modele._meta.db_table)
+            self.assertTrue(any(c['index'] and c['columns'] == [champ] for c in contraintes.values()))
+            if connection.vendor == 'postgresql':
+                # Même recherche que l'admin (^champ = istartswith) ; table de test presque vide
+                with connection.cursor() as curseur:
+                    curseur.execute("SET LOCAL enable_seqscan = off")
+                plan = modele.objects.filter(**{f'{champ}__istartswith': 'ju'}).explain()
+                self.assertIn('majuscules', plan)
+
+
+class RechercheMessagesTests(DonneesTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.voisin = CustomUser.objects.create_user('voisin', 'voisin@example.com', 'x', role='locataire')
+        cls.autre = CustomUser.objects.create_user('autre', 'autre@example.com', 'x', role='admin')
+        envoyer = lambda expediteur, destinataire, texte: Message.objects.create(
+            expediteur=expediteur, destinataire=destinataire, texte=texte)
+        cls.fuite = envoyer(cls.locataire, cls.proprietaire, "Le tuyau cassé de la cuisine")
+        cls.relance = envoyer(cls.proprietaire, cls.locataire, "Le plombier passe pour le tuyau demain")
+        cls.voisinage = envoyer(cls.voisin, cls.locataire, "Ton tuyau fuit encore chez moi")
+        # Conversation dont le locataire ne fait pas partie
+        cls.etranger = envoyer(cls.autre, cls.voisin, "Un tuyau cassé dans l'immeuble")
+
+    def chercher(self, **params):
+        return self.client.get(reverse('messages-recherche'), params)
+
+    def ids(self, reponse):
+        self.assertEqual(reponse.status_code, 200)
+        return {message['id'] for message in reponse.json()['resultats']}
+
+    def test_limitee_aux_conversations_de_l_utilisateur(self):
+        self.client.force_authenticate(self.locataire)
+        self.assertEqual(self.ids(self.chercher(q='tuyau')), {self.fuite.pk, self.relance.pk, self.voisinage.pk})
+        self.assertEqual(self.ids(self.chercher(q='tuyau', avec=self.proprietaire.pk)),
+                         {self.fuite.pk, self.relance.pk})
+        self.assertEqual(self.ids(self.chercher(q='tuyau cass')), {self.fuite.pk})
+        self.assertEqual(self.ids(self.chercher(q='immeuble')), set())
+
+    def test_pagination_par_curseur(self):
+        self.client.force_authenticate(self.locataire)
+        vus = set()
+        reponse = self.chercher(q='tuyau', limite=2)
+        while True:
+            vus |= self.ids(reponse)
+            suivant = reponse.json()['suivant']
+            if not suivant:
+                break
+            reponse = self.chercher(q='tuyau', limite=2, curseur=suivant)
+        self.assertEqual(vus, {self.fuite.pk, self.relance.pk, self.voisinage.pk})
+        self.assertEqual(self.chercher(q='tuyau', curseur='abc').status_code, 400)
+        self.assertEqual(self.chercher(q=' ! ').status_code, 400)
+        self.assertEqual(self.chercher(q='tuyau', avec='moi').status_code, 400)
+
+    def test_repli_sans_postgres(self):
+        with mock.patch.object(connection, 'vendor', 'sqlite'):
+            candidates = strategies(Message.objects.filter(destinataire=self.locataire), 'uyau fui', [])
+        self.assertEqual(list(candidates), ['like'])
+        self.assertEqual(set(candidates['like'].values_list('pk', flat=True)), {self.voisinage.pk})
+
+    @skipUnless(connection.vendor == 'postgresql', "Colonne texte_recherche propre à Postgres")
+    def test_participants_filtres_par_l_index(self):
+        # Sans restriction préalable du queryset : seul le lexème u<id> écarte les autres conversations
+        candidates = strategies(Message.objects.all(), 'tuyau', [self.voisin.pk])
+        self.assertEqual(set(candidates['mots'].values_list('pk', flat=True)), {self.voisinage.pk, self.etranger.pk})
+        candidates = strategies(Message.objects.all(), 'tuyau', [self.voisin.pk, self.autre.pk])
+        self.assertEqual(set(candidates['mots'].values_list('pk', flat=True)), {self.etranger.pk})
+
+
+def taux_limites(**taux):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': taux})
+
+
+class ThrottlingTests(DonneesTestCase):
+    # Seaux dans le cache mémoire partagé par les tests : vidés avant et après
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_lire_taux(self):
+        self.assertEqual(lire_taux('20/min'), (20, 60))
+        self.assertEqual(lire_taux('5/hour'), (5, 3600))
+
+    @taux_limites(connexion_ip='2/min')
+    def test_connexion_limitee_par_ip(self):
+        url = reverse('token_obtain_pair')
+        reponses = [self.client.post(url, {'username': 'loc', 'password': 'faux'}) for _ in range(3)]
+        self.assertEqual([r.status_code for r in reponses], [401, 401, 429])
+        self.assertEqual((reponses[0]['X-RateLimit-Limit'], reponses[0]['X-RateLimit-Remaining']), ('2', '1'))
+        self.assertGreater(int(reponses[2]['Retry-After']), 0)
+        # Autre adresse : autre seau
+        self.assertEqual(self.client.post(url, {'username': 'loc', 'password': 'faux'},
+                                          REMOTE_ADDR='10.0.0.2').status_code, 401)
+
+    @taux_limites(validation_user='1/min')
+    def test_portee_choisie_par_action(self):
+        autre = CustomUser.objects.create_user('proprio2', 'p2@example.com', 'x', role='admin')
+        logement = Property.objects.create(nom='Villa', type_logement='villa', adresse='Lomé',
+                                           loyer_mensuel=Decimal('90000'), caution=Decimal('90000'),
+                                           minimum_mois=1, proprietaire=autre)
+        premier, second = self.paiement(), self.paiement(mois_concerne='Juillet 2025')
+        troisieme = self.paiement(logement=logement)
+        with mock.patch('core.views.valider_paiement', return_value='recus/recu.pdf'):
+            self.client.force_authenticate(self.proprietaire)
+            self.assertEqual(self.client.post(reverse('payment-valider', args=[premier.pk])).status_code, 200)
+            self.assertEqual(self.client.post(reverse('payment-valider', args=[second.pk])).status_code, 429)
+            # Seau 'validation' seulement : les lectures ne sont pas limitées
+            for _ in range(3):
+                liste = self.client.get(reverse('payment-list'))
+                self.assertEqual(liste.status_code, 200)
+            self.assertNotIn('X-RateLimit-Limit', liste)
+            # Seau par utilisateur
+            self.client.force_authenticate(autre)
+            self.assertEqual(self.client.post(reverse('payment-valider', args=[troisieme.pk])).status_code, 200)
+
+
+class FacturationTests(DonneesTestCase):
+    periode = datetime.date(2025, 6, 1)
+
+    def contrat(self, nom, debut=datetime.date(2025, 1, 1), fin=datetime.date(2025, 12, 31)):
+        # Un logement par contrat : les baux d'un même logement ne se chevauchent pas
+        logement = Property.objects.create(nom=nom, type_logement='studio', adresse='Lomé',
+                                           loyer_mensuel=Decimal('25000'), caution=Decimal('50000'),
+                                           minimum_mois=1, proprietaire=self.proprietaire)
+        return Contract.objects.create(locataire=self.locataire, logement=logement, fichier_pdf='contrats/bail.pdf',
+                                       date_debut=debut, date_fin=fin)
+
+    def setUp(self):
+        self.contrats = [self.contrat(nom) for nom in ('Studio A', 'Studio B', 'Studio C')]
+        # Eau facturée avec le loyer sur chaque logement
+        ChargeRecurrente.objects.bulk_create(
+            ChargeRecurrente(logement_id=contrat.logement_id, type_charge='eau', montant=Decimal('3000'))
+            for contrat in self.contrats
+        )
+
+    def test_reprise_apres_interruption(self):
+        def interrompre(cycle):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            lancer_facturation(self.periode, taille_lot=1, progression=interrompre)
+        cycle = CycleFacturation.objects.get()
+        self.assertEqual((cycle.statut, cycle.dernier_contrat, cycle.nb_contrats),
+                         (CycleFacturation.EN_COURS, self.contrats[0].pk, 1))
+        self.assertEqual(Echeance.objects.count(), 2)  # loyer + eau du premier contrat
+
+        # La reprise part du curseur : le premier contrat n'est pas refacturé
+        with mock.patch.object(Echeance.objects, 'bulk_create', wraps=Echeance.objects.bulk_create) as insertion:
+            cycle = lancer_facturation(self.periode, taille_lot=1)
+        factures = {echeance.contrat_id for appel in insertion.call_args_list for echeance in appel.args[0]}
+        self.assertEqual(factures, {self.contrats[1].pk, self.contrats[2].pk})
+        self.assertEqual((cycle.statut, cycle.nb_contrats, cycle.nb_echeances), (CycleFacturation.TERMINE, 3, 6))
+        self.assertEqual(Echeance.objects.filter(type_charge='loyer', montant=Decimal('25000')).count(), 3)
+        self.assertEqual(set(Echeance.objects.values_list('mois_concerne', 'date_limite')),
+                         {('Juin 2025', datetime.date(2025, 6, settings.FACTURATION_JOUR_LIMITE))})
+
+    def test_relance_sans_doublon(self):
+        call_command('facturer_mois', periode='2025-06', lot=2, stdout=io.StringIO())
+        self.assertEqual(Echeance.objects.count(), 6)
+        # Cycle terminé : rien à faire ; --forcer repasse sur tous les contrats sans doublon
+        with mock.patch.object(Echeance.objects, 'bulk_create') as insertion:
+            lancer_facturation(self.periode)
+        insertion.assert_not_called()
+        self.contrat('Studio D', datetime.date(2025, 6, 15), datetime.date(2025, 7, 31))
+        cycle = lancer_facturation(self.periode, forcer=True)
+        self.assertEqual((cycle.statut, cycle.nb_contrats, cycle.nb_echeances), (CycleFacturation.TERMINE, 4, 7))
+        self.assertEqual(Echeance.objects.count(), 7)
+        self.assertEqual(CycleFacturation.objects.count(), 1)
+
+
+@override_settings(STREAMING_TAILLE_LOT=2)
+class StreamingListesTests(DonneesTestCase):
+    def lister(self, url, streaming=True, **extra):
+        with override_settings(STREAMING_LISTES=streaming):
+            reponse = self.client.get(url, **extra)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.streaming, streaming)
+        return b''.join(reponse.streaming_content) if streaming else reponse.content
+
+    def test_flux_identique_au_rendu_habituel(self):
+        for mois in ('Janvier', 'Février', 'Mars', 'Avril', 'Mai'):
+            self.paiement(mois_concerne=f'{mois} 2025')
+        Message.objects.create(expediteur=self.locataire, destinataire=self.proprietaire, texte="Bonjour « Awa »")
+        Message.objects.create(expediteur=self.proprietaire, destinataire=self.locataire, texte="Reçu ✓")
+        for user in (self.locataire, self.proprietaire):
+            self.client.force_authenticate(user)
+            for url in (reverse('payment-list'), reverse('messages-list')):
+                with self.subTest(user=user.username, url=url):
+                    flux = self.lister(url)
+                    self.assertEqual(flux, self.lister(url, streaming=False))
+        self.assertEqual(len(json.loads(flux)), 2)
+
+    def test_liste_vide(self):
+        self.client.force_authenticate(self.locataire)
+        self.assertEqual(self.lister(reverse('payment-list')), b'[]')
+        self.assertEqual(self.lister(reverse('payment-list'), streaming=False), b'[]')
+
+    def test_indentation_demandee_sans_flux(self):
+        self.paiement()
+        self.client.force_authenticate(self.locataire)
+        corps = self.lister(reverse('payment-list'), streaming=False, HTTP_ACCEPT='application/json; indent=2')
+        with override_settings(STREAMING_LISTES=True):
+            reponse = self.client.get(reverse('payment-list'), HTTP_ACCEPT='application/json; indent=2')
+        self.assertFalse(reponse.streaming)
+        self.assertEqual(reponse.content, corps)
+
+
+class SynchronisationTests(DonneesTestCase):
+    def setUp(self):
+        self.contrat = Contract.objects.create(locataire=self.locataire, logement=self.logement,
+                                               fichier_pdf='contrats/bail.pdf', date_debut=datetime.date(2025, 1, 1),
+                                               date_fin=datetime.date(2025, 12, 31))
+        self.ancien = self.paiement()
+        # Tout ce qui précède date d'avant-hier ; le jeton, d'hier
+        avant_hier = timezone.now() - datetime.timedelta(days=2)
+        for modele in (CustomUser, Property, Contract, Payment):
+            modele.objects.update(date_modification=avant_hier)
+        self.jeton = jeton_pour(timezone.now() - datetime.timedelta(days=1))
+
+    def synchroniser(self, user, **params):
+        self.client.force_authenticate(user)
+        reponse = self.client.get(reverse('sync'), params)
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.data
+
+    def ids(self, donnees, section):
+        return [objet['id'] for objet in donnees[section]]
+
+    def test_synchronisation_complete(self):
+        donnees = self.synchroniser(self.locataire)
+        self.assertTrue(donnees['complet'])
+        self.assertEqual(self.ids(donnees, 'logements'), [self.logement.pk])
+        self.assertEqual(self.ids(donnees, 'paiements'), [self.ancien.pk])
+        self.assertEqual(donnees['suppressions']['paiements'], [])
+
+        # Jeton plus ancien que la rétention des pierres tombales : retour au complet
+        perime = jeton_pour(timezone.now() - datetime.timedelta(days=settings.SYNC_RETENTION_JOURS + 1))
+        self.assertTrue(self.synchroniser(self.locataire, depuis=perime)['complet'])
+
+    def test_delta_depuis_le_jeton(self):
+        nouveau = self.paiement(mois_concerne='Juillet 2025')
+        donnees = self.synchroniser(self.locataire, depuis=self.jeton)
+        self.assertFalse(donnees['complet'])
+        self.assertEqual(self.ids(donnees, 'paiements'), [nouveau.pk])
+        self.assertEqual(self.ids(donnees, 'logements'), [])
+        self.assertEqual(self.ids(donnees, 'contrats'), [])
+
+        # Le jeton renvoyé sert d'origine au delta suivant
+        self.assertEqual(self.ids(self.synchroniser(self.locataire, depuis=donnees['jeton']), 'paiements'),
+                         [nouveau.pk])  # encore dans la marge SYNC_MARGE
+        with override_settings(SYNC_MARGE=0):
+            Payment.objects.filter(pk=nouveau.pk).update(
+                date_modification=timezone.now() - datetime.timedelta(seconds=1))
+            self.assertEqual(self.ids(self.synchroniser(self.locataire, depuis=donnees['jeton']), 'paiements'), [])
+
+    def test_pierres_tombales(self):
+        paiement_id, contrat_id = self.ancien.pk, self.contrat.pk
+        self.ancien.delete()
+        self.contrat.delete()
+        for user in (self.locataire, self.proprietaire):
+            suppressions = self.synchroniser(user, depuis=self.jeton)['suppressions']
+            self.assertEqual(suppressions['paiements'], [paiement_id])
+            self.assertEqual(suppressions['contrats'], [contrat_id])
+        # Dernier contrat supprimé : le logement sort de la vue du locataire seulement
+        self.assertEqual(self.synchroniser(self.locataire, depuis=self.jeton)['suppressions']['logements'],
+                         [self.logement.pk])
+        self.assertEqual(self.synchroniser(self.proprietaire, depuis=self.jeton)['suppressions']['logements'], [])
+        # Une synchronisation complète n'a pas besoin des pierres tombales
+        self.assertEqual(self.synchroniser(self.locataire)['suppressions']['paiements'], [])
+
+    def test_jeton_altere(self):
+        self.client.force_authenticate(self.locataire)
+        reponse = self.client.get(reverse('sync'), {'depuis': self.jeton[:-2] + 'xx'})
+        self.assertEqual(reponse.status_code, 400)
+        self.assertIn('depuis', reponse.data)
+
+
+class IdempotenceTests(DonneesTestCase):
+    def envoyer(self, texte, cle='cle-1', **extra):
+        return self.client.post(reverse('messages-list'), {'destinataire_id': self.proprietaire.pk, 'texte': texte},
+                                format='json', HTTP_IDEMPOTENCY_KEY=cle, **extra)
+
+    def test_reponse_rejouee(self):
+        self.client.force_authenticate(self.locataire)
+        premiere, seconde = self.envoyer("Bonjour"), self.envoyer("Bonjour")
+        self.assertEqual((premiere.status_code, seconde.status_code), (201, 201))
+        self.assertEqual(seconde.content, premiere.content)
+        self.assertEqual(seconde['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', premiere)
+        self.assertEqual(Message.objects.count(), 1)
+
+        # Clé propre à l'utilisateur ; sans clé, chaque POST est exécuté
+        self.client.force_authenticate(self.proprietaire)
+        self.assertNotIn('Idempotent-Replayed', self.client.post(
+            reverse('messages-list'), {'destinataire_id': self.locataire.pk, 'texte': "Bonjour"}, format='json',
+            HTTP_IDEMPOTENCY_KEY='cle-1'))
+        self.client.post(reverse('messages-list'), {'destinataire_id': self.locataire.pk, 'texte': "Re"}, format='json')
+        self.assertEqual(Message.objects.count(), 3)
+
+    def test_cle_reutilisee_pour_une_autre_requete(self):
+        self.client.force_authenticate(self.locataire)
+        self.envoyer("Bonjour")
+        reponse = self.envoyer("Autre chose")
+        self.assertEqual(reponse.status_code, 422)
+        self.assertEqual(Message.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCE_ATTENTE=0)
+    def test_requete_en_cours(self):
+        requete, reservee = reserver(self.locataire, 'cle-2', 'empreinte')
+        self.assertTrue(reservee)
+        with self.assertRaises(RequeteEnCours):
+            reserver(self.locataire, 'cle-2', 'empreinte')
+        # Worker tué pendant l'exécution : le verrou expire et la clé redevient libre
+        RequeteIdempotente.objects.filter(pk=requete.pk).update(
+            date_creation=timezone.now() - datetime.timedelta(seconds=settings.IDEMPOTENCE_VERROU + 1))
+        self.assertTrue(reserver(self.locataire, 'cle-2', 'empreinte')[1])
+
+    def test_erreur_serveur_libere_la_cle(self):
+        self.client.force_authenticate(self.locataire)
+        self.client.raise_request_exception = False
+        with mock.patch.object(MessageViewSet, 'perform_create', side_effect=RuntimeError("panne")):
+            self.assertEqual(self.envoyer("Bonjour").status_code, 500)
+        self.assertFalse(RequeteIdempotente.objects.exists())
+        reponse = self.envoyer("Bonjour")
+        self.assertEqual(reponse.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', reponse)
+        self.assertEqual(Message.objects.count(), 1)
+
+
+class ValidationPaiementTests(DonneesTestCase):
+    def test_erreur_journalisee(self):
+        paiement = self.paiement()
+        self.client.force_authenticate(self.proprietaire)
+        with mock.patch('core.views.valider_paiement', side_effect=ConnectionRefusedError("SMTP indisponible")), \
+                self.assertLogs('core.views', 'ERROR') as journaux:
+            reponse = self.client.post(reverse('payment-valider', args=[paiement.pk]))
+        self.assertEqual(reponse.status_code, 500)
+        self.assertIn(f"Validation du paiement {paiement.pk} impossible", journaux.output[0])
+        self.assertIn("ConnectionRefusedError", journaux.output[0])
+
+
+class AdminContratTests(DonneesTestCase):
+    def test_chevauchement_refuse_par_le_formulaire(self):
+        superuser = CustomUser.objects.create_superuser('root', 'root@example.com', 'x', role='admin')
+        self.client.force_login(superuser)
+        Contract.objects.create(locataire=self.locataire, logement=self.logement, fichier_pdf='contrats/bail.pdf',
+                                date_debut=datetime.date(2025, 1, 1), date_fin=datetime.date(2025, 12, 31))
+        reponse = self.client.post(reverse('admin:core_contract_add'), {
+            'locataire': self.locataire.pk, 'logement': self.logement.pk,
+            'fichier_pdf': SimpleUploadedFile('bail.pdf', b'%PDF-1.4', content_type='application/pdf'),
+            'date_debut': '2025-06-01', 'date_fin': '2026-05-31',
+        })
+        self.assertEqual(reponse.status_code, 200)
+        self.assertContains(reponse, "Ce logement a déjà un contrat sur cette période.")
+        self.assertEqual(Contract.objects.count(), 1)
+
+
+@override_settings(MOBILE_MONEY_SECRET='secret-test')
+class MobileMoneyTests(DonneesTestCase):
+    def notifier(self, signature=None, **donnees):
+        corps = json.dumps({'transaction_id': 'T1', 'statut': 'SUCCES', 'montant': '25000.00', **donnees}).encode()
+        return self.client.post(reverse('mobile-money-notification'), corps, content_type='application/json',
+                                HTTP_X_SIGNATURE=signer(corps) if signature is None else signature)
+
+    def rapprochement(self, transaction_id):
+        return RapprochementMobileMoney.objects.get(evenement__transaction_id=transaction_id)
+
+    def test_signature_invalide_rejetee(self):
+        reponse = self.notifier(signature='0' * 64, reference='P1')
+        self.assertEqual(reponse.status_code, 401)
+        self.assertFalse(EvenementMobileMoney.objects.exists())
+
+    def test_transaction_en_double_ignoree(self):
+        self.assertEqual(self.notifier(reference='P1').status_code, 200)
+        self.assertEqual(self.notifier(reference='P1', montant='1').status_code, 200)
+        self.assertEqual(EvenementMobileMoney.objects.count(), 1)
+
+    def test_rapprochement(self):
+        paiement, autre = self.paiement(), self.paiement(mois_concerne='Juillet 2025')
+        self.notifier(transaction_id='ok', reference=f'P{paiement.pk}')
+        self.notifier(transaction_id='double', reference=f'P{paiement.pk}')
+        self.notifier(transaction_id='montant', reference=f'P{autre.pk}', montant='20000')
+        self.notifier(transaction_id='echec', reference=f'P{paiement.pk}', statut='ECHEC')
+        self.notifier(transaction_id='inconnu', reference='P999999')
+
+        totaux = traiter(taille_lot=10)
+
+        self.assertEqual(totaux['valides'], 1)
+        self.assertEqual(self.rapprochement('ok').statut, RapprochementMobileMoney.VALIDE)
+        paiement.refresh_from_db()
+        self.assertTrue(paiement.est_valide)
+        for transaction_id, motif in (('double', "Déjà réglé"), ('montant', "Montant reçu"),
+                                      ('echec', "Échec"), ('inconnu', "Référence inconnue")):
+            rapprochement = self.rapprochement(transaction_id)
+            self.assertEqual(rapprochement.statut, RapprochementMobileMoney.REJETE)
+            self.assertTrue(rapprochement.motif.startswith(motif), rapprochement.motif)
+
+    def test_notification_malformee_ne_bloque_pas_la_file(self):
+        paiement = self.paiement()
+        self.notifier(transaction_id='debordement', reference='P99999999999999999999999')
+        self.notifier(transaction_id='exposant', reference='P²')
+        self.notifier(transaction_id='snan', reference=f'P{paiement.pk}', montant='sNaN')
+        self.notifier(transaction_id='valide', reference=f'P{paiement.pk}')
+
+        traiter(taille_lot=10)
+
+        for transaction_id in ('debordement', 'exposant', 'snan'):
+            self.assertEqual(self.rapprochement(transaction_id).statut, RapprochementMobileMoney.REJETE)
+        self.assertEqual(self.rapprochement('valide').statut, RapprochementMobileMoney.VALIDE)
+
+    def test_validation_en_echec_ne_bloque_pas_la_file(self):
+        bloque, suivant = self.paiement(), self.paiement(mois_concerne='Juillet 2025')
+        self.notifier(transaction_id='bloque', reference=f'P{bloque.pk}')
+        self.notifier(transaction_id='suivant', reference=f'P{suivant.pk}')
+
+        def valider(paiement, admin_nom):
+            if paiement.pk == bloque.pk:
+                raise ConnectionRefusedError("SMTP indisponible")
+            return valider_paiement(paiement, admin_nom)
+
+        rapprocher_lot(10)
+        with mock.patch('core.mobile_money.valider_paiement', valider):
+            # Lots d'un seul rapprochement : le paiement bloqué, tenté en premier, passe ensuite derrière
+            self.assertEqual(valider_en_attente(1), (0, 1))
+            self.assertEqual(valider_en_attente(1), (1, 0))
+
+        self.assertEqual(self.rapprochement('suivant').statut, RapprochementMobileMoney.VALIDE)
+        rapprochement = self.rapprochement('bloque')
+        self.assertEqual(rapprochement.statut, RapprochementMobileMoney.A_VALIDER)
+        self.assertEqual(rapprochement.tentatives, 1)
@@ -1,13 +1,12 @@
 # core/urls.py
 
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import PropertyViewSet, ContractViewSet, PaymentViewSet, MessageViewSet, RegisterAdminView, \
-    CreateLocataireView, LocataireViewSet, MeViewSet
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+    CreateLocataireView, LocataireViewSet, MeViewSet, MetriquesView, UploadViewSet, televersement_local, \
+    EcheanceViewSet, ConnexionView, RequetesGroupeesView, SynchronisationView, notification_mobile_money
+from rest_framework_simplejwt.views import TokenRefreshView
 
 router = DefaultRouter()
 router.register(r'profil', MeViewSet, basename='profil')
@@ -16,17 +15,43 @@ router.register(r'contrats', ContractViewSet)
 router.register(r'paiements', PaymentViewSet)
 router.register(r'messages', MessageViewSet, basename='messages')  # ✅
 router.register('locataires', LocataireViewSet, basename='locataires')
+router.register('uploads', UploadViewSet, basename='uploads')
+router.register('echeances', EcheanceViewSet, basename='echeances')
 
 
 urlpatterns = [
+    path('uploads/local/<str:jeton>/', televersement_local, name='uploads-local'),
+    path('mobile-money/notifications/', notification_mobile_money, name='mobile-money-notification'),
     path('', include(router.urls)),
 
     # Authentification JWT
-    path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('auth/login/', ConnexionView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('register-admin/', RegisterAdminView.as_view(), name='register-admin'),
     path('create-locataire/', CreateLocataireView.as_view(), name='create-locataire'),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),  # login
+    path('api/token/', ConnexionView.as_view(), name='token_obtain_pair'),  # login
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('me/', MeViewSet.as_view({'get': 'me'}), name='me'),
+    path('metrics/', MetriquesView.as_view(), name='metrics'),
+    path('batch/', RequetesGroupeesView.as_view(), name='batch'),
+    path('sync/', SynchronisationView.as_view(), name='sync'),
 ]
+
+# Déploiement ASGI : lectures les plus fréquentes servies par des vues async
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views as av
+
+    def liste(viewset, basename):
+        return viewset.as_view({'get': 'list', 'post': 'create'}, basename=basename, detail=False)
+
+    urlpatterns = [
+        path('profil/me/', av.hybride(av.me, MeViewSet.as_view({'get': 'me'}, basename='profil', detail=False)),
+             name='profil-me'),
+        path('logements/', av.hybride(av.logements, liste(PropertyViewSet, 'property')), name='property-list'),
+        path('contrats/', av.hybride(av.contrats, liste(ContractViewSet, 'contract')), name='contract-list'),
+        path('paiements/', av.hybride(av.paiements, liste(PaymentViewSet, 'payment')), name='payment-list'),
+        path('messages/', av.hybride(av.messages, liste(MessageViewSet, 'messages')), name='messages-list'),
+        path('messages/conversation/<str:user_id>/', av.hybride(
+            av.conversation, MessageViewSet.as_view({'get': 'conversation'}, basename='messages', detail=False)
+        ), name='messages-conversation'),
+    ] + urlpatterns
@@ -1,20 +1,51 @@
 #core/views.py
 
-import os
+import hmac
+import logging
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
 from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, HttpResponseNotAllowed
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import viewsets, status, permissions, generics
+from rest_framework.authentication import BaseAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-
-from config import settings
-from utils.email_utils import envoyer_recu_par_mail
-from utils.pdf_generator import generer_recu_paiement
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from django.conf import settings
+from utils.metrics import registre, PROMETHEUS_CONTENT_TYPE
+from utils.streaming import ListeStreameeMixin
+from utils.throttling import SeauJetonsThrottle, EnTetesQuotaMixin
+from utils.uploads import nouvelle_cle, signer, lire_jeton, url_televersement, stockage_s3, LecteurLimite
 from . import models
-from .models import Property, Contract, Payment, Message, CustomUser
+from .archivage import inclure_archives, avec_archives
+from .db_router import LectureReplicaMixin
+from .disponibilite import avec_occupation, filtrer_disponibles, filtrer_criteres, fenetre_calendrier, calendrier, \
+    logements_locataire
+from .facturation import lancer_facturation, periode_depuis
+from .idempotence import IdempotenceMixin
+from .mobile_money import signature_valide, enregistrer
+from .models import Property, Contract, Payment, Message, CustomUser, Echeance, PaymentArchive, MessageArchive
+from .paiements import valider_paiement
+from .projections import PaymentProjection, MessageProjection
+from .proximite import filtrer_proximite, recherche_geographique
+from .recherche import rechercher, termes
+from .releves import ReleveInvalide, lire_releve, rapprocher, demander_validation_rapproches
+from .regroupement import executer_lot
+from .synchronisation import synchroniser
 from .serializers import PropertySerializer, ContractSerializer, PaymentSerializer, MessageSerializer, \
     RegisterAdminSerializer, CreateLocataireSerializer, LocataireListSerializer, LocataireUpdateSerializer, \
-    PropertyCreateSerializer, ProfileSerializer, PasswordChangeSerializer
+    PropertyCreateSerializer, ProfileSerializer, PasswordChangeSerializer, DemandeUploadSerializer, \
+    ConfirmationUploadSerializer, ImageLogementSerializer, EcheanceSerializer, FacturationSerializer, \
+    CycleFacturationSerializer, RequetesGroupeesSerializer, RapprochementReleveSerializer
+
+logger = logging.getLogger(__name__)
 
 
 from rest_framework import viewsets
@@ -25,7 +56,12 @@ from .serializers import ProfileSerializer, PasswordChangeSerializer
 
 
 
-class MeViewSet(viewsets.ViewSet):
+class IsAdminUserCustom(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user and request.user.is_authenticated and request.user.role == 'admin'
+
+
+class MeViewSet(LectureReplicaMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
     @action(detail=False, methods=['get'], url_path='me')
@@ -54,10 +90,17 @@ class MeViewSet(viewsets.ViewSet):
         return Response(serializer.errors, status=400)
 
 
-class PropertyViewSet(viewsets.ModelViewSet):
+class PropertyViewSet(IdempotenceMixin, EnTetesQuotaMixin, LectureReplicaMixin, viewsets.ModelViewSet):
     queryset = Property.objects.all()
     permission_classes = [IsAuthenticated]
 
+    def get_throttles(self):
+        # Création avec envoi d'images : limitée par utilisateur et par IP
+        if self.action == 'create':
+            self.throttle_scope = 'creation_logement'
+            return [SeauJetonsThrottle()]
+        return super().get_throttles()
+
     def get_serializer_class(self):
         if self.action == 'create':
             return PropertyCreateSerializer
@@ -65,13 +108,30 @@ class PropertyViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        params = self.request.query_params
         if user.role == "admin":
-            return Property.objects.filter(proprietaire=user)
-        # Pour les locataires : retourne les logements liés à leurs contrats
-        return Property.objects.filter(contract__locataire=user).distinct()
-
-
-class ContractViewSet(viewsets.ModelViewSet):
+            queryset = Property.objects.filter(proprietaire=user)
+        else:
+            # Pour les locataires : retourne les logements liés à leurs contrats, plus les logements
+            # libres pour une recherche géographique en liste (jamais en détail ni en écriture)
+            queryset = logements_locataire(user, self.action == 'list' and recherche_geographique(params))
+        queryset = filtrer_proximite(filtrer_criteres(filtrer_disponibles(queryset, params), params), params)
+        return avec_occupation(queryset)
+
+    @action(detail=True, methods=['get'])
+    def calendrier(self, request, pk=None):
+        # Périodes occupées / libres du logement, ?du=AAAA-MM-JJ&au=AAAA-MM-JJ (un an par défaut)
+        logement = self.get_object()
+        du, au = fenetre_calendrier(request.query_params)
+        return Response(calendrier(Property.objects.filter(pk=logement.pk), du, au)[0])
+
+    @action(detail=False, methods=['get'], url_path='calendrier', url_name='calendrier-proprietaire')
+    def calendrier_proprietaire(self, request):
+        du, au = fenetre_calendrier(request.query_params)
+        return Response(calendrier(self.get_queryset().order_by('id'), du, au))
+
+
+class ContractViewSet(IdempotenceMixin, LectureReplicaMixin, viewsets.ModelViewSet):
     queryset = Contract.objects.all()
     serializer_class = ContractSerializer
     permission_classes = [IsAuthenticated]
@@ -82,16 +142,44 @@ class ContractViewSet(viewsets.ModelViewSet):
             return Contract.objects.filter(logement__proprietaire=user)
         return Contract.objects.filter(locataire=user)
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(IdempotenceMixin, EnTetesQuotaMixin, LectureReplicaMixin, ListeStreameeMixin,
+                     viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    projection_class = PaymentProjection
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin':
-            return Payment.objects.filter(logement__proprietaire=user)
-        return Payment.objects.filter(locataire=user)
+            queryset = Payment.objects.filter(logement__proprietaire=user)
+        else:
+            queryset = Payment.objects.filter(locataire=user)
+        # Noms du locataire et du propriétaire lus par le serializer ; ordre d'insertion explicite
+        # (pas d'ordering sur Payment) : liste et projection renvoient les lignes dans le même ordre
+        return queryset.select_related('locataire', 'logement__proprietaire').order_by('pk')
+
+    def get_queryset_archives(self):
+        user = self.request.user
+        if user.role == 'admin':
+            queryset = PaymentArchive.objects.filter(logement__proprietaire=user)
+        else:
+            queryset = PaymentArchive.objects.filter(locataire=user)
+        return queryset.select_related('locataire', 'logement__proprietaire')
+
+    def list(self, request, *args, **kwargs):
+        # ?archives=1 : inclut les paiements déplacés dans la table d'archive
+        if not inclure_archives(request):
+            return super().list(request, *args, **kwargs)
+        paiements = avec_archives(self.get_queryset(), self.get_queryset_archives(), 'date_paiement')
+        return Response(self.get_serializer(paiements, many=True).data)
+
+    def get_throttles(self):
+        # Validation : génération PDF + envoi SMTP, limitée par utilisateur et par IP
+        if self.action == 'valider':
+            self.throttle_scope = 'validation'
+            return [SeauJetonsThrottle()]
+        return super().get_throttles()
 
     def perform_create(self, serializer):
         # Injecte automatiquement le locataire connecté lors de la création
@@ -107,9 +195,29 @@ class PaymentViewSet(viewsets.ModelViewSet):
     def mes_paiements(self, request):
         user = request.user
         paiements = Payment.objects.filter(locataire=user).order_by('-date_paiement')
+        if inclure_archives(request):
+            paiements = avec_archives(paiements, PaymentArchive.objects.filter(locataire=user),
+                                      'date_paiement', recents_d_abord=True)
         serializer = self.get_serializer(paiements, many=True, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUserCustom])
+    def rapprochement(self, request):
+        # Relevé Mobile Money ou bancaire (CSV) comparé aux paiements du propriétaire ; ?valider
+        # met en file la validation des paiements rapprochés (reçus et e-mails hors requête)
+        serializer = RapprochementReleveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        donnees = serializer.validated_data
+        try:
+            lignes, invalides = lire_releve(donnees['fichier'])
+        except ReleveInvalide as exc:
+            raise ValidationError({'fichier': str(exc)})
+        rapport = rapprocher(request.user, lignes, fenetre=donnees['fenetre'], mode=donnees.get('mode'))
+        rapport = {'lignes': len(lignes) + len(invalides), **rapport, 'invalides': invalides}
+        if donnees['valider']:
+            rapport['validations_en_file'] = demander_validation_rapproches(rapport, request.user)
+        return Response(rapport)
+
     @action(detail=True, methods=['post'])
     def valider(self, request, pk=None):
         paiement = self.get_object()
@@ -118,17 +226,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
             return Response({'message': 'Paiement déjà validé'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            paiement.est_valide = True
-
-            chemin_relatif = generer_recu_paiement(paiement, request.user.get_full_name())
-            paiement.fichier_recu = chemin_relatif
-            paiement.save()
-
-            # Chemin absolu du PDF pour l’envoi mail
-            chemin_absolu = os.path.join(settings.MEDIA_ROOT, chemin_relatif)
-
-            # Envoi mail
-            envoyer_recu_par_mail(paiement, chemin_absolu)
+            chemin_relatif = valider_paiement(paiement, request.user.get_full_name())
 
             return Response({
                 'message': 'Paiement validé, reçu généré avec succes',
@@ -136,19 +234,31 @@ class PaymentViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            print("Erreur génération reçu ou envoi mail :", e)
+            logger.exception("Validation du paiement %s impossible", paiement.pk)
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(IdempotenceMixin, LectureReplicaMixin, ListeStreameeMixin, viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
+    projection_class = MessageProjection
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        return Message.objects.filter(Q(expediteur=user) | Q(destinataire=user))
+        return Message.objects.filter(Q(expediteur=user) | Q(destinataire=user)).select_related(
+            'expediteur', 'destinataire')
+
+    def list(self, request, *args, **kwargs):
+        # ?archives=1 : inclut les messages déplacés dans la table d'archive
+        if not inclure_archives(request):
+            return super().list(request, *args, **kwargs)
+        user = request.user
+        archives = MessageArchive.objects.filter(Q(expediteur=user) | Q(destinataire=user))
+        messages = avec_archives(self.get_queryset(), archives.select_related('expediteur', 'destinataire'),
+                                 'date_envoi')
+        return Response(self.get_serializer(messages, many=True).data)
 
     def perform_create(self, serializer):
         serializer.save(expediteur=self.request.user)
@@ -159,6 +269,30 @@ class MessageViewSet(viewsets.ModelViewSet):
             return Response({'detail': "Vous ne pouvez supprimer que vos propres messages."}, status=403)
         return super().destroy(request, *args, **kwargs)
 
+    @action(detail=False, methods=['get'])
+    def recherche(self, request):
+        # ?q=tuyau cassé[&avec=<id>][&limite=20][&curseur=...] : dans les conversations de l'utilisateur
+        texte = request.query_params.get('q', '').strip()
+        if not termes(texte):
+            raise ValidationError({'q': "Texte à rechercher requis."})
+        try:
+            limite = min(max(int(request.query_params.get('limite', 20)), 1), 100)
+        except ValueError:
+            raise ValidationError({'limite': "Nombre entier attendu."})
+        messages = self.get_queryset()
+        participants = [request.user.pk]
+        avec = request.query_params.get('avec')
+        if avec:
+            if not avec.isdigit():
+                raise ValidationError({'avec': "Identifiant d'utilisateur attendu."})
+            messages = messages.filter(Q(expediteur_id=avec) | Q(destinataire_id=avec))
+            participants.append(int(avec))
+        try:
+            resultats, suivant = rechercher(messages, texte, participants, request.query_params.get('curseur'), limite)
+        except signing.BadSignature:
+            raise ValidationError({'curseur': "Curseur invalide."})
+        return Response({'resultats': self.get_serializer(resultats, many=True).data, 'suivant': suivant})
+
     @action(detail=False, methods=['get'], url_path='conversation/(?P<user_id>[^/.]+)')
     def conversation(self, request, user_id=None):
         user = request.user
@@ -171,27 +305,122 @@ class MessageViewSet(viewsets.ModelViewSet):
             Q(expediteur=user, destinataire=destinataire) |
             Q(expediteur=destinataire, destinataire=user)
         ).order_by('date_envoi')
+        if inclure_archives(request):
+            archives = MessageArchive.objects.filter(
+                Q(expediteur=user, destinataire=destinataire) |
+                Q(expediteur=destinataire, destinataire=user)
+            )
+            messages = avec_archives(messages, archives, 'date_envoi')
 
         serializer = self.get_serializer(messages, many=True)
         return Response(serializer.data)
 
 
 
-class RegisterAdminView(generics.CreateAPIView):
+# ======================== TÉLÉVERSEMENT DIRECT =============================
+
+class UploadViewSet(viewsets.ViewSet):
+    """Fichiers envoyés directement au stockage via une URL signée, puis rattachés au modèle."""
+    permission_classes = [IsAuthenticated]
+
+    # Représentation renvoyée après confirmation, selon la cible
+    SERIALIZERS = {
+        'photo': ProfileSerializer,
+        'logement_image': ImageLogementSerializer,
+        'contrat': ContractSerializer,
+        'message_image': MessageSerializer,
+    }
+
+    def create(self, request):
+        serializer = DemandeUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        cle = nouvelle_cle(data['cible'], data['nom_fichier'])
+        # La taille annoncée devient la limite imposée au téléversement
+        jeton = signer(cle, data['cible'], request.user, data['content_type'], data['taille'])
+        televersement = url_televersement(request, jeton, cle, data['content_type'], data['taille'])
+        return Response({
+            'cle': cle,
+            'jeton': jeton,
+            'expire_dans': settings.UPLOAD_URL_EXPIRATION,
+            **televersement,
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def confirmer(self, request):
+        serializer = ConfirmationUploadSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        instance = serializer.save()
+        representation = self.SERIALIZERS[serializer.validated_data['cible']]
+        return Response(representation(instance, context={'request': request}).data, status=status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+def televersement_local(request, jeton):
+    # Remplace S3 en local : l'URL signée fait office d'authentification
+    if request.method != 'PUT':
+        return HttpResponseNotAllowed(['PUT'])
+    if stockage_s3():
+        return JsonResponse({'detail': "Téléversement local désactivé."}, status=404)
+    try:
+        infos = lire_jeton(jeton, settings.UPLOAD_URL_EXPIRATION)
+    except signing.BadSignature:
+        return JsonResponse({'detail': "URL de téléversement invalide ou expirée."}, status=403)
+
+    cle = infos['cle']
+    if request.content_type != infos['type']:
+        return JsonResponse({'detail': "Content-Type différent de celui annoncé."}, status=400)
+    if default_storage.exists(cle):
+        return JsonResponse({'detail': "Fichier déjà téléversé."}, status=409)
+
+    lecteur = LecteurLimite(request, infos['taille_max'])
+    try:
+        default_storage.save(cle, File(lecteur))
+    except ValueError:
+        default_storage.delete(cle)
+        return JsonResponse({'detail': "Fichier trop volumineux."}, status=413)
+    return JsonResponse({'cle': cle}, status=201)
+
+
+@csrf_exempt
+def notification_mobile_money(request):
+    # Appelée par l'opérateur : la signature HMAC du corps tient lieu d'authentification.
+    # Une seule insertion ici ; rapprochement et validation par la commande traiter_mobile_money.
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if not settings.MOBILE_MONEY_SECRET:
+        return JsonResponse({'detail': "Notifications Mobile Money désactivées."}, status=404)
+    corps = request.body
+    if not signature_valide(corps, request.headers.get('X-Signature', '')):
+        return JsonResponse({'detail': "Signature invalide."}, status=401)
+    try:
+        enregistrer(corps)
+    except ValueError as exc:
+        return JsonResponse({'detail': f"Notification illisible : {exc}"}, status=400)
+    # Même réponse pour un renvoi déjà reçu : l'opérateur cesse ses tentatives
+    return JsonResponse({'statut': 'recu'})
+
+
+class ConnexionView(EnTetesQuotaMixin, TokenObtainPairView):
+    # Hachage du mot de passe coûteux : tentatives limitées par IP
+    throttle_classes = [SeauJetonsThrottle]
+    throttle_scope = 'connexion'
+
+
+class RegisterAdminView(EnTetesQuotaMixin, generics.CreateAPIView):
     serializer_class = RegisterAdminSerializer
     permission_classes = [AllowAny]  # Tout le monde peut s’inscrire
+    throttle_classes = [SeauJetonsThrottle]
+    throttle_scope = 'inscription'
 
 
-class IsAdminUserCustom(permissions.BasePermission):
-    def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.role == 'admin'
-
 class CreateLocataireView(generics.CreateAPIView):
     serializer_class = CreateLocataireSerializer
     permission_classes = [IsAdminUserCustom]
 
 
-class LocataireViewSet(viewsets.ModelViewSet):
+class LocataireViewSet(IdempotenceMixin, LectureReplicaMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdminUserCustom]
 
     def get_queryset(self):
@@ -208,3 +437,95 @@ class IsLocataire(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and request.user.role == 'locataire'
 
+
+# ======================== FACTURATION =============================
+
+class EcheanceViewSet(LectureReplicaMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = EcheanceSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.role == 'admin':
+            queryset = Echeance.objects.filter(logement__proprietaire=user)
+        else:
+            queryset = Echeance.objects.filter(locataire=user)
+        periode = self.request.query_params.get('periode')
+        if periode:
+            try:
+                queryset = queryset.filter(periode=periode_depuis(periode))
+            except ValueError:
+                raise ValidationError({'periode': "Format attendu : AAAA-MM."})
+        return queryset.select_related('logement')
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUserCustom])
+    def facturer(self, request):
+        # Facturation des contrats du propriétaire connecté ; la facturation globale passe par
+        # la commande facturer_mois
+        serializer = FacturationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cycle = lancer_facturation(serializer.validated_data['periode'], proprietaire=request.user,
+                                   forcer=serializer.validated_data['forcer'])
+        return Response(CycleFacturationSerializer(cycle).data, status=status.HTTP_200_OK)
+
+
+# ======================== REQUÊTES GROUPÉES =============================
+
+class RequetesGroupeesView(APIView):
+    """Plusieurs appels de l'API en un aller-retour (démarrage de l'application mobile).
+
+    {"requetes": [{"id": "profil", "methode": "GET", "url": "/api/profil/me/"}, ...]}
+    -> {"reponses": [{"id": "profil", "statut": 200, "corps": {...}}, ...]}
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = RequetesGroupeesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        reponses = executer_lot(request._request, request.user, serializer.validated_data['requetes'])
+        return Response({'reponses': reponses})
+
+
+# ======================== SYNCHRONISATION =============================
+
+class SynchronisationView(APIView):
+    """Changements depuis le dernier appel (?depuis=<jeton>) pour les clients hors ligne.
+
+    Sans jeton, ou avec un jeton plus ancien que SYNC_RETENTION_JOURS : tout ce qui est
+    visible, avec "complet": true (et les archives si ?archives=1).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            donnees = synchroniser(request, request.query_params.get('depuis'), inclure_archives(request))
+        except signing.BadSignature:
+            raise ValidationError({'depuis': "Jeton de synchronisation invalide."})
+        return Response(donnees)
+
+
+# ======================== MÉTRIQUES =============================
+
+class JetonMetriquesAuthentication(BaseAuthentication):
+    # Permet au scrapeur Prometheus de s'authentifier avec METRICS_TOKEN
+    def authenticate(self, request):
+        jeton = settings.METRICS_TOKEN
+        entete = request.headers.get('Authorization', '')
+        if jeton and entete.startswith('Bearer ') and hmac.compare_digest(entete[7:], jeton):
+            return AnonymousUser(), 'metrics'
+        return None
+
+
+class AccesMetriques(permissions.BasePermission):
+    def has_permission(self, request, view):
+        if request.auth == 'metrics':
+            return True
+        return bool(request.user and request.user.is_authenticated and request.user.is_staff)
+
+
+class MetriquesView(APIView):
+    authentication_classes = [JetonMetriquesAuthentication] + APIView.authentication_classes
+    permission_classes = [AccesMetriques]
+
+    def get(self, request):
+        return HttpResponse(registre.exporter(), content_type=PROMETHEUS_CONTENT_TYPE)
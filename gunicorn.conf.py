@@ -0,0 +1,55 @@
+# gunicorn.conf.py
+
+import gc
+import os
+
+# =====================
+# WORKERS
+# =====================
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# Un worker par défaut, comme gunicorn sans configuration. Chaque worker ouvre son propre
+# pool (jusqu'à DB_POOL_MAX_SIZE connexions Neon) et sa propre mémoire : augmenter
+# WEB_CONCURRENCY selon la RAM de l'instance et la limite de connexions de la base,
+# pas selon le nombre de cœurs.
+workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+# ASGI (lectures async) : GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker,
+# ASYNC_READ_VIEWS=True et application config.asgi au lieu de config.wsgi
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+# Recyclage des workers après N requêtes pour borner une fuite mémoire (0 = jamais, par défaut)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+
+# =====================
+# PRÉCHARGEMENT
+# =====================
+# L'application est importée une seule fois dans le maître puis partagée
+# (copy-on-write) par les workers forkés : démarrage et redémarrages plus
+# rapides, mémoire résidente commune.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    # Importe urls, vues et serializers avant le fork (sinon chargés à la 1re requête)
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+    # Aucune connexion (ni pool) ne doit être héritée par les workers
+    from django.db import connections
+    from utils.db_pool import fermer_pools
+    connections.close_all()
+    fermer_pools()
+
+    # Gèle les objets du maître : le GC des workers ne les touche plus,
+    # ce qui évite de recopier leurs pages mémoire.
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from django.db import connections
+    connections.close_all()
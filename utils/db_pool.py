@@ -0,0 +1,42 @@
+# utils/db_pool.py
+
+from django.db import connections
+
+# Statistiques psycopg_pool exportées sur /api/metrics/ (voir ConnectionPool.get_stats)
+STATS_POOL = {
+    'pool_min': "Taille minimale du pool",
+    'pool_max': "Taille maximale du pool",
+    'pool_size': "Connexions ouvertes (libres + empruntées)",
+    'pool_available': "Connexions libres",
+    'requests_waiting': "Demandes en attente d'une connexion",
+    'requests_num': "Emprunts depuis le démarrage",
+    'requests_queued': "Emprunts ayant dû attendre",
+    'requests_wait_ms': "Temps d'attente cumulé des emprunts (ms)",
+    'requests_errors': "Emprunts en échec (timeout, file pleine)",
+    'connections_num': "Connexions ouvertes depuis le démarrage",
+    'connections_ms': "Temps cumulé d'ouverture des connexions (ms)",
+    'connections_errors': "Ouvertures de connexion en échec",
+    'connections_lost': "Connexions rejetées par le contrôle de santé",
+    'usage_ms': "Temps d'utilisation cumulé des connexions (ms)",
+}
+
+
+def pools_ouverts():
+    # Ne crée pas de pool : seuls ceux déjà ouverts par le processus sont lus
+    for alias in connections:
+        pool = getattr(connections[alias], '_connection_pools', {}).get(alias)
+        if pool is not None:
+            yield alias, pool
+
+
+def statistiques_pools():
+    for alias, pool in pools_ouverts():
+        stats = pool.get_stats()
+        for cle, aide in STATS_POOL.items():
+            yield f'db_{cle}', aide, (('alias', alias),), stats.get(cle, 0)
+
+
+def fermer_pools():
+    # À appeler avant un fork : les threads du pool ne survivent pas au fork
+    for alias, _ in list(pools_ouverts()):
+        connections[alias].close_pool()
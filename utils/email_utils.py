@@ -2,6 +2,8 @@ from django.core.mail import EmailMessage
 from django.conf import settings
 import os
 
+from utils.metrics import mesurer
+
 def envoyer_recu_par_mail(paiement, chemin_recu_absolu):
     sujet = f"Reçu de paiement n°{paiement.id}"
     message = f"Bonjour {paiement.locataire.first_name},\n\nVoici le reçu de votre paiement."
@@ -17,4 +19,5 @@ def envoyer_recu_par_mail(paiement, chemin_recu_absolu):
     if os.path.exists(chemin_recu_absolu):
         email.attach_file(chemin_recu_absolu)
 
-    email.send(fail_silently=False)
+    with mesurer('smtp'):
+        email.send(fail_silently=False)
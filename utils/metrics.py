@@ -0,0 +1,210 @@
+# utils/metrics.py
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+# Mesures de la requête en cours (None hors requête : commandes, shell...)
+_mesures_courantes = ContextVar('mesures_requete', default=None)
+
+# Intervalles des histogrammes (secondes) et du nombre de requêtes SQL
+BUCKETS_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_SQL = (1, 2, 5, 10, 20, 50, 100, 200)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MesuresRequete:
+    """Temps cumulés d'une requête HTTP : SQL, sérialisation, appels externes."""
+
+    __slots__ = ('durees', 'nb_sql', 'sql_lente', 'actives')
+
+    def __init__(self):
+        self.durees = {}
+        self.nb_sql = 0
+        self.sql_lente = (0.0, '')
+        self.actives = set()
+
+    def ajouter(self, nom, duree):
+        self.durees[nom] = self.durees.get(nom, 0.0) + duree
+
+    def enregistrer_sql(self, duree, sql):
+        self.nb_sql += 1
+        self.ajouter('sql', duree)
+        if duree > self.sql_lente[0]:
+            self.sql_lente = (duree, sql)
+
+    def cumuler(self, autres):
+        # Mesures d'une sous-requête exécutée dans un autre thread (core.regroupement)
+        for nom, duree in autres.durees.items():
+            self.ajouter(nom, duree)
+        self.nb_sql += autres.nb_sql
+        if autres.sql_lente[0] > self.sql_lente[0]:
+            self.sql_lente = autres.sql_lente
+
+
+def activer(mesures):
+    return _mesures_courantes.set(mesures)
+
+
+def desactiver(jeton):
+    _mesures_courantes.reset(jeton)
+
+
+def mesures_courantes():
+    return _mesures_courantes.get()
+
+
+def chronometrer_sql(execute, sql, params, many, context):
+    # Signature attendue par connection.execute_wrapper()
+    mesures = _mesures_courantes.get()
+    if mesures is None:
+        return execute(sql, params, many, context)
+    debut = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        mesures.enregistrer_sql(perf_counter() - debut, sql)
+
+
+def installer_chronometre_sql(sender, connection, **kwargs):
+    # Branché sur connection_created : couvre aussi les threads de l'ORM async
+    if chronometrer_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(chronometrer_sql)
+
+
+@contextmanager
+def mesurer(nom):
+    """Chronomètre un bloc et l'ajoute aux mesures de la requête en cours.
+
+    Ré-entrant : un bloc imbriqué du même nom n'est compté qu'une fois.
+    """
+    mesures = _mesures_courantes.get()
+    if mesures is None or nom in mesures.actives:
+        yield
+        return
+    mesures.actives.add(nom)
+    debut = perf_counter()
+    try:
+        yield
+    finally:
+        mesures.ajouter(nom, perf_counter() - debut)
+        mesures.actives.discard(nom)
+
+
+def flux_mesure(contenu, mesures):
+    """Corps d'une réponse en flux, chaque morceau produit avec ``mesures`` actives.
+
+    Le corps est lu par le serveur après le retour du middleware : sans cela, le SQL et la
+    sérialisation faits pendant la lecture ne seraient comptés nulle part.
+    """
+    iterateur = iter(contenu)
+    while True:
+        jeton = activer(mesures)
+        try:
+            morceau = next(iterateur, _FIN)
+        finally:
+            desactiver(jeton)
+        if morceau is _FIN:
+            return
+        yield morceau
+
+
+async def flux_mesure_async(contenu, mesures):
+    iterateur = aiter(contenu)
+    while True:
+        jeton = activer(mesures)
+        try:
+            morceau = await anext(iterateur, _FIN)
+        finally:
+            desactiver(jeton)
+        if morceau is _FIN:
+            return
+        yield morceau
+
+
+_FIN = object()
+
+
+class Histogramme:
+    __slots__ = ('buckets', 'compteurs', 'somme', 'total')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.compteurs = [0] * len(buckets)
+        self.somme = 0.0
+        self.total = 0
+
+    def observer(self, valeur):
+        for i, borne in enumerate(self.buckets):
+            if valeur <= borne:
+                self.compteurs[i] += 1
+                break
+        self.somme += valeur
+        self.total += 1
+
+
+class RegistreMetriques:
+    """Histogrammes par nom de vue, au format texte Prometheus.
+
+    Les valeurs sont propres au processus : chaque worker gunicorn expose
+    les siennes.
+    """
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._series = {}   # nom -> (aide, {labels: Histogramme})
+        self._collecteurs = []
+
+    def ajouter_collecteur(self, collecteur):
+        # collecteur() -> itérable de (nom, aide, labels, valeur), exporté en jauges
+        if collecteur not in self._collecteurs:
+            self._collecteurs.append(collecteur)
+
+    def observer(self, nom, aide, labels, valeur, buckets=BUCKETS_DUREE):
+        with self._verrou:
+            _, series = self._series.setdefault(nom, (aide, {}))
+            histo = series.get(labels)
+            if histo is None:
+                histo = series[labels] = Histogramme(buckets)
+            histo.observer(valeur)
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._series.clear()
+
+    def exporter(self):
+        lignes = []
+        with self._verrou:
+            for nom, (aide, series) in sorted(self._series.items()):
+                lignes.append(f'# HELP {nom} {aide}')
+                lignes.append(f'# TYPE {nom} histogram')
+                for labels, histo in sorted(series.items()):
+                    base = ','.join(f'{cle}="{_echapper(val)}"' for cle, val in labels)
+                    cumul = 0
+                    for borne, compteur in zip(histo.buckets, histo.compteurs):
+                        cumul += compteur
+                        lignes.append(f'{nom}_bucket{{{base},le="{borne}"}} {cumul}')
+                    lignes.append(f'{nom}_bucket{{{base},le="+Inf"}} {histo.total}')
+                    lignes.append(f'{nom}_sum{{{base}}} {histo.somme}')
+                    lignes.append(f'{nom}_count{{{base}}} {histo.total}')
+
+        jauges = {}
+        for collecteur in self._collecteurs:
+            for nom, aide, labels, valeur in collecteur():
+                jauges.setdefault(nom, (aide, []))[1].append((labels, valeur))
+        for nom, (aide, valeurs) in sorted(jauges.items()):
+            lignes.append(f'# HELP {nom} {aide}')
+            lignes.append(f'# TYPE {nom} gauge')
+            for labels, valeur in valeurs:
+                base = ','.join(f'{cle}="{_echapper(val)}"' for cle, val in labels)
+                lignes.append(f'{nom}{{{base}}} {valeur}')
+        return '\n'.join(lignes) + '\n'
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registre = RegistreMetriques()
@@ -0,0 +1,37 @@
+# utils/pagination.py
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+SQL_ESTIMATION_POSTGRES = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+
+
+class PaginatorEstime(Paginator):
+    """Paginator qui évite le COUNT(*) sur une grande table Postgres non filtrée.
+
+    Le nombre de lignes vient alors des statistiques du planificateur (pg_class.reltuples,
+    mis à jour par ANALYZE / autovacuum) ; au-dessous de ``seuil``, ou dès qu'un filtre
+    s'applique, on revient au comptage exact.
+    """
+
+    seuil = 100_000
+
+    @cached_property
+    def count(self):
+        estimation = self.estimation()
+        if estimation is not None and estimation > self.seuil:
+            return estimation
+        return super().count
+
+    def estimation(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where or query.distinct:
+            return None
+        connexion = connections[self.object_list.db]
+        if connexion.vendor != 'postgresql':
+            return None
+        with connexion.cursor() as curseur:
+            curseur.execute(SQL_ESTIMATION_POSTGRES, [self.object_list.model._meta.db_table])
+            ligne = curseur.fetchone()
+        return ligne[0] if ligne else None
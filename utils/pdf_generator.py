@@ -1,9 +1,9 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 import os
 from django.conf import settings
 from datetime import datetime
 
+from utils.metrics import mesurer
+
 def generer_recu_paiement(paiement, admin_nom):
     # Nom fichier
     filename = f"recu_paiement_{paiement.id}.pdf"
@@ -14,6 +14,18 @@ def generer_recu_paiement(paiement, admin_nom):
     path_absolu = os.path.join(dir_recus, filename)
 
     # Création PDF
+    with mesurer('pdf'):
+        _dessiner_recu(path_absolu, paiement, admin_nom)
+
+    # Retourner chemin relatif compatible FileField (ex: 'recus/recu_paiement_1.pdf')
+    return f"recus/{filename}"
+
+
+def _dessiner_recu(path_absolu, paiement, admin_nom):
+    # ReportLab est importé à la demande : il coûte ~100 ms au démarrage de chaque worker
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
     c = canvas.Canvas(path_absolu, pagesize=A4)
     c.setFont("Helvetica-Bold", 16)
     c.drawString(200, 800, "REÇU DE PAIEMENT")
@@ -29,6 +41,3 @@ def generer_recu_paiement(paiement, admin_nom):
     c.drawString(100, 630, f"Date génération : {datetime.now().strftime('%d/%m/%Y')}")
 
     c.save()
-
-    # Retourner chemin relatif compatible FileField (ex: 'recus/recu_paiement_1.pdf')
-    return f"recus/{filename}"
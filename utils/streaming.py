@@ -0,0 +1,102 @@
+# utils/streaming.py
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+_renderer = JSONRenderer()
+
+
+def fragment(donnees, premier):
+    # JSONRenderer.render(liste) sans ses crochets : les lots se concatènent en un seul tableau,
+    # identique octet par octet au rendu de la liste complète (séparateurs compacts,  ...)
+    return (b'[' if premier else b',') + _renderer.render(donnees)[1:-1]
+
+
+def fragments_json(lots_serialises):
+    premier = True
+    for donnees in lots_serialises:
+        if donnees:
+            yield fragment(donnees, premier)
+            premier = False
+    yield b'[]' if premier else b']'
+
+
+async def fragments_json_async(lots_serialises):
+    premier = True
+    async for donnees in lots_serialises:
+        if donnees:
+            yield fragment(donnees, premier)
+            premier = False
+    yield b'[]' if premier else b']'
+
+
+def lots(queryset, taille):
+    """Objets du queryset par listes de ``taille``, lus par curseur (mémoire bornée à un lot)."""
+    lot = []
+    for objet in queryset.iterator(chunk_size=taille):
+        lot.append(objet)
+        if len(lot) >= taille:
+            yield lot
+            lot = []
+    if lot:
+        yield lot
+
+
+async def lots_async(queryset, taille):
+    # Générateur synchrone piloté depuis le thread de sync_to_async : aiterator() exécute la
+    # requête de values_list() dans la boucle d'événements
+    generateur = lots(queryset, taille)
+    suivant = sync_to_async(lambda: next(generateur, None))
+    while (lot := await suivant()) is not None:
+        yield lot
+
+
+def reponse_flux(queryset, serialiser, content_type='application/json'):
+    """Liste JSON envoyée lot par lot (STREAMING_TAILLE_LOT) ; ``serialiser(lot)`` renvoie les données du lot."""
+    # Base choisie maintenant : le routage vers un réplica est désactivé avant la lecture du flux
+    queryset = queryset.using(queryset.db)
+    taille = settings.STREAMING_TAILLE_LOT
+    return StreamingHttpResponse(fragments_json(serialiser(lot) for lot in lots(queryset, taille)),
+                                 content_type=content_type)
+
+
+async def reponse_flux_async(queryset, serialiser, content_type='application/json'):
+    # Le routeur peut vérifier la santé d'un réplica (SQL synchrone) : résolu hors de la boucle
+    queryset = queryset.using(await sync_to_async(lambda: queryset.db)())
+    taille = settings.STREAMING_TAILLE_LOT
+    # Les SerializerMethodField peuvent encore interroger la base : sérialisation hors de la boucle
+    serialiser = sync_to_async(serialiser)
+
+    async def serialises():
+        async for lot in lots_async(queryset, taille):
+            yield await serialiser(lot)
+
+    return StreamingHttpResponse(fragments_json_async(serialises()), content_type=content_type)
+
+
+class ListeStreameeMixin:
+    """list() non paginé envoyé en flux : la mémoire du worker ne dépend plus du nombre de lignes.
+
+    Seulement pour le rendu JSON par défaut (sans ``indent`` demandé), dont le flux reproduit
+    exactement la sortie ; sinon, et si STREAMING_LISTES est désactivé, list() habituel.
+    Avec ``projection_class`` (core.projections), les lots sont lus par values() et convertis
+    sans serializer.
+    """
+
+    projection_class = None
+
+    def list(self, request, *args, **kwargs):
+        renderer = getattr(request, 'accepted_renderer', None)
+        if (not settings.STREAMING_LISTES or self.paginator is not None or not isinstance(renderer, JSONRenderer)
+                or 'indent' in getattr(request, 'accepted_media_type', '')):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        contexte = self.get_serializer_context()
+        if self.projection_class is not None:
+            projection = self.projection_class(contexte)
+            return reponse_flux(projection.lignes(queryset), projection.projeter, content_type=renderer.media_type)
+        serializer_class = self.get_serializer_class()
+        return reponse_flux(queryset, lambda lot: serializer_class(lot, many=True, context=contexte).data,
+                            content_type=renderer.media_type)
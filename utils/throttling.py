@@ -0,0 +1,117 @@
+# utils/throttling.py
+
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DUREES = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Seau à jetons sous forme GCRA : une seule valeur par clé (l'heure théorique d'arrivée, en ms),
+# mise à jour atomiquement dans Redis. L'horloge est celle de Redis, commune à tous les workers.
+SCRIPT_REDIS = """
+local t = redis.call('TIME')
+local maintenant = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local intervalle = tonumber(ARGV[1])
+local rafale = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or maintenant)
+if tat < maintenant then tat = maintenant end
+local suivant = tat + intervalle
+local autorise_a = suivant - rafale
+if autorise_a > maintenant then
+    return {0, 0, autorise_a - maintenant}
+end
+redis.call('SET', KEYS[1], suivant, 'PX', suivant - maintenant)
+return {1, math.floor((maintenant - autorise_a) / intervalle), 0}
+"""
+
+_script = None
+_verrou_local = threading.Lock()
+
+
+def lire_taux(taux):
+    """'10/min' -> (10, 60) : capacité du seau et période de remplissage complet (s)."""
+    nombre, periode = taux.split('/')
+    return int(nombre), DUREES[periode[0]]
+
+
+def consommer(cle, capacite, periode):
+    """Prend un jeton ; renvoie (autorisé, jetons restants, attente en s avant le prochain)."""
+    # Millisecondes entières : pas d'arrondi flottant dans Redis
+    intervalle = max(1, periode * 1000 // capacite)
+    rafale = intervalle * capacite
+    cache = caches['default']
+    if isinstance(cache, RedisCache):
+        return _consommer_redis(cache, cle, intervalle, rafale)
+    return _consommer_local(cache, cle, intervalle, rafale, periode)
+
+
+def _consommer_redis(cache, cle, intervalle, rafale):
+    global _script
+    cle = cache.make_and_validate_key(cle)
+    client = cache._cache.get_client(cle, write=True)
+    if _script is None:
+        _script = client.register_script(SCRIPT_REDIS)
+    autorise, restant, attente_ms = _script(keys=[cle], args=[intervalle, rafale], client=client)
+    return bool(autorise), int(restant), int(attente_ms) / 1000
+
+
+def _consommer_local(cache, cle, intervalle, rafale, periode):
+    # Cache mémoire propre au processus (dev, tests) : un verrou local rend l'opération atomique
+    with _verrou_local:
+        maintenant = time.time() * 1000
+        tat = max(cache.get(cle, maintenant), maintenant)
+        autorise_a = tat + intervalle - rafale
+        if autorise_a > maintenant:
+            return False, 0, (autorise_a - maintenant) / 1000
+        cache.set(cle, tat + intervalle, periode)
+        return True, int((maintenant - autorise_a) // intervalle), 0
+
+
+class SeauJetonsThrottle(BaseThrottle):
+    """Seaux à jetons par utilisateur et par IP, partagés entre workers via le cache.
+
+    Les taux viennent de DEFAULT_THROTTLE_RATES selon le ``throttle_scope`` de la vue :
+    '<portée>_user' (utilisateur authentifié) et '<portée>_ip', au format DRF ('10/min').
+    Un taux absent ou vide désactive le seau correspondant.
+    """
+
+    def allow_request(self, request, view):
+        portee = getattr(view, 'throttle_scope', None)
+        if not portee:
+            return True
+        utilisateur = request.user.pk if request.user and request.user.is_authenticated else None
+        self.attente = None
+        quotas = []
+        for suffixe, ident in (('user', utilisateur), ('ip', self.get_ident(request))):
+            taux = api_settings.DEFAULT_THROTTLE_RATES.get(f'{portee}_{suffixe}')
+            if not taux or ident is None:
+                continue
+            capacite, periode = lire_taux(taux)
+            autorise, restant, attente = consommer(f'throttle:{portee}:{suffixe}:{ident}', capacite, periode)
+            quotas.append((capacite, restant))
+            if not autorise:
+                self.attente = attente
+                break
+        if quotas:
+            # En-têtes X-RateLimit-* : le seau le plus proche de la limite (EnTetesQuotaMixin)
+            request.quota = min(quotas, key=lambda quota: quota[1])
+        return self.attente is None
+
+    def wait(self):
+        return self.attente
+
+
+class EnTetesQuotaMixin:
+    """Ajoute X-RateLimit-Limit / X-RateLimit-Remaining ; Retry-After est posé par DRF sur les 429."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        quota = getattr(request, 'quota', None)
+        if quota is not None:
+            response['X-RateLimit-Limit'] = str(quota[0])
+            response['X-RateLimit-Remaining'] = str(quota[1])
+        return response
@@ -0,0 +1,120 @@
+# utils/uploads.py
+
+import os
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.text import get_valid_filename
+
+IMAGES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+PDF = ('application/pdf',)
+MO = 1024 * 1024
+
+# Fichiers téléversables directement vers le stockage, par champ de modèle
+CIBLES = {
+    'photo': {'prefixe': 'users/photos/', 'types': IMAGES, 'taille_max': 5 * MO},
+    'logement_image': {'prefixe': 'logements/', 'types': IMAGES, 'taille_max': 10 * MO},
+    'contrat': {'prefixe': 'contrats/', 'types': PDF, 'taille_max': 20 * MO},
+    'message_image': {'prefixe': 'messages/', 'types': IMAGES + PDF, 'taille_max': 10 * MO},
+}
+
+# Signatures binaires : le type déclaré par le client n'est pas cru sur parole
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+)
+
+SEL = 'core.uploads'
+
+
+def stockage_s3(storage=None):
+    return hasattr(storage or default_storage, 'bucket')
+
+
+def nouvelle_cle(cible, nom_fichier):
+    nom = get_valid_filename(os.path.basename(nom_fichier))[:100] or 'fichier'
+    return f"{CIBLES[cible]['prefixe']}{uuid.uuid4().hex}/{nom}"
+
+
+def signer(cle, cible, user, content_type, taille_max):
+    return signing.dumps({
+        'cle': cle,
+        'cible': cible,
+        'user': user.pk,
+        'type': content_type,
+        'taille_max': min(taille_max, CIBLES[cible]['taille_max']),
+    }, salt=SEL, compress=True)
+
+
+def lire_jeton(jeton, max_age):
+    # Lève signing.BadSignature / SignatureExpired
+    return signing.loads(jeton, salt=SEL, max_age=max_age)
+
+
+def url_televersement(request, jeton, cle, content_type, taille_max):
+    """URL signée à usage du client : POST S3 présigné, ou PUT local en repli."""
+    expiration = settings.UPLOAD_URL_EXPIRATION
+    if stockage_s3():
+        client = default_storage.connection.meta.client
+        presigne = client.generate_presigned_post(
+            Bucket=default_storage.bucket_name,
+            Key=default_storage._normalize_name(cle),
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, taille_max],
+            ],
+            ExpiresIn=expiration,
+        )
+        return {'methode': 'POST', 'url': presigne['url'], 'champs': presigne['fields'], 'en_tetes': {}}
+
+    # Stockage fichiers local (dev/tests) : PUT sur une URL signée de l'application
+    url = request.build_absolute_uri(reverse('uploads-local', kwargs={'jeton': jeton}))
+    return {'methode': 'PUT', 'url': url, 'champs': {}, 'en_tetes': {'Content-Type': content_type}}
+
+
+def detecter_type(entete):
+    for signature, content_type in SIGNATURES:
+        if entete.startswith(signature):
+            return content_type
+    if entete[:4] == b'RIFF' and entete[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def verifier_fichier(cle, cible, taille_max):
+    """Contrôle taille et contenu réel d'un fichier téléversé ; renvoie un message d'erreur ou None."""
+    regles = CIBLES[cible]
+    if not default_storage.exists(cle):
+        return "Fichier introuvable : le téléversement n'est pas terminé."
+    taille = default_storage.size(cle)
+    if taille == 0 or taille > min(taille_max, regles['taille_max']):
+        return f"Taille invalide ({taille} octets, maximum {taille_max})."
+    with default_storage.open(cle, 'rb') as fichier:
+        type_reel = detecter_type(fichier.read(16))
+    if type_reel not in regles['types']:
+        return "Type de fichier non autorisé."
+    return None
+
+
+class LecteurLimite:
+    """Lit un flux en refusant d'aller au-delà de ``limite`` octets."""
+
+    def __init__(self, flux, limite):
+        self.flux = flux
+        self.restant = limite
+
+    def read(self, taille=-1):
+        if taille is None or taille < 0:
+            taille = self.restant + 1
+        donnees = self.flux.read(min(taille, self.restant + 1))
+        self.restant -= len(donnees)
+        if self.restant < 0:
+            raise ValueError("Fichier trop volumineux.")
+        return donnees